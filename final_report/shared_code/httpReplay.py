@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+REPLAY_MODES = ("off", "record", "replay", "auto")
+REPLAY_MODE = os.environ.get("HTTP_REPLAY_MODE", "off")  # install_from_env() reads these two
+REPLAY_DIR = os.environ.get("HTTP_REPLAY_DIR", "http_cassettes")
+REDACTED_PARAMS = ("apikey", "api_key", "token")  # Query parameters left out of keys and saved URLs
+_SAVED_HEADERS = ("Content-Type", "Content-Encoding", "Retry-After")
+_NOTICE_KEYS = ("Note", "Information")  # Alpha Vantage's throttle and daily quota replies, sent with a 200
+_NOTICE_MAX_BYTES = 4096  # Notices are a line of text; a bigger body is data and isn't parsed to check
+
+
+class ReplayMissError(requests.ConnectionError):
+    """A replay-mode request with no saved response; callers handle it like a network failure"""
+
+
+def is_recordable(status: int, body: bytes) -> bool:
+    """
+    Whether a response is worth saving: a 2xx that isn't an Alpha Vantage throttle or quota notice
+
+    Errors, 429s and notices are transient. Saved, they would be served for every later identical
+    request, so a retry could never get past them.
+    """
+    if not 200 <= status < 300:
+        return False
+    if len(body) > _NOTICE_MAX_BYTES or not body.lstrip().startswith(b"{"):
+        return True
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return True
+    return not (isinstance(data, dict) and any(key in data for key in _NOTICE_KEYS))
+
+
+def request_key(method: str, url: str, body: Optional[bytes] = None,
+                redact: Iterable[str] = REDACTED_PARAMS) -> str:
+    """
+    Stable key for a request: method, host, path and sorted query, minus redacted parameters
+
+    So a response recorded with one API key replays for any other, and parameter order
+    doesn't matter.
+    """
+    parts = urlsplit(url)
+    redact = {name.lower() for name in redact}
+    query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                   if name.lower() not in redact)
+    key = f"{method.upper()} {parts.netloc}{parts.path}?{urlencode(query)}"
+    if body:
+        key += " " + hashlib.sha1(body).hexdigest()
+    return key
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    """
+    requests transport that saves responses to disk and serves them back
+
+    Modes:
+        record: send every request for real and save the response (overwriting any saved one)
+        replay: answer from disk only; a request with nothing saved raises ReplayMissError
+        auto: answer from disk when there's a saved response, otherwise send and save it
+
+    Each response is two files under `directory`/<host>/: <sha1 of the key>.json with the
+    status, a few headers and the redacted URL, and <sha1>.body with the raw body (the
+    Alpha Vantage JSON or the syndication HTML, as sent). Only responses that pass
+    is_recordable are saved: errors, 429s and Alpha Vantage Note/Information replies go back
+    to the caller but not to disk, so its retries reach the server. In auto mode a saved one of
+    those (from an older recording) is fetched again rather than replayed.
+    """
+
+    def __init__(self, directory: str = REPLAY_DIR, mode: str = "replay",
+                 redact: Iterable[str] = REDACTED_PARAMS, **adapter_options):
+        if mode not in REPLAY_MODES or mode == "off":
+            raise ValueError(f"mode must be record, replay or auto, not {mode!r}")
+        super().__init__(**adapter_options)
+        self.directory = directory
+        self.mode = mode
+        self.redact = tuple(redact)
+        self.stats = {"replayed": 0, "recorded": 0, "missed": 0, "not_recorded": 0}
+
+    def _paths(self, request: requests.PreparedRequest):
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        key = request_key(request.method, request.url, body, self.redact)
+        folder = os.path.join(self.directory, urlsplit(request.url).netloc.replace(":", "_"))
+        stem = os.path.join(folder, hashlib.sha1(key.encode("utf-8")).hexdigest())
+        return key, stem + ".json", stem + ".body"
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        key, meta_path, body_path = self._paths(request)
+        if self.mode == "replay" or (self.mode == "auto" and os.path.exists(meta_path)):
+            try:
+                saved = self._load(request, meta_path, body_path)
+            except FileNotFoundError:
+                self.stats["missed"] += 1
+                raise ReplayMissError(f"No saved response for {key} in {self.directory}", request=request)
+            if self.mode == "replay" or is_recordable(saved.status_code, saved.content):
+                self.stats["replayed"] += 1
+                return saved
+
+        response = super().send(request, **kwargs)
+        if is_recordable(response.status_code, response.content):  # content reads a streamed body into memory
+            self._save(response, key, meta_path, body_path)
+        else:
+            self.stats["not_recorded"] += 1
+        return response
+
+    def _save(self, response: requests.Response, key: str, meta_path: str, body_path: str):
+        body = response.content  # Already read by send(); iter_content then serves it from memory
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            "key": key,
+            "url": key.split(" ")[1],
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {name: response.headers[name] for name in _SAVED_HEADERS if name in response.headers},
+        }
+        # Body first, so a saved .json always has its .body next to it
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta, indent=1).encode("utf-8"))):
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        self.stats["recorded"] += 1
+
+    def _load(self, request: requests.PreparedRequest, meta_path: str, body_path: str) -> requests.Response:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+        response = requests.Response()
+        response.status_code = meta["status"]
+        response.reason = meta.get("reason")
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.headers["Content-Length"] = str(len(body))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = body
+        response._content_consumed = True  # iter_content() slices _content instead of reading raw
+        return response
+
+
+def install(session: requests.Session, directory: str = REPLAY_DIR, mode: str = "auto",
+            **adapter_options) -> RecordReplayAdapter:
+    """Mount a RecordReplayAdapter on `session` for http:// and https:// and return it"""
+    adapter = RecordReplayAdapter(directory, mode, **adapter_options)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return adapter
+
+
+def install_from_env(session: requests.Session, **adapter_options) -> Optional[RecordReplayAdapter]:
+    """install() per HTTP_REPLAY_MODE / HTTP_REPLAY_DIR; does nothing when the mode is off (the default)"""
+    if REPLAY_MODE == "off":
+        return None
+    print(f"HTTP {REPLAY_MODE} mode, responses in {REPLAY_DIR}/")
+    return install(session, REPLAY_DIR, REPLAY_MODE, **adapter_options)
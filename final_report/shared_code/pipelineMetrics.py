@@ -0,0 +1,253 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Seconds
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+PROGRESS_LOG_INTERVAL = 5.0  # Seconds between throttled progress lines
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, plus the running sum and count"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate, interpolated linearly within the bucket the quantile falls in"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, in_bucket in enumerate(self.counts):
+            if in_bucket and seen + in_bucket >= target:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower  # Past the last bound; it's all we know
+                return lower + (self.buckets[index] - lower) * (target - seen) / in_bucket
+            seen += in_bucket
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges, histograms and per-stage throughput for one pipeline run
+
+    Recording is a dict update under a lock, cheap enough for the per-request hot path.
+    Everything is exported at the end as a Prometheus text-format file (for node_exporter's
+    textfile collector or a pushgateway) and as a JSON run summary.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.started_at = time.time()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._stages: Dict[str, List[float]] = {}  # stage -> [items, first_at, last_at]
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drop every recorded value (HELP texts stay) and restart the run clock"""
+        with self._lock:
+            self.started_at = time.time()
+            for metrics in (self._counters, self._gauges, self._histograms, self._stages):
+                metrics.clear()
+
+    def describe(self, name: str, text: str):
+        """HELP text for a metric in the Prometheus output"""
+        self._help[name] = text
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the seconds the block takes in histogram `name`, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def sleep(self, seconds: float, reason: str):
+        """time.sleep that also counts the seconds spent, by reason"""
+        if seconds > 0:
+            self.inc("sleep_seconds_total", seconds, reason=reason)
+            time.sleep(seconds)
+
+    def count_stage(self, stage: str, items: int = 1):
+        """Record `items` passing through a pipeline stage, for its throughput"""
+        now = time.time()
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [items, now, now]
+            else:
+                entry[0] += items
+                entry[2] = now
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def counter_total(self, name: str) -> float:
+        """Sum of a counter over all its label values"""
+        with self._lock:
+            return sum(self._counters.get(name, {}).values())
+
+    def stage_throughput(self) -> Dict[str, Dict[str, float]]:
+        """Items, seconds since the run started and items/second per stage"""
+        now = time.time()
+        with self._lock:
+            stages = {stage: list(entry) for stage, entry in self._stages.items()}
+        report = {}
+        for stage, (items, _, last_at) in stages.items():
+            elapsed = max(1e-9, (last_at if last_at > self.started_at else now) - self.started_at)
+            report[stage] = {"items": items, "seconds": elapsed, "items_per_second": items / elapsed}
+        return report
+
+    def to_prometheus(self) -> str:
+        lines = []
+        full = lambda name: f"{self.namespace}_{name}"
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {full(name)} {self._help[name]}")
+                    lines.append(f"# TYPE {full(name)} {kind}")
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{full(name)}{_format_labels(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {full(name)} {self._help[name]}")
+                lines.append(f"# TYPE {full(name)} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, in_bucket in zip(list(histogram.buckets) + [math.inf], histogram.counts):
+                        cumulative += in_bucket
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{full(name)}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                    lines.append(f"{full(name)}_sum{_format_labels(key)} {histogram.total:g}")
+                    lines.append(f"{full(name)}_count{_format_labels(key)} {histogram.count}")
+        stages = sorted(self.stage_throughput().items())
+        for name, kind, field in (("stage_items_total", "counter", "items"),
+                                  ("stage_items_per_second", "gauge", "items_per_second")):
+            if stages:
+                lines.append(f"# TYPE {full(name)} {kind}")
+            for stage, stats in stages:
+                lines.append(f"{full(name)}{_format_labels(_label_key({'stage': stage}))} {stats[field]:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict:
+        """JSON-friendly snapshot: counters and gauges, histogram count/sum/mean/quantiles, stages"""
+        label_name = lambda key: ",".join(f"{name}={value}" for name, value in key) or "all"
+        with self._lock:
+            counters = {name: {label_name(key): value for key, value in series.items()}
+                        for name, series in self._counters.items()}
+            gauges = {name: {label_name(key): value for key, value in series.items()}
+                      for name, series in self._gauges.items()}
+            histograms = {
+                name: {
+                    label_name(key): {
+                        "count": histogram.count,
+                        "sum": histogram.total,
+                        "mean": histogram.total / histogram.count if histogram.count else None,
+                        **{f"p{round(q * 100)}": histogram.quantile(q) for q in SUMMARY_QUANTILES},
+                    }
+                    for key, histogram in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+        return {
+            "namespace": self.namespace,
+            "started_at": self.started_at,
+            "duration_seconds": time.time() - self.started_at,
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+            "stages": self.stage_throughput(),
+        }
+
+    def write_prometheus(self, path: str):
+        _write_atomic(path, self.to_prometheus())
+
+    def write_summary(self, path: str, **extra):
+        """Write summary() plus any `extra` top-level fields as JSON"""
+        _write_atomic(path, json.dumps({**self.summary(), **extra}, indent=2, default=str))
+
+
+def _write_atomic(path: str, text: str):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+class ProgressLogger:
+    """
+    Prints progress at most once every `interval` seconds
+
+    The message is passed as a callable so a skipped line costs a clock read, not the
+    string formatting. force=True always prints (e.g. for the final line).
+    """
+
+    def __init__(self, interval: float = PROGRESS_LOG_INTERVAL):
+        self.interval = interval
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def log(self, message: Callable[[], str], force: bool = False) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last < self.interval:
+                return False
+            self._last = now
+        print(message())
+        return True
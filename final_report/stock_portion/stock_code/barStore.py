@@ -0,0 +1,294 @@
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = "bar_store"
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+DTYPES = {"timestamp": "datetime64[s]", "open": "float64", "high": "float64", "low": "float64",
+          "close": "float64", "volume": "int64"}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+"""
+intraday bars in memory-mapped numpy column files, replacing the stocks.csv / stocks_N.csv shards
+
+layout: one partition per calendar month, a directory of .npy files (timestamp, open, high, low,
+close, volume) with the rows sorted by ticker then timestamp, so each ticker's bars for the month
+are one contiguous run; tickers.npy and offsets.npy say where each run starts. catalog.json is
+the index on top: which version of each month's directory is live, its row count and first/last
+timestamps, and every ticker's newest timestamp, so range queries skip months without opening
+them and incremental updates know where each ticker stops
+
+writes dedupe on (ticker, timestamp), the newest write winning, and rewrite only the months they
+touch into a new directory version; the catalog swap is the commit, so a reader or a crash never
+sees half a partition. reads are np.load(mmap_mode="r") slices, so a ticker's bars within a month
+come back as views of the files with nothing parsed or copied
+"""
+class barStore:
+    def __init__(self, path=STORE_DIR):
+        self.path = path
+        self.catalog = {"partitions": {}, "newest": {}}
+        self.open_partitions = {} # directory name -> memory-mapped columns and ticker lookup
+        catalog_path = os.path.join(path, "catalog.json")
+        if os.path.exists(catalog_path):
+            with open(catalog_path) as file:
+                self.catalog = json.load(file)
+
+    def exists(self):
+        return bool(self.catalog["partitions"])
+
+    def tickers(self):
+        return sorted(self.catalog["newest"])
+
+    def months(self):
+        return sorted(self.catalog["partitions"])
+
+    """
+    the newest stored timestamp for a ticker, in the api's string format, or None
+    """
+    def newest(self, ticker):
+        seconds = self.catalog["newest"].get(ticker)
+        if seconds is None:
+            return None
+        return pd.Timestamp(seconds, unit="s").strftime(TIMESTAMP_FORMAT)
+
+    """
+    the months whose bars overlap [start, end]; either can be None for open-ended
+    """
+    def months_between(self, start=None, end=None):
+        start = None if start is None else to_seconds(start)
+        end = None if end is None else to_seconds(end)
+        return [month for month, info in sorted(self.catalog["partitions"].items())
+                if (start is None or info["last"] >= start) and (end is None or info["first"] <= end)]
+
+    """
+    one month's columns as read-only memory maps, plus the ticker -> row range lookup
+    """
+    def partition(self, month):
+        directory = self.catalog["partitions"][month]["dir"]
+        partition = self.open_partitions.get(directory)
+        if partition is None:
+            folder = os.path.join(self.path, directory)
+            columns = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+            tickers = np.load(os.path.join(folder, "tickers.npy"))
+            offsets = np.load(os.path.join(folder, "offsets.npy"))
+            rows = {ticker: (offsets[i], offsets[i + 1]) for i, ticker in enumerate(tickers.tolist())}
+            partition = self.open_partitions[directory] = {"columns": columns, "rows": rows,
+                                                           "tickers": tickers, "offsets": offsets}
+        return partition
+
+    """
+    a ticker's bars in [start, end] as {column: array}; views of the files when the range falls in
+    one month (the usual case), concatenated copies when it spans several
+    """
+    def read_ticker(self, ticker, start=None, end=None, columns=COLUMNS):
+        pieces = []
+        for month in self.months_between(start, end):
+            partition = self.partition(month)
+            if ticker not in partition["rows"]:
+                continue
+            first, last = partition["rows"][ticker]
+            timestamps = partition["columns"]["timestamp"][first:last]
+            if start is not None:
+                first += np.searchsorted(timestamps, np.datetime64(to_seconds(start), "s"), side="left")
+            if end is not None:
+                last = partition["rows"][ticker][0] + np.searchsorted(timestamps, np.datetime64(to_seconds(end), "s"), side="right")
+            if last > first:
+                pieces.append({name: partition["columns"][name][first:last] for name in columns})
+        if not pieces:
+            return {name: np.empty(0, dtype=DTYPES[name]) for name in columns}
+        if len(pieces) == 1:
+            return pieces[0]
+        return {name: np.concatenate([piece[name] for piece in pieces]) for name in columns}
+
+    """
+    {ticker: {column: array}} for a ticker set (None for all) and time range; see read_ticker
+    """
+    def read(self, tickers=None, start=None, end=None, columns=COLUMNS):
+        tickers = self.tickers() if tickers is None else tickers
+        return {ticker: self.read_ticker(ticker, start, end, columns) for ticker in tickers}
+
+    """
+    the bars as one long dataframe in the master_stocks.csv shape (ticker, timestamp, open, ...),
+    sorted by ticker then timestamp; built with whole-column slices, no per-row parsing. tickers
+    come back categorical (an int per row instead of a python string per row)
+    """
+    def frame(self, tickers=None, start=None, end=None):
+        wanted = None if tickers is None else set(tickers)
+        months = self.months_between(start, end)
+        names = sorted(set().union(*(self.partition(month)["rows"] for month in months)))
+        pieces = []
+        for month in months:
+            partition = self.partition(month)
+            counts = np.diff(partition["offsets"])
+            # the month's own ticker numbers, mapped onto positions in the combined, sorted list
+            codes = np.repeat(np.searchsorted(names, partition["tickers"]), counts)
+            rows = np.ones(len(codes), dtype=bool)
+            if wanted is not None:
+                rows &= np.repeat(np.array([name in wanted for name in partition["tickers"].tolist()]), counts)
+            timestamps = partition["columns"]["timestamp"]
+            if start is not None:
+                rows &= timestamps >= np.datetime64(to_seconds(start), "s")
+            if end is not None:
+                rows &= timestamps <= np.datetime64(to_seconds(end), "s")
+            everything = rows.all()
+            pieces.append({"ticker": codes if everything else codes[rows],
+                           **{name: partition["columns"][name] if everything else partition["columns"][name][rows]
+                              for name in COLUMNS}})
+
+        if not pieces:
+            return pd.DataFrame({"ticker": pd.Categorical([]), **{name: np.empty(0, dtype=DTYPES[name]) for name in COLUMNS}})
+        columns = {name: np.concatenate([piece[name] for piece in pieces]) for name in ["ticker"] + COLUMNS}
+        if len(pieces) > 1: # months come one after another, tickers don't; a stable sort on the codes fixes that
+            order = np.argsort(columns["ticker"], kind="stable")
+            columns = {name: column[order] for name, column in columns.items()}
+        columns["ticker"] = pd.Categorical.from_codes(columns["ticker"], categories=names)
+        return pd.DataFrame(columns)
+
+    """
+    adds bars from a dataframe with ticker, timestamp and the price/volume columns (timestamps as
+    strings or datetimes). rows for a (ticker, timestamp) already stored replace the stored ones
+    """
+    def write(self, bars):
+        bars = normalize(bars)
+        if bars.empty:
+            return 0
+        replaced = []
+        month_keys = bars["timestamp"].to_numpy().astype("datetime64[M]") # strftime is ~100x slower
+        for month_key, new_rows in bars.groupby(month_keys, sort=True):
+            month = str(np.datetime64(month_key, "M"))
+            old_info = self.catalog["partitions"].get(month)
+            if old_info is not None:
+                new_rows = pd.concat([self.month_frame(month), new_rows], ignore_index=True)
+            merged = (new_rows.drop_duplicates(["ticker", "timestamp"], keep="last")
+                      .sort_values(["ticker", "timestamp"], kind="stable", ignore_index=True))
+            version = (old_info["version"] + 1) if old_info else 1
+            directory = f"{month}.v{version}"
+            self.write_partition(directory, merged)
+            self.catalog["partitions"][month] = {
+                "dir": directory, "version": version, "rows": len(merged), "tickers": int(merged["ticker"].nunique()),
+                "first": int(merged["timestamp"].min().timestamp()), "last": int(merged["timestamp"].max().timestamp())
+            }
+            if old_info is not None:
+                replaced.append(old_info["dir"])
+
+        for ticker, newest in bars.groupby("ticker")["timestamp"].max().items():
+            seconds = int(newest.timestamp())
+            if seconds > self.catalog["newest"].get(ticker, -1):
+                self.catalog["newest"][ticker] = seconds
+        self.save_catalog()
+        # only now that the catalog points at the new versions can the old ones go
+        for directory in replaced:
+            self.open_partitions.pop(directory, None)
+            shutil.rmtree(os.path.join(self.path, directory), ignore_errors=True)
+        return len(bars)
+
+    def month_frame(self, month):
+        partition = self.partition(month)
+        names, offsets = partition["tickers"], partition["offsets"]
+        data = {"ticker": np.repeat(names, np.diff(offsets))}
+        data.update({name: np.asarray(partition["columns"][name]) for name in COLUMNS})
+        return pd.DataFrame(data)
+
+    def write_partition(self, directory, merged):
+        folder = os.path.join(self.path, directory)
+        os.makedirs(folder, exist_ok=True)
+        tickers, starts = np.unique(merged["ticker"].to_numpy(dtype=str), return_index=True)
+        offsets = np.append(starts, len(merged)).astype("int64")
+        arrays = {name: merged[name].to_numpy(dtype=DTYPES[name]) for name in COLUMNS}
+        arrays["tickers"] = tickers
+        arrays["offsets"] = offsets
+        for name, array in arrays.items():
+            with open(os.path.join(folder, f"{name}.npy"), "wb") as file:
+                np.save(file, array)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def save_catalog(self):
+        os.makedirs(self.path, exist_ok=True)
+        temp_path = os.path.join(self.path, "catalog.json.tmp")
+        with open(temp_path, "w") as file:
+            json.dump(self.catalog, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, os.path.join(self.path, "catalog.json"))
+
+    """
+    loads bar csvs (stocks.csv, stocks_0..3.csv, master_stocks.csv ...) into the store; their
+    overlapping rows collapse to one per (ticker, timestamp)
+    """
+    def import_csv(self, paths):
+        frames = [pd.read_csv(path, dtype={"ticker": str, "timestamp": str}) for path in paths]
+        return self.write(pd.concat(frames, ignore_index=True))
+
+    """
+    writes the store (or part of it) out as a csv for the stages that still read one, like the julia scripts
+    """
+    def export_csv(self, path, tickers=None, start=None, end=None):
+        frame = self.frame(tickers, start, end)
+        frame.to_csv(path, index=False, date_format=TIMESTAMP_FORMAT)
+        return len(frame)
+
+
+def to_seconds(moment):
+    if isinstance(moment, (int, np.integer)):
+        return int(moment)
+    return int(pd.Timestamp(moment).timestamp())
+
+
+"""
+checks and converts incoming bars to the store's columns and dtypes
+"""
+def normalize(bars):
+    missing = [name for name in ["ticker"] + COLUMNS if name not in bars.columns]
+    if missing:
+        raise ValueError(f"bars are missing columns: {missing}")
+    bars = bars[["ticker"] + COLUMNS].dropna(subset=["ticker", "timestamp"])
+    timestamps = bars["timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps.astype(str).str.strip(), format="mixed")
+    return pd.DataFrame({
+        "ticker": bars["ticker"].astype(str).str.strip().str.upper(),
+        "timestamp": timestamps.astype("datetime64[s]"),
+        **{name: pd.to_numeric(bars[name], errors="coerce").astype(DTYPES[name]) for name in ["open", "high", "low", "close"]},
+        "volume": pd.to_numeric(bars["volume"], errors="coerce").fillna(0).astype("int64")
+    })
+
+
+"""
+the bars as a pandas frame in the master_stocks.csv shape: parsed from csv_path, or read from the
+bar store at store_path when one is passed (the scripts pass STORE_DIR when run with --store).
+either way the frame looks like the csv's: ticker and timestamp as plain strings, timestamps in
+TIMESTAMP_FORMAT. prints which source it used
+"""
+def load_bars(csv_path="master_stocks.csv", store_path=None):
+    if store_path is None:
+        print(f"loading bars from {csv_path}")
+        return pd.read_csv(csv_path)
+    store = barStore(store_path)
+    if not store.exists():
+        raise FileNotFoundError(f"no bar store at {store_path}")
+    print(f"loading bars from the bar store in {store_path}")
+    bars = store.frame()
+    # datetime_as_string gives "2025-04-28T09:30:00"; strftime per row is ~100x slower
+    timestamps = np.datetime_as_string(bars["timestamp"].to_numpy(dtype="datetime64[s]"), unit="s")
+    bars["timestamp"] = pd.Series(timestamps, index=bars.index).str.replace("T", " ", regex=False)
+    bars["ticker"] = bars["ticker"].astype(str)
+    return bars
+
+
+if __name__ == "__main__":
+    # python barStore.py stocks.csv stocks_0.csv ... imports the csvs, then times a full load
+    store = barStore()
+    if len(sys.argv) > 1:
+        start = time.perf_counter()
+        rows = store.import_csv(sys.argv[1:])
+        print(f"Imported {rows} rows from {len(sys.argv) - 1} csvs in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    bars = barStore().frame()
+    print(f"{len(bars)} bars for {bars['ticker'].nunique()} tickers over {len(store.months())} months "
+          f"loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import sharedCode # puts final_report/shared_code on the path
+import httpReplay
+from concurrentStockFetcher import concurrentStockFetcher
+from fakeMarketServer import fakeMarketServer
+from stockAPIGetter import stockAPIGetter
+
+BENCHMARK_TICKERS = 5000 # synthetic symbols fetched by the unthrottled scenarios
+THROTTLED_TICKERS = 450 # fewer for the rate limited one: a minute's worth, then the rest a minute later
+THROTTLED_PER_MINUTE = 300 # per key, on both the server and the fetcher
+SEQUENTIAL_TICKERS = 200 # the old one-at-a-time getter is slow enough that this is plenty
+MAX_IN_FLIGHT = 16
+SERVER_LATENCY = 0.05 # seconds per fake api response
+
+"""
+ingestion throughput at thousands of tickers, with no network: concurrentStockFetcher against a
+local fakeMarketServer (recording the responses), the same run replayed from the recording with
+the server stopped, a run paced under the server's rate limit, and stockAPIGetter's sequential
+loop as the baseline. everything is written to a temp directory
+"""
+def synthetic_tickers(count):
+    return [f"T{index:05d}" for index in range(count)]
+
+
+def rows_in(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as file:
+        return sum(1 for _ in file) - 1
+
+
+"""
+runs one concurrentStockFetcher over `tickers` with fresh output files; returns (seconds, results, rows)
+"""
+def time_fetch(base_url, tickers, requests_per_minute, cassette_dir=None, mode=None):
+    for path in ("stocks.csv", "fetch_manifest.jsonl"):
+        if os.path.exists(path):
+            os.remove(path)
+    fetcher = concurrentStockFetcher(requests_per_minute=requests_per_minute, max_in_flight=MAX_IN_FLIGHT,
+                                     base_url=base_url)
+    fetcher.progress.interval = float("inf") # only the benchmark's own lines
+    if mode is not None:
+        httpReplay.install(fetcher.session, cassette_dir, mode, pool_maxsize=MAX_IN_FLIGHT)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = fetcher.run(tickers)
+    return time.perf_counter() - start, results, rows_in("stocks.csv")
+
+
+def report(name, seconds, tickers, rows, extra=""):
+    print(f"{name:<42} {seconds:7.2f} s  {tickers / seconds:8.1f} tickers/s  {rows / seconds:10.0f} rows/s  {extra}")
+
+
+def main():
+    print("=== Offline ingestion throughput ===")
+    started_in = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            cassettes = os.path.join(workdir, "cassettes")
+            tickers = synthetic_tickers(BENCHMARK_TICKERS)
+
+            with fakeMarketServer(latency=SERVER_LATENCY) as server:
+                url = server.url
+                seconds, results, rows = time_fetch(url, tickers, 10 ** 6, cassettes, "record")
+                report(f"concurrent, {MAX_IN_FLIGHT} in flight, recording", seconds, len(tickers), rows, results)
+
+            # the server is gone; every response comes off disk (recordings are keyed by host, so same url)
+            seconds, results, rows = time_fetch(url, tickers, 10 ** 6, cassettes, "replay")
+            report("replayed from disk, server stopped", seconds, len(tickers), rows, results)
+
+            throttled = tickers[:THROTTLED_TICKERS]
+            with fakeMarketServer(port=0, latency=SERVER_LATENCY, requests_per_minute=THROTTLED_PER_MINUTE) as server:
+                seconds, results, rows = time_fetch(server.url, throttled, THROTTLED_PER_MINUTE)
+                report(f"paced at {THROTTLED_PER_MINUTE}/min under the same limit", seconds, len(throttled), rows,
+                       f"{results}, {server.stats['throttled']} throttled responses")
+
+            sequential = tickers[:SEQUENTIAL_TICKERS]
+            with fakeMarketServer(port=0, latency=SERVER_LATENCY) as server:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    getter = stockAPIGetter(count=0, output_filename="stocks_sequential.csv", base_url=server.url)
+                    start = time.perf_counter()
+                    for symbol in sequential:
+                        getter.fetch_and_append_data(symbol)
+                    seconds = time.perf_counter() - start
+                report("stockAPIGetter, one at a time", seconds, len(sequential), rows_in("stocks_sequential.csv"))
+        finally:
+            os.chdir(started_in) # back out before the directory is removed, even if a run fails
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import csv
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from barStore import barStore
+from fetchManifest import fetchManifest
+import sharedCode # puts final_report/shared_code on the path
+from httpReplay import install_from_env
+from lastBarIndex import lastBarIndex, market_now, newer_bars, outputsize_for
+from pipelineMetrics import MetricsRegistry, ProgressLogger
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+API_KEY = os.environ.get("ALPHAVANTAGE_API_KEY", "GKZD4Y2REDV5QML2")
+REQUESTS_PER_MINUTE = 5 # documented free-tier limit per key; raise for a premium key
+MAX_IN_FLIGHT = 4 # requests open at once, on top of the per-minute limit
+PACING_WINDOW = 61 # seconds; a second longer than the api's window, since it counts requests when they arrive
+REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 4 # per symbol, for throttled or failed responses
+FIELDNAMES = ["ticker", "timestamp", "open", "high", "low", "close", "volume"]
+STORE_FLUSH_ROWS = 50000 # bars buffered before each write to a barStore, which rewrites the months it touches
+
+# every rate limit message the api sends mentions the daily limit ("... 25 requests per day ... remove all
+# daily rate limits"), so it's the throttle wording that tells a slow-down from a used-up quota
+THROTTLE_MARKERS = ("spreading out", "per minute", "per second")
+QUOTA_MARKERS = ("rate limit is",) # "our standard API rate limit is 25 requests per day."
+
+
+"""
+throttled (wait and retry) or quota (daily limit used up, stop) for a Note/Information message
+"""
+def classify_limit_message(message):
+    text = message.lower()
+    if any(marker in text for marker in THROTTLE_MARKERS):
+        return "throttled"
+    if any(marker in text for marker in QUOTA_MARKERS) and "per day" in text:
+        return "quota"
+    return "throttled"
+
+
+"""
+fetches intraday bars for many tickers with ONE api key, as fast as that key's quota allows
+
+replaces stockAPIGetter's one-at-a-time loop, fixed 15 minute / 2 hour sleeps and the
+lastStockPrinter ratchet files: up to max_in_flight requests run at once, paced so no more
+than requests_per_minute start in any 60 second window, and every finished symbol is
+written to a fetchManifest, so rerunning after a crash or a used-up daily quota only
+fetches what's left
+
+pass a barStore as bar_store to write there instead of the csv; bars are buffered and written
+in batches, and a symbol only goes in the manifest once its batch is in the store
+"""
+class concurrentStockFetcher:
+    def __init__(self, tickers_filename="stock-tickers.csv", output_filename="stocks.csv",
+                 manifest_filename="fetch_manifest.jsonl", api_key=API_KEY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 max_in_flight=MAX_IN_FLIGHT, base_url=ALPHA_VANTAGE_URL, interval="30min", bar_store=None):
+        self.tickers_filename = tickers_filename
+        self.output_filename = output_filename
+        self.manifest = fetchManifest(manifest_filename)
+        self.api_key = api_key
+        self.requests_per_minute = requests_per_minute
+        self.max_in_flight = max_in_flight
+        self.base_url = base_url
+        self.interval = interval
+        self.bar_store = bar_store
+        self.store_buffer = [] # (symbol, bars, mark in manifest) waiting for the next barStore write
+        self.buffered_rows = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_in_flight)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.replay = install_from_env(self.session, pool_maxsize=max_in_flight) # HTTP_REPLAY_MODE=record/replay/auto
+
+        self.request_times = deque() # start times of the requests in the last PACING_WINDOW seconds
+        self.blocked_until = 0.0 # set when the api says we're throttled; every worker waits
+        self.pacing_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.quota_exhausted = threading.Event()
+
+        self.metrics = MetricsRegistry("market_data")
+        self.progress = ProgressLogger()
+
+    def get_tickers_from_csv(self):
+        tickers = []
+        try:
+            with open(self.tickers_filename, mode="r") as file:
+                for row in csv.DictReader(file):
+                    tickers.append(row['Symbol'])
+        except FileNotFoundError:
+            print(f"Error: File '{self.tickers_filename}' not found.")
+        return tickers
+
+    """
+    blocks until a request may start without going over requests_per_minute
+    """
+    def wait_for_slot(self):
+        while True:
+            with self.pacing_lock:
+                now = time.time()
+                while self.request_times and self.request_times[0] <= now - PACING_WINDOW:
+                    self.request_times.popleft()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif len(self.request_times) < self.requests_per_minute:
+                    self.request_times.append(now)
+                    return
+                else:
+                    wait = self.request_times[0] + PACING_WINDOW - now
+            self.metrics.sleep(max(wait, 0.01), "pacing")
+
+    def throttled(self, seconds):
+        with self.pacing_lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+    """
+    one TIME_SERIES_INTRADAY request; returns (status, time series or message)
+    status is ok, no_data, throttled, quota (daily limit used up) or error
+    """
+    def request_series(self, symbol, outputsize="compact"):
+        self.wait_for_slot()
+        params = {"function": "TIME_SERIES_INTRADAY", "symbol": symbol, "interval": self.interval,
+                  "outputsize": outputsize, "apikey": self.api_key}
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=REQUEST_TIMEOUT)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.metrics.observe("request_latency_seconds", time.perf_counter() - start, outcome="error")
+            return "error", str(e)
+        self.metrics.observe("request_latency_seconds", time.perf_counter() - start, outcome="ok")
+
+        series_key = f"Time Series ({self.interval})"
+        if series_key in data:
+            return "ok", data[series_key]
+        message = data.get("Note") or data.get("Information") or data.get("Error Message") or str(data)
+        if "Error Message" in data:
+            return "no_data", message # unknown symbol; retrying won't help
+        return classify_limit_message(message), message
+
+    """
+    fetches one symbol with retries and returns (status, time series or None)
+    """
+    def fetch_symbol(self, symbol, outputsize="compact"):
+        for attempt in range(MAX_ATTEMPTS):
+            if self.quota_exhausted.is_set():
+                return "quota", None
+            status, result = self.request_series(symbol, outputsize)
+            self.metrics.inc("responses_total", status=status)
+            if status in ("ok", "no_data"):
+                return status, result if status == "ok" else None
+            if status == "quota":
+                print(f"Daily quota used up at {symbol}: {result}")
+                self.quota_exhausted.set()
+                return status, None
+            # throttled or a network error: hold every worker off for a window, then retry this symbol
+            self.metrics.inc("retries_total", status=status)
+            self.throttled(60 if status == "throttled" else 5 * (attempt + 1))
+        return "failed", None
+
+    """
+    appends one symbol's bars to the output csv and fsyncs it; callers hold write_lock
+    """
+    def append_rows(self, symbol, time_series):
+        write_header = not os.path.exists(self.output_filename) or os.path.getsize(self.output_filename) == 0
+        with open(self.output_filename, mode="a", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=FIELDNAMES)
+            if write_header:
+                writer.writeheader()
+            for timestamp, values in time_series.items():
+                writer.writerow({
+                    "ticker": symbol,
+                    "timestamp": timestamp,
+                    "open": values["1. open"],
+                    "high": values["2. high"],
+                    "low": values["3. low"],
+                    "close": values["4. close"],
+                    "volume": values["5. volume"]
+                })
+            csv_file.flush()
+            os.fsync(csv_file.fileno())
+
+    """
+    saves one symbol's bars to the csv, or buffers them for the bar store; with mark_done the
+    symbol goes in the manifest once they're on disk. callers hold write_lock
+    """
+    def store_rows(self, symbol, time_series, mark_done=False):
+        if self.bar_store is None:
+            self.append_rows(symbol, time_series)
+            if mark_done:
+                self.manifest.mark(symbol, "done", rows=len(time_series))
+            return
+        self.store_buffer.append((symbol, time_series, mark_done))
+        self.buffered_rows += len(time_series)
+        if self.buffered_rows >= STORE_FLUSH_ROWS:
+            self.flush_store()
+
+    """
+    writes the buffered bars to the bar store in one go, then marks their symbols done; callers hold write_lock
+    """
+    def flush_store(self):
+        if not self.store_buffer:
+            return
+        rows = [(symbol, timestamp, values["1. open"], values["2. high"], values["3. low"],
+                 values["4. close"], values["5. volume"])
+                for symbol, time_series, _ in self.store_buffer for timestamp, values in time_series.items()]
+        self.bar_store.write(pd.DataFrame.from_records(rows, columns=FIELDNAMES))
+        for symbol, time_series, mark_done in self.store_buffer:
+            if mark_done:
+                self.manifest.mark(symbol, "done", rows=len(time_series))
+        self.store_buffer = []
+        self.buffered_rows = 0
+
+    """
+    saves one symbol's bars, then records it in the manifest, so the manifest never lists a
+    symbol whose rows aren't on disk
+    """
+    def write_symbol(self, symbol, time_series):
+        with self.write_lock:
+            self.store_rows(symbol, time_series, mark_done=True)
+        self.metrics.count_stage("rows_written", len(time_series))
+
+    def process_symbol(self, symbol, outputsize="compact"):
+        status, time_series = self.fetch_symbol(symbol, outputsize)
+        if status == "ok" and time_series:
+            self.write_symbol(symbol, time_series)
+        elif status in ("ok", "no_data"):
+            self.manifest.mark(symbol, "no_data")
+        elif status == "failed":
+            self.manifest.mark(symbol, "failed") # not final; the next run tries it again
+        self.metrics.count_stage(f"symbols_{status}")
+        return status
+
+    """
+    fetches every ticker the manifest doesn't list as finished; returns {status: count} for this run
+    """
+    def run(self, tickers=None, outputsize="compact"):
+        tickers = tickers if tickers is not None else self.get_tickers_from_csv()
+        pending = self.manifest.pending(tickers)
+        print(f"{len(tickers) - len(pending)} of {len(tickers)} tickers already fetched; "
+              f"{len(pending)} to go at up to {self.requests_per_minute} requests/minute")
+        results = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                for done, status in enumerate(executor.map(lambda symbol: self.process_symbol(symbol, outputsize), pending), 1):
+                    results[status] = results.get(status, 0) + 1
+                    self.progress.log(lambda: f"{done}/{len(pending)} tickers processed ({results})")
+        finally:
+            with self.write_lock:
+                self.flush_store()
+
+        if self.quota_exhausted.is_set():
+            print("Stopped early: the key's daily quota is used up. Rerun later to fetch the rest.")
+        print(f"Fetch finished: {results}; manifest totals {self.manifest.counts()}")
+        self.metrics.write_prometheus("stock_fetch_metrics.prom")
+        self.metrics.write_summary("stock_fetch_metrics.json", results=results)
+        return results
+
+    """
+    fetches and merges one ticker's bars newer than what's stored; returns (status, bars added)
+    """
+    def update_symbol(self, symbol, outputsize, index):
+        status, time_series = self.fetch_symbol(symbol, outputsize)
+        added = 0
+        if status == "ok" and time_series:
+            with self.write_lock:
+                stored = index.get(symbol) if index is not None else self.bar_store.newest(symbol)
+                new_bars = newer_bars(time_series, stored)
+                if new_bars:
+                    self.store_rows(symbol, new_bars)
+                    if index is not None:
+                        index.update(symbol, new_bars.keys())
+                added = len(new_bars)
+            self.metrics.count_stage("rows_written", added)
+        self.metrics.count_stage(f"symbols_{status}")
+        return status, added
+
+    """
+    incremental refresh of the output csv or bar store: rather than refetching everything, each ticker is
+    asked only for what can have finished since its newest stored bar (compact if that fits in
+    100 bars, full if not, nothing at all if no bar has closed since), and only newer bars are
+    appended. a run soon after the last one makes no requests; the manifest isn't used, since
+    every run has new bars to look for. returns {status: count} with "current" for skipped tickers
+    """
+    def update(self, tickers=None, now=None):
+        tickers = tickers if tickers is not None else self.get_tickers_from_csv()
+        now = now or market_now()
+        minutes = int(self.interval.rstrip("min"))
+        index = lastBarIndex(self.output_filename) if self.bar_store is None else None # the store keeps its own
+        newest = index.get if index is not None else self.bar_store.newest
+        plan = [(symbol, outputsize_for(newest(symbol), now, minutes)) for symbol in tickers]
+        to_fetch = [(symbol, outputsize) for symbol, outputsize in plan if outputsize is not None]
+        results = {"current": len(plan) - len(to_fetch)}
+        print(f"{results['current']} of {len(tickers)} tickers already current; fetching "
+              f"{sum(1 for _, size in to_fetch if size == 'compact')} compact and "
+              f"{sum(1 for _, size in to_fetch if size == 'full')} full")
+
+        added = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                updates = executor.map(lambda job: self.update_symbol(job[0], job[1], index), to_fetch)
+                for done, (status, rows) in enumerate(updates, 1):
+                    results[status] = results.get(status, 0) + 1
+                    added += rows
+                    self.progress.log(lambda: f"{done}/{len(to_fetch)} tickers updated, {added} new bars")
+        finally:
+            with self.write_lock:
+                self.flush_store()
+                if index is not None:
+                    index.save()
+
+        if self.quota_exhausted.is_set():
+            print("Stopped early: the key's daily quota is used up. Rerun later to update the rest.")
+        print(f"Update finished: {results}, {added} new bars")
+        self.metrics.write_prometheus("stock_fetch_metrics.prom")
+        self.metrics.write_summary("stock_fetch_metrics.json", results=results, bars_added=added)
+        return results
+
+
+if __name__ == "__main__":
+    fetcher = concurrentStockFetcher(bar_store=barStore() if "--store" in sys.argv else None)
+    if "--update" in sys.argv: # only what's new since the last run
+        fetcher.update()
+    else:
+        fetcher.run()
@@ -1,8 +1,11 @@
+import sys
+
 import pandas as pd
+from barStore import STORE_DIR, load_bars
 
-# Load the CSV
-df = pd.read_csv("master_stocks.csv")
+# Load the bars (--store reads the bar store instead of the CSV)
+df = load_bars("master_stocks.csv", STORE_DIR if "--store" in sys.argv else None)
 
 df_no_timestamp = df.drop(columns=["timestamp"])
 
-df_no_timestamp.to_csv("master_stocks.csv", index=False)
\ No newline at end of file
+df_no_timestamp.to_csv("master_stocks.csv", index=False)
@@ -0,0 +1,232 @@
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PORT = 8767
+COMPACT_BARS = 100 # what outputsize=compact returns, same as the real api
+FULL_DAYS = 22 # trading days outputsize=full returns, about a month like the real api
+SESSION_START = 4 * 60 # extended hours, 04:00 to 20:00 eastern, in minutes
+SESSION_END = 20 * 60
+INTERVALS = {"1min": 1, "5min": 5, "15min": 15, "30min": 30, "60min": 60}
+
+"""
+local stand-in for alpha vantage's TIME_SERIES_INTRADAY, so the fetchers can be load tested offline
+
+any symbol gets a synthetic series shaped like the real json (meta data plus newest-first bars,
+values as strings). a bar only depends on the symbol, interval and its timestamp, so two
+requests that overlap return the same bars there, and moving `now` forward adds new bars at
+the end the way the live api does through a trading day. set `now` to a datetime to pin the
+clock, or leave it None to follow the real one.
+
+rate limiting is per api key, with the same messages the real api sends:
+    requests_per_minute: over it, a 200 whose "Note" gives the per-minute (and per-day) call frequency
+    requests_per_day: over it, a 200 whose "Information" says the daily limit is used up
+invalid_symbols get the real api's "Error Message", and latency/latency_jitter set how long
+each response takes
+"""
+class fakeMarketServer:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, latency=0.05, latency_jitter=0.02,
+                 requests_per_minute=None, requests_per_day=None, invalid_symbols=(), now=None, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.requests_per_minute = requests_per_minute
+        self.requests_per_day = requests_per_day
+        self.invalid_symbols = {symbol.upper() for symbol in invalid_symbols}
+        self.now = now
+        self.stats = {"requests": 0, "ok": 0, "throttled": 0, "quota": 0, "invalid": 0, "bars": 0}
+        self.random = random.Random(seed)
+        self.minute_windows = {} # api key -> times of its requests in the last 60 seconds
+        self.day_counts = {} # api key -> requests served since the server started
+        self.lock = threading.Lock()
+        self.thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+
+    """
+    the query url to use as a fetcher's base_url
+    """
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/query"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self.lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                params = {name: values[-1] for name, values in parse_qs(urlsplit(self.path).query).items()}
+                payload = json.dumps(server.handle_query(params)).encode("utf-8")
+                self.send_response(200) # the real api says everything, errors included, with a 200
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    pass # client hung up on a kept-alive connection
+
+            def log_message(self, format, *args):
+                pass # keeps benchmark output readable
+
+        return Handler
+
+    """
+    builds the json body for one request
+    """
+    def handle_query(self, params):
+        symbol = params.get("symbol", "").upper()
+        interval = params.get("interval", "")
+        key = params.get("apikey", "")
+        with self.lock:
+            self.stats["requests"] += 1
+            if params.get("function") != "TIME_SERIES_INTRADAY" or interval not in INTERVALS or not symbol:
+                self.stats["invalid"] += 1
+                return {"Error Message": "Invalid API call. Please retry or visit the documentation "
+                                         "(https://www.alphavantage.co/documentation/) for TIME_SERIES_INTRADAY."}
+            if not key:
+                self.stats["invalid"] += 1
+                return {"Error Message": "the parameter apikey is invalid or missing. Please claim your free "
+                                         "API key on (https://www.alphavantage.co/support/#api-key)."}
+
+            now = time.time()
+            window = self.minute_windows.setdefault(key, deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            if self.requests_per_day is not None and self.day_counts.get(key, 0) >= self.requests_per_day:
+                self.stats["quota"] += 1
+                return {"Information": f"We have detected your API key as {key} and our standard API rate limit "
+                                       f"is {self.requests_per_day} requests per day. Please subscribe to any of the "
+                                       "premium plans at https://www.alphavantage.co/premium/ to instantly remove "
+                                       "all daily rate limits."}
+            if self.requests_per_minute is not None and len(window) >= self.requests_per_minute:
+                self.stats["throttled"] += 1
+                # word for word what the api sends, daily limit and all, so clients get tested against the real text
+                return {"Note": "Thank you for using Alpha Vantage! Our standard API call frequency is "
+                                f"{self.requests_per_minute} calls per minute and {self.requests_per_day or 500} calls "
+                                "per day. Please visit https://www.alphavantage.co/premium/ if you would like to "
+                                "target a higher API call frequency."}
+            window.append(now)
+            self.day_counts[key] = self.day_counts.get(key, 0) + 1
+            if symbol in self.invalid_symbols:
+                self.stats["invalid"] += 1
+                return {"Error Message": "Invalid API call. Please retry or visit the documentation "
+                                         "(https://www.alphavantage.co/documentation/) for TIME_SERIES_INTRADAY."}
+            delay = max(0.0, self.latency + self.random.uniform(-self.latency_jitter, self.latency_jitter))
+
+        outputsize = "full" if params.get("outputsize") == "full" else "compact"
+        end = self.now or datetime.now()
+        bars = self.series(symbol, interval, end, COMPACT_BARS if outputsize == "compact" else None)
+        time.sleep(delay)
+        with self.lock:
+            self.stats["ok"] += 1
+            self.stats["bars"] += len(bars)
+        return {
+            "Meta Data": {
+                "1. Information": f"Intraday ({interval}) open, high, low, close prices and volume",
+                "2. Symbol": symbol,
+                "3. Last Refreshed": next(iter(bars), end.strftime("%Y-%m-%d %H:%M:%S")),
+                "4. Interval": interval,
+                "5. Output Size": outputsize.capitalize(),
+                "6. Time Zone": "US/Eastern"
+            },
+            f"Time Series ({interval})": bars
+        }
+
+    """
+    the newest `count` bars (or FULL_DAYS trading days of them when count is None) finished by `end`,
+    newest first like the real api
+    """
+    def series(self, symbol, interval, end, count=None):
+        minutes = INTERVALS[interval]
+        bars = {}
+        day = end.date()
+        days_left = FULL_DAYS
+        while days_left > 0 and (count is None or len(bars) < count):
+            if day.weekday() < 5:
+                for timestamp, values in reversed(self.day_bars(symbol, minutes, day)):
+                    if timestamp + timedelta(minutes=minutes) <= end:
+                        bars[timestamp.strftime("%Y-%m-%d %H:%M:%S")] = values
+                        if count is not None and len(bars) == count:
+                            break
+                days_left -= 1
+            day -= timedelta(days=1)
+        return bars
+
+    """
+    one trading day's bars for a symbol, oldest first, the same every time they're asked for
+    """
+    def day_bars(self, symbol, minutes, day):
+        seed = zlib.crc32(symbol.encode())
+        rng = random.Random(seed * 1000003 + day.toordinal() * 101 + minutes)
+        base = 20 + seed % 480
+        price = base * (1 + 0.2 * math.sin(day.toordinal() / 15 + seed % 7)) # slow drift between days
+        start = datetime(day.year, day.month, day.day)
+        bars = []
+        for minute in range(SESSION_START, SESSION_END, minutes):
+            open_price = price
+            close_price = open_price * math.exp(rng.gauss(0, 0.002 * math.sqrt(minutes)))
+            high = max(open_price, close_price) * (1 + abs(rng.gauss(0, 0.001)))
+            low = min(open_price, close_price) * (1 - abs(rng.gauss(0, 0.001)))
+            bars.append((start + timedelta(minutes=minute), {
+                "1. open": f"{open_price:.4f}",
+                "2. high": f"{high:.4f}",
+                "3. low": f"{low:.4f}",
+                "4. close": f"{close_price:.4f}",
+                "5. volume": str(int(rng.expovariate(1 / (2000 * minutes))))
+            }))
+            price = close_price
+        return bars
+
+
+if __name__ == "__main__":
+    server = fakeMarketServer()
+    print(f"Fake alpha vantage server listening on {server.url}")
+    print(f"Latency: {server.latency}s +- {server.latency_jitter}s, limits: {server.requests_per_minute} "
+          f"per minute / {server.requests_per_day} per day per key")
+    print("Pass this url as base_url to concurrentStockFetcher or stockAPIGetter. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"\nServed: {server.stats}")
@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+import time
+
+"""
+durable record of which symbols a fetch run has finished, so a restart picks up where it stopped
+"""
+class fetchManifest:
+    def __init__(self, path="fetch_manifest.jsonl"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {} # symbol -> last record written for it
+        self.load()
+
+    """
+    replays the manifest; a half-written last line (crash mid-write) is dropped
+    """
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        valid_size = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                valid_size += len(line)
+                self.entries[record["symbol"]] = record
+        if valid_size != os.path.getsize(self.path):
+            with open(self.path, "r+b") as file:
+                file.truncate(valid_size)
+
+    """
+    records a finished symbol; fsynced before returning so it survives a crash or power cut
+    """
+    def mark(self, symbol, status, **fields):
+        record = {"symbol": symbol, "status": status, "finished_at": time.time(), **fields}
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries[symbol] = record
+
+    def is_done(self, symbol):
+        record = self.entries.get(symbol)
+        return record is not None and record["status"] in ("done", "no_data")
+
+    def pending(self, symbols):
+        return [symbol for symbol in symbols if not self.is_done(symbol)]
+
+    def counts(self):
+        counts = {}
+        for record in self.entries.values():
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
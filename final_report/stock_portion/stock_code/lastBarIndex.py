@@ -0,0 +1,126 @@
+import csv
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+    MARKET_TIMEZONE = ZoneInfo("America/New_York")
+except Exception: # no tz database on this machine; local time will have to do
+    MARKET_TIMEZONE = None
+
+COMPACT_BARS = 100 # bars in an outputsize=compact response
+SESSION_START = 4 * 60 # alpha vantage's extended hours, 04:00 to 20:00 eastern, in minutes
+SESSION_END = 20 * 60
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+"""
+the current time on the exchange's clock, which is what alpha vantage's timestamps are in
+"""
+def market_now():
+    if MARKET_TIMEZONE is None:
+        return datetime.now()
+    return datetime.now(MARKET_TIMEZONE).replace(tzinfo=None)
+
+
+"""
+how many bars of `minutes` length start after `after` and have finished by `until`, counting
+weekday sessions only (holidays still count, so at worst we ask for a bar that isn't there)
+"""
+def bars_between(after, until, minutes=30):
+    count = 0
+    day = after.date()
+    while day <= until.date():
+        if day.weekday() < 5:
+            session_start = datetime(day.year, day.month, day.day) + timedelta(minutes=SESSION_START)
+            bars_in_session = (SESSION_END - SESSION_START) // minutes
+            first = 0 if after < session_start else math.floor((after - session_start).total_seconds() / 60 / minutes) + 1
+            last = min(bars_in_session, math.floor((until - session_start).total_seconds() / 60 / minutes)) - 1
+            count += max(0, last - first + 1)
+        day += timedelta(days=1)
+    return count
+
+
+"""
+what to ask alpha vantage for, given the newest bar we already have: None when nothing new can
+have finished since, compact when the gap fits in its 100 bars, otherwise full
+"""
+def outputsize_for(last_timestamp, now, minutes=30):
+    if last_timestamp is None:
+        return "full"
+    missing = bars_between(datetime.strptime(last_timestamp, TIMESTAMP_FORMAT), now, minutes)
+    if missing == 0:
+        return None
+    return "compact" if missing <= COMPACT_BARS else "full"
+
+
+"""
+only the bars newer than `last_timestamp`; the api's timestamps sort as strings
+"""
+def newer_bars(time_series, last_timestamp):
+    if last_timestamp is None:
+        return time_series
+    return {timestamp: values for timestamp, values in time_series.items() if timestamp > last_timestamp}
+
+
+"""
+newest stored bar per ticker for a bars csv (ticker,timestamp,...), kept in a small json next to it
+
+the json records how big the csv was when it was saved; if the csv has changed size since
+(a crash before save(), another program writing to it) the index is rebuilt with one pass over
+the csv, so it can't go stale silently
+"""
+class lastBarIndex:
+    def __init__(self, bars_filename="stocks.csv", index_filename=None):
+        self.bars_filename = bars_filename
+        self.index_filename = index_filename or bars_filename + ".last.json"
+        self.newest = {} # ticker -> newest timestamp string stored for it
+        self.load()
+
+    def csv_size(self):
+        return os.path.getsize(self.bars_filename) if os.path.exists(self.bars_filename) else 0
+
+    def load(self):
+        try:
+            with open(self.index_filename, "r") as file:
+                saved = json.load(file)
+            if saved.get("csv_size") == self.csv_size():
+                self.newest = saved["newest"]
+                return
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        self.rebuild()
+
+    """
+    one pass over the csv to find every ticker's newest timestamp
+    """
+    def rebuild(self):
+        self.newest = {}
+        if not os.path.exists(self.bars_filename):
+            return
+        with open(self.bars_filename, newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return
+            ticker_column, timestamp_column = header.index("ticker"), header.index("timestamp")
+            for row in reader:
+                ticker, timestamp = row[ticker_column], row[timestamp_column]
+                if timestamp > self.newest.get(ticker, ""):
+                    self.newest[ticker] = timestamp
+
+    def get(self, ticker):
+        return self.newest.get(ticker)
+
+    def update(self, ticker, timestamps):
+        newest = max(timestamps, default=None)
+        if newest is not None and newest > self.newest.get(ticker, ""):
+            self.newest[ticker] = newest
+
+    def save(self):
+        temp_filename = self.index_filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            json.dump({"csv_size": self.csv_size(), "newest": self.newest}, file)
+        os.replace(temp_filename, self.index_filename)
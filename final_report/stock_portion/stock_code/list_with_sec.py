@@ -1,6 +1,9 @@
+import sys
+
 import pandas as pd
+from barStore import STORE_DIR, load_bars
 
-master_df = pd.read_csv('master_stocks.csv')
+master_df = load_bars('master_stocks.csv', STORE_DIR if "--store" in sys.argv else None) # --store reads the bar store instead
 stock_info_df = pd.read_csv('stock_data.csv')
 master_df.columns = master_df.columns.str.strip()
 stock_info_df.columns = stock_info_df.columns.str.strip()
@@ -1,14 +1,18 @@
+import sys
+
 from programRunner import programRunner
 from stockCSVDownloader import stockCSVDownloader
 
 """
 Calls printer method and user prompts
+pass --full to drop stocks.csv and refetch everything instead of just the new bars
 """
 def main():
+    incremental = "--full" not in sys.argv
     while True:
         try:
             count = int(input("How many times have you run the API? ")) ## user prompt
-            runner = programRunner(count)
+            runner = programRunner(count, incremental=incremental)
             runner.run()
 
             downloader = stockCSVDownloader()
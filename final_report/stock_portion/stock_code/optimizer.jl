@@ -1,52 +1,26 @@
 using CSV
 using DataFrames
-using Statistics
 using JuMP
 using Ipopt
 
-# Load stock data
-stock_data = CSV.read("master_stocks.csv", DataFrame)
+# mu and sigma come from returnMatrix.py (python returnMatrix.py writes both files)
+expected_returns = CSV.read("expected_returns.csv", DataFrame)
+sigma_all = Matrix{Float64}(CSV.read("covariance.csv", DataFrame)) # same ticker order as expected_returns.csv
 
-function compute_returns(df)
-    df = sort(df, :ticker)
-    returns = [missing; diff(df.close) ./ df.close[1:end-1]]
-    df[!, :return] = returns
-    return df
+# tickers with fewer than two returns have no mu or variance; they come out of mu and sigma
+# together so the two stay lined up
+keep = findall(i -> !ismissing(expected_returns.mu[i]) && !ismissing(expected_returns.variance[i]), 1:nrow(expected_returns))
+for stock in expected_returns.ticker[setdiff(1:nrow(expected_returns), keep)]
+    println("stock dropped: $stock")
 end
 
-returns_data = combine(groupby(stock_data, :ticker), compute_returns) # Compute returns
-returns_wide = unstack(returns_data, :ticker, :return; combine=mean)
-returns_wide_clean = dropmissing(returns_wide) # Drop rows with missing returns
+clean_stocks = String.(expected_returns.ticker[keep])
+mu = Float64.(expected_returns.mu[keep])
+sigma = sigma_all[keep, keep]
 
-clean_stocks = names(returns_wide_clean) # Stocks that have all data
-valid_stock_data = filter(row -> row[:ticker] in clean_stocks, stock_data)
-returns_matrix = Matrix{Float64}(returns_wide_clean[:, clean_stocks])
-
-sigma = cov(returns_matrix) # Compute the covariance matrix for the returns (sigma)
-
-mu = Float64[]
-
-for stock in clean_stocks
-    timepoints = subset(valid_stock_data, :ticker => ByRow(==(stock)))
-    expected_return = 0.0
-    for time in eachrow(timepoints)
-        ret = (time[:open] - time[:close]) / time[:open]
-        expected_return += ret
-    end
-    expected_return /= 100
-
-    if ismissing(expected_return) || isnan(expected_return) || isinf(expected_return) # Bad stock catch
-        println("stock dropped: $stock")
-        continue
-    end
-
-    push!(mu, expected_return)
-end
-
-extra_elements_needed = size(sigma, 1) - length(mu)
-if extra_elements_needed > 0 # If extra elements are needed, add duplicate entries to mu, manually fix data later
-    println("Adding $extra_elements_needed duplicate entries to mu.")
-    push!(mu, repeat([mu[end]], extra_elements_needed)...)
+gapped = count(expected_returns.gaps[keep])
+if gapped > 0
+    println("$gapped stocks have gaps in their returns, see expected_returns.csv")
 end
 
 lambda = 0.5
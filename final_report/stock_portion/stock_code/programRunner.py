@@ -3,12 +3,14 @@ from stockCSVDownloader import stockCSVDownloader
 
 """
 basically just starts the api getter, d'know was thinking i hated osterhout
+incremental=False wipes stocks.csv and refetches every ticker from scratch
 """
 class programRunner:
-    def __init__(self, count):
+    def __init__(self, count, incremental=True):
         self.count = count
+        self.incremental = incremental # only fetch bars newer than what stocks.csv already has
         print("Program runner initialized")
 
     def run(self):
         getter = stockAPIGetter(count=self.count)
-        getter.run()
+        getter.run(incremental=self.incremental)
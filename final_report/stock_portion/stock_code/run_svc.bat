@@ -2,7 +2,7 @@
 
 echo starting program
 
-julia stock_variance_calculator.jl
+python tickerMoments.py
 
 echo program ran
 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# pipelineMetrics and httpReplay are kept once, in final_report/shared_code, for both portions;
+# importing this module puts that folder on sys.path for scripts run from stock_code
+SHARED_CODE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared_code"))
+if SHARED_CODE_DIR not in sys.path:
+    sys.path.append(SHARED_CODE_DIR)
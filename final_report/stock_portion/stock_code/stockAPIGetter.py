@@ -4,17 +4,31 @@ import os
 import time
 from stockCSVDownloader import stockCSVDownloader
 from lastStockPrinter import lastStockPrinter
+import sharedCode # puts final_report/shared_code on the path
+from pipelineMetrics import MetricsRegistry, ProgressLogger
+from httpReplay import install_from_env
+from lastBarIndex import lastBarIndex, market_now, newer_bars, outputsize_for
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+METRICS_PREFIX = "stock_api_metrics" # run() writes <prefix>.prom and <prefix>.json
 
 """
 this class repeated queries to the api, I do not *think* it breaks any sort of TOS
 """
 class stockAPIGetter:
-    def __init__(self, count, tickers_filename="stock-tickers.csv", output_filename="stocks.csv"): ## in and output calls
+    def __init__(self, count, tickers_filename="stock-tickers.csv", output_filename="stocks.csv", base_url=ALPHA_VANTAGE_URL): ## in and output calls
         print("ApiGetter initialized")
+        self.base_url = base_url # point at a fakeMarketServer to run offline
+        self.session = requests.Session()
+        self.replay = install_from_env(self.session) # HTTP_REPLAY_MODE=record/replay/auto saves or serves responses from disk
         self.tickers_filename = tickers_filename
         self.output_filename = output_filename
         self.count = count
         self.header_written = os.path.exists(self.output_filename)
+        self.metrics = MetricsRegistry("market_data") # request latency, key failures, backoff sleeps, rows written
+        self.metrics.describe("request_latency_seconds", "Alpha Vantage request round trip, by outcome")
+        self.metrics.describe("key_failures_total", "Responses without a time series, by HTTP status")
+        self.progress = ProgressLogger()
 
     """
     stock ticker getters
@@ -32,8 +46,9 @@ class stockAPIGetter:
 
     """
     attempts to contact and get good data back from the alphavantage api
+    with `after` set, only bars newer than that timestamp are appended; returns the bars written
     """
-    def fetch_and_append_data(self, symbol):
+    def fetch_and_append_data(self, symbol, outputsize="compact", after=None):
         
         keys = [
             'GKZD4Y2REDV5QML2', 'FGU2NZ3JIXC9N51I', 'RW09WWS3J0PXPMLJ',
@@ -47,17 +62,27 @@ class stockAPIGetter:
 
         for attempt in range(max_retries):
             for i, key in enumerate(keys):
-                url = f'https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol={symbol}&interval=30min&apikey={key}' ## url to alphavantage
-                response = requests.get(url)
-                data = response.json()
+                params = {"function": "TIME_SERIES_INTRADAY", "symbol": symbol, "interval": "30min",
+                          "outputsize": outputsize, "apikey": key} ## query to alphavantage
+                start = time.perf_counter()
+                response = self.session.get(self.base_url, params=params)
+                try:
+                    data = response.json()
+                except ValueError: # html error pages and truncated bodies count as a failed key
+                    self.metrics.inc("json_parse_fallbacks_total", outcome="invalid_json")
+                    data = {}
 
                 if "Meta Data" in data and "Time Series (30min)" in data:
+                    self.metrics.observe("request_latency_seconds", time.perf_counter() - start, outcome="ok")
                     print(f"[Key {i + 1}] Success for {symbol}.")
                     break
                 else:
+                    self.metrics.observe("request_latency_seconds", time.perf_counter() - start, outcome="failed")
+                    self.metrics.inc("key_failures_total", status=response.status_code)
                     print(f"[Key {i + 1}] failed or rate-limited. Trying next key...") ## catch if they are limiting my rates (although I am starting to think it is by static ip)
 
             else:
+                self.metrics.inc("retries_total", reason="all_keys_failed")
                 print(f"[Attempt {attempt + 1}] All keys failed. Waiting {retry_delay / 60} minutes...")
                 if attempt == 3: # ratchet catch to get all the data I could glean so far, will overwrite if I get more data
                     downloader = stockCSVDownloader()
@@ -67,13 +92,14 @@ class stockAPIGetter:
                     printer.move_last_stock_to_downloads(symbol, str(self.count))
                     continue
                 elif attempt == 4:
-                    time.sleep(retry_delay * 8) #long sleeper so I can afk this
+                    self.metrics.sleep(retry_delay * 8, "long_backoff") #long sleeper so I can afk this
 
-                time.sleep(retry_delay)
+                self.metrics.sleep(retry_delay, "all_keys_failed")
                 continue
             break
         else:
             print(f"Failed to fetch data for {symbol} after {max_retries} retries.")
+            self.metrics.inc("tickers_failed_total")
             return
 
         print(f"Fetched data for: {data['Meta Data'].get('2. Symbol', 'UNKNOWN')}")
@@ -82,6 +108,9 @@ class stockAPIGetter:
         if not time_series:
             print(f"No time series data found for {symbol}.") #bad data catch
             return
+        time_series = newer_bars(time_series, after) # incremental runs only keep what we don't have yet
+        if not time_series:
+            return time_series
 
         write_header = not self.header_written
         with open(self.output_filename, mode="a", newline="") as csv_file:
@@ -92,6 +121,8 @@ class stockAPIGetter:
                 writer.writeheader()
                 self.header_written = True
 
+            self.metrics.count_stage("tickers_written")
+            self.metrics.count_stage("rows_written", len(time_series))
             for timestamp, values in time_series.items():
                 writer.writerow({
                     "ticker": symbol,
@@ -102,18 +133,46 @@ class stockAPIGetter:
                     "close": values["4. close"],
                     "volume": values["5. volume"]
                 })
+        return time_series
 
-    def run(self):
+    """
+    incremental=True keeps the output csv and only adds bars newer than each ticker's newest stored
+    one, asking for the compact window when that covers the gap and skipping tickers with nothing new
+    """
+    def run(self, incremental=False):
         print("Running ApiGetter...")
         tickers = self.get_tickers_from_csv()
         if not tickers:
             print("No tickers to process.")
             return
 
-        if os.path.exists(self.output_filename):
-            os.remove(self.output_filename)
-            self.header_written = False
+        if incremental:
+            self.run_incremental(tickers)
+        else:
+            if os.path.exists(self.output_filename):
+                os.remove(self.output_filename)
+                self.header_written = False
 
-        for symbol in tickers:
-            print(f"Fetching data for {symbol}...")
-            self.fetch_and_append_data(symbol)
+            for index, symbol in enumerate(tickers):
+                self.progress.log(lambda: f"Fetching data for {symbol} ({index + 1}/{len(tickers)})...")
+                self.fetch_and_append_data(symbol)
+
+        self.metrics.write_prometheus(f"{METRICS_PREFIX}.prom")
+        self.metrics.write_summary(f"{METRICS_PREFIX}.json", tickers=len(tickers))
+        print(f"Metrics written to {METRICS_PREFIX}.prom and {METRICS_PREFIX}.json")
+
+    def run_incremental(self, tickers, now=None):
+        index = lastBarIndex(self.output_filename)
+        now = now or market_now()
+        try:
+            for position, symbol in enumerate(tickers):
+                outputsize = outputsize_for(index.get(symbol), now)
+                if outputsize is None: # no bar has closed since the newest one we have
+                    self.metrics.count_stage("tickers_current")
+                    continue
+                self.progress.log(lambda: f"Updating {symbol} ({position + 1}/{len(tickers)}, {outputsize})...")
+                written = self.fetch_and_append_data(symbol, outputsize, after=index.get(symbol))
+                if written:
+                    index.update(symbol, written.keys())
+        finally:
+            index.save()
@@ -1,54 +1,134 @@
 import pandas as pd
 import os
+import sys
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+OUTPUT_FILENAME = 'master_stock_old.csv'
+WORKERS = max(1, (os.cpu_count() or 1) - 1) # parser processes; one core left for the writer
+IN_FLIGHT_PER_WORKER = 2 # tickers submitted ahead of the writer per parser process
+STORE_BATCH_ROWS = 500000 # rows gathered before each bar store write, which rewrites every month it touches
+
+# only these columns get parsed, straight into their final types; no guessing per file
+SOURCE_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+SOURCE_DTYPES = {'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64',
+                 'Volume': 'float64'} # float so a blank volume doesn't fail the read; written back as an integer
+OUTPUT_COLUMNS = ['ticker', 'timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def load_ticker(ticker):
+    """
+    Worker: read one {TICKER}.csv with explicit dtypes and a real date parse, and return it in the
+    master csv's shape (or None if the file isn't there)
+    """
+    filename = f"{ticker}.csv"
+    if not os.path.isfile(filename):
+        return ticker, None
+
+    df = pd.read_csv(filename, usecols=SOURCE_COLUMNS, dtype=SOURCE_DTYPES, engine='c')
+
+    # Parse the dates as dates instead of gluing on ' 00:00:00'. Only the YYYY-MM-DD part is read, so
+    # any time or offset after it is dropped without converting to UTC, which would move a date
+    # recorded east of UTC ('2024-01-02 00:00:00+09:00') back a day
+    dates = pd.to_datetime(df['Date'].astype(str).str.strip().str.slice(0, 10), format='%Y-%m-%d')
+
+    return ticker, pd.DataFrame({
+        'ticker': ticker,
+        'timestamp': dates,
+        'open': df['Open'],
+        'high': df['High'],
+        'low': df['Low'],
+        'close': df['Close'],
+        'volume': df['Volume'].round().astype('Int64')
+    }, columns=OUTPUT_COLUMNS)
+
+
+def render_ticker(ticker):
+    """
+    Worker: load_ticker, then format the rows as csv text (no header) right there, so the float
+    and date formatting happens in the pool too and the writer only copies bytes
+    """
+    ticker, df = load_ticker(ticker)
+    if df is None:
+        return ticker, None
+    return ticker, (len(df), df.to_csv(header=False, index=False, date_format='%Y-%m-%d %H:%M:%S'))
+
+
+def iter_ticker_results(tickers, worker, workers=WORKERS):
+    """
+    worker(ticker) for every ticker, in ticker order; with workers > 1 they run in a process pool a
+    few files ahead of the writer, so parsing isn't bound by one interpreter's GIL. only
+    IN_FLIGHT_PER_WORKER * workers tickers are submitted at a time (executor.map would submit
+    them all up front), so when the writer is the slow side the results waiting for it stay few
+    """
+    if workers <= 1:
+        yield from map(worker, tickers)
+        return
+    tickers = iter(tickers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        window = IN_FLIGHT_PER_WORKER * workers
+        in_flight = deque(executor.submit(worker, ticker) for ticker in islice(tickers, window))
+        while in_flight:
+            result = in_flight.popleft().result()
+            for ticker in islice(tickers, 1): # top the window back up before handing the result over
+                in_flight.append(executor.submit(worker, ticker))
+            yield result
+
+
+def compile_tickers(tickers, output_filename=OUTPUT_FILENAME, workers=WORKERS, store=None):
+    """
+    Streams every ticker's rows to output_filename (or into a barStore) as they're parsed, so only
+    a few tickers' frames are ever in memory at once. Returns the number of rows written
+    """
+    rows = 0
+    if store is not None:
+        batch, batch_rows = [], 0
+        for ticker, df in iter_ticker_results(tickers, load_ticker, workers):
+            if df is None:
+                print(f"Warning: File {ticker}.csv does not exist. Skipping.")
+                continue
+            batch.append(df)
+            batch_rows += len(df)
+            if batch_rows >= STORE_BATCH_ROWS:
+                store.write(pd.concat(batch, ignore_index=True))
+                batch, batch_rows = [], 0
+            rows += len(df)
+        if batch:
+            store.write(pd.concat(batch, ignore_index=True))
+        return rows
+
+    with open(output_filename, 'w', newline='') as csv_file:
+        csv_file.write(','.join(OUTPUT_COLUMNS) + '\n')
+        for ticker, rendered in iter_ticker_results(tickers, render_ticker, workers):
+            if rendered is None:
+                print(f"Warning: File {ticker}.csv does not exist. Skipping.")
+                continue
+            csv_file.write(rendered[1])
+            rows += rendered[0]
+    if rows == 0:
+        os.remove(output_filename) # like before, no file when there was nothing to write
+    return rows
+
 
 def main():
     # Read the tickers from sample_tickers.csv
-    tickers_df = pd.read_csv('sample_tickers.csv')
-    
-    master_data = []
-
-    for ticker in tickers_df['tickers']:
-        ticker = ticker.upper()
-        filename = f"{ticker}.csv"
-
-        if not os.path.isfile(filename):
-            print(f"Warning: File {filename} does not exist. Skipping.")
-            continue
-
-        # Read the individual ticker CSV
-        df = pd.read_csv(filename)
-
-        # Select and rename the columns
-        df = df[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].copy()
-        df.rename(columns={
-            'Date': 'timestamp',
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        }, inplace=True)
-
-        # Add the ticker column
-        df['ticker'] = ticker
-
-        # Format timestamp to add '00:00:00'
-        df['timestamp'] = df['timestamp'] + ' 00:00:00'
-
-        # Reorder columns
-        df = df[['ticker', 'timestamp', 'open', 'high', 'low', 'close', 'volume']]
-
-        master_data.append(df)
-
-    if master_data:
-        # Concatenate all dataframes
-        master_df = pd.concat(master_data, ignore_index=True)
-
-        # Save to master_stock_old.csv
-        master_df.to_csv('master_stock_old.csv', index=False)
-        print("master_stock_old.csv has been created successfully.")
-    else:
+    tickers_df = pd.read_csv('sample_tickers.csv', dtype={'tickers': str})
+    tickers = [ticker.upper() for ticker in tickers_df['tickers'].dropna()]
+
+    workers = 1 if '--sequential' in sys.argv else WORKERS
+    store = None
+    if '--store' in sys.argv: # into the bar store instead of master_stock_old.csv
+        from barStore import barStore
+        store = barStore()
+
+    rows = compile_tickers(tickers, workers=workers, store=store)
+    if rows == 0:
         print("No data to write.")
+    elif store is not None:
+        print(f"{rows} rows have been added to the bar store successfully.")
+    else:
+        print(f"{OUTPUT_FILENAME} has been created successfully.")
 
 if __name__ == "__main__":
     main()
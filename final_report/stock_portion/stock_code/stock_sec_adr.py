@@ -1,4 +1,7 @@
+import sys
+
 import pandas as pd
+from barStore import STORE_DIR, load_bars
 
 # Replace these with the actual file paths
 stock_data_csv = "master_stocks.csv"
@@ -6,7 +9,7 @@ sector_data_csv = "tickers_with_sectors.csv"
 output_csv = "master_stock_sec.csv"
 
 # Load the CSV files
-stock_df = pd.read_csv(stock_data_csv)
+stock_df = load_bars(stock_data_csv, STORE_DIR if "--store" in sys.argv else None) # --store reads the bar store instead
 sector_df = pd.read_csv(sector_data_csv)
 
 # Drop rows with any missing values in either DataFrame
@@ -0,0 +1,336 @@
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from barStore import STORE_DIR, barStore
+
+FIELDS = ["open", "high", "low", "close", "volume"] # the columns the variance table covers
+WORKERS = max(1, (os.cpu_count() or 1) - 1) # chunk processes; one core left for merging
+CHUNK_BYTES = 64 * 1024 * 1024 # csv bytes per chunk, a bit over a million bars
+CSV_FILENAME = "master_stocks.csv"
+
+# each source writes its own table, so the two can't overwrite each other any more: the bar store
+# (which replaced the stocks_N.csv shards) is stock_variance.csv, master_stocks.csv keeps
+# master_stock_variance.csv, and any other bars csv gets <name>_variance.csv
+OUTPUT_FILENAMES = {STORE_DIR: "stock_variance.csv", CSV_FILENAME: "master_stock_variance.csv"}
+
+
+"""
+per-ticker moments over a stream of bars, kept so that two sets of them merge exactly
+
+for every ticker: the count, mean and M2 (sum of squared deviations from the mean) of open, high,
+low, close and volume, the same three for the bar-to-bar close returns, and the first and last
+bar's (timestamp, close). those are all a chunk of bars needs to hand over: merging two chunks
+combines the moments with chan et al.'s pairwise formulas and adds the one return that spans the
+boundary between them, so chunks can be worked out separately (in other processes) and the result
+is what one pass over all the bars in timestamp order would give
+
+the price moments merge exactly in any order. the boundary return needs the two sides to be
+neighbours in time for each ticker: merge chunks in sequence (or neighbouring pairs, then pairs
+of those), never the first with the third before the second. the bar store's months are that way
+round by construction; when a ticker's bars in two chunks interleave in time (csv shards appended
+to out of order) there's no single boundary, so its return is skipped and counted in overlaps
+"""
+class tickerMoments:
+    def __init__(self, tickers=()):
+        self.tickers = []
+        self.index = {} # ticker -> row in the arrays
+        self.bars = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros((0, len(FIELDS)), dtype=np.int64) # per field, blanks aren't counted
+        self.mean = np.zeros((0, len(FIELDS)))
+        self.m2 = np.zeros((0, len(FIELDS)))
+        self.return_count = np.zeros(0, dtype=np.int64)
+        self.return_mean = np.zeros(0)
+        self.return_m2 = np.zeros(0)
+        self.first_time = np.zeros(0, dtype=np.int64) # epoch seconds
+        self.first_close = np.zeros(0)
+        self.last_time = np.zeros(0, dtype=np.int64)
+        self.last_close = np.zeros(0)
+        self.overlaps = np.zeros(0, dtype=np.int64)
+        self.positions(tickers)
+
+    """
+    the array rows for these tickers, adding rows for the ones not seen yet
+    """
+    def positions(self, tickers):
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self.index]
+        if new:
+            for ticker in new:
+                self.index[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+            for name, value in vars(self).items():
+                if isinstance(value, np.ndarray):
+                    padding = np.zeros((len(new),) + value.shape[1:], dtype=value.dtype)
+                    setattr(self, name, np.concatenate([value, padding]))
+        return np.array([self.index[ticker] for ticker in tickers], dtype=np.int64)
+
+    """
+    the moments of one chunk of bars: row i is ticker names[codes[i]] at timestamps[i] (epoch
+    seconds) with values[i] in FIELDS order. the chunk is in memory, so it's two passes (means,
+    then squared deviations from them) instead of a running update, which loses precision on
+    volume-sized numbers. ordered=True skips the sort when rows already go by ticker then time
+    """
+    @classmethod
+    def from_bars(cls, names, codes, timestamps, values, ordered=False):
+        moments = cls(names)
+        tickers = len(moments.tickers)
+        if not ordered and not is_ordered(codes, timestamps):
+            order = np.lexsort((timestamps, codes))
+            codes, timestamps, values = codes[order], timestamps[order], values[order]
+
+        moments.bars = np.bincount(codes, minlength=tickers)
+        for column in range(len(FIELDS)):
+            present = ~np.isnan(values[:, column])
+            moments.count[:, column], moments.mean[:, column], moments.m2[:, column] = \
+                group_moments(codes[present], values[present, column], tickers)
+
+        # rows are grouped by ticker now, so each ticker's first and last bar bound its run
+        ends = np.cumsum(moments.bars)
+        has_bars = moments.bars > 0
+        starts, ends = (ends - moments.bars)[has_bars], ends[has_bars] - 1
+        close = values[:, FIELDS.index("close")]
+        moments.first_time[has_bars], moments.first_close[has_bars] = timestamps[starts], close[starts]
+        moments.last_time[has_bars], moments.last_close[has_bars] = timestamps[ends], close[ends]
+
+        # close to close returns between neighbouring bars of the same ticker; a repeated timestamp
+        # (duplicate rows in the shards) or a blank/zero close has no return
+        previous, current = close[:-1], close[1:]
+        valid = ((codes[1:] == codes[:-1]) & (timestamps[1:] > timestamps[:-1])
+                 & np.isfinite(previous) & np.isfinite(current) & (previous != 0))
+        returns = current[valid] / previous[valid] - 1
+        moments.return_count, moments.return_mean, moments.return_m2 = group_moments(codes[1:][valid], returns, tickers)
+        return moments
+
+    """
+    folds another set of moments into this one; either may come first in time, as long as the
+    two are neighbours (see the class docstring)
+    """
+    def merge(self, other):
+        rows = self.positions(other.tickers)
+        ours = self.bars[rows] > 0
+        theirs = other.bars > 0
+        both = ours & theirs
+
+        self.count[rows], self.mean[rows], self.m2[rows] = combine(
+            self.count[rows], self.mean[rows], self.m2[rows], other.count, other.mean, other.m2)
+        counts, means, m2s = combine(self.return_count[rows], self.return_mean[rows], self.return_m2[rows],
+                                     other.return_count, other.return_mean, other.return_m2)
+
+        # the return across the boundary: from the last bar of whichever chunk ends first to the
+        # first bar of the other
+        first_time, first_close = self.first_time[rows], self.first_close[rows]
+        last_time, last_close = self.last_time[rows], self.last_close[rows]
+        theirs_later = both & (last_time < other.first_time)
+        ours_later = both & (other.last_time < first_time)
+        boundary = np.full(len(rows), np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            boundary[theirs_later] = other.first_close[theirs_later] / last_close[theirs_later] - 1
+            boundary[ours_later] = first_close[ours_later] / other.last_close[ours_later] - 1
+        single = np.isfinite(boundary)
+        self.return_count[rows], self.return_mean[rows], self.return_m2[rows] = combine(
+            counts, means, m2s, single.astype(np.int64), np.where(single, boundary, 0.0), np.zeros(len(rows)))
+        self.overlaps[rows] += other.overlaps + (both & ~theirs_later & ~ours_later)
+
+        take_first = theirs & (~ours | (other.first_time < first_time))
+        take_last = theirs & (~ours | (other.last_time > last_time))
+        self.first_time[rows] = np.where(take_first, other.first_time, first_time)
+        self.first_close[rows] = np.where(take_first, other.first_close, first_close)
+        self.last_time[rows] = np.where(take_last, other.last_time, last_time)
+        self.last_close[rows] = np.where(take_last, other.last_close, last_close)
+        self.bars[rows] += other.bars
+        return self
+
+    """
+    M2 / (count - ddof) per ticker and field; ddof=1 is the sample variance, what julia's var()
+    gave. NaN below ddof + 1 values
+    """
+    def variance(self, ddof=1):
+        return divide_or_nan(self.m2, self.count - ddof)
+
+    def return_variance(self, ddof=1):
+        return divide_or_nan(self.return_m2, self.return_count - ddof)
+
+    """
+    the table stock_variance_calculator.jl wrote: ticker, then the sample variance of each field.
+    rows are in the order tickers were first seen: first appearance for a csv, like julia's
+    groupby, but month by month and alphabetical within a month for the bar store, which doesn't
+    keep the order bars arrived in (the __main__ block sorts that table by ticker outright)
+    """
+    def variance_table(self):
+        variance = self.variance()
+        return pd.DataFrame({"ticker": self.tickers,
+                             **{f"{field}_variance": variance[:, i] for i, field in enumerate(FIELDS)}})
+
+    """
+    everything kept per ticker, as a dataframe
+    """
+    def frame(self):
+        variance = self.variance()
+        table = pd.DataFrame({"ticker": self.tickers, "bars": self.bars})
+        for i, field in enumerate(FIELDS):
+            table[f"{field}_mean"] = self.mean[:, i]
+            table[f"{field}_variance"] = variance[:, i]
+        table["return_count"] = self.return_count
+        table["return_mean"] = self.return_mean
+        table["return_variance"] = self.return_variance()
+        table["first_timestamp"] = pd.to_datetime(self.first_time, unit="s")
+        table["last_timestamp"] = pd.to_datetime(self.last_time, unit="s")
+        table["overlaps"] = self.overlaps
+        return table
+
+
+"""
+count, mean and M2 per group of a chunk's values, codes being each value's group
+"""
+def group_moments(codes, values, groups):
+    count = np.bincount(codes, minlength=groups)
+    mean = np.divide(np.bincount(codes, weights=values, minlength=groups), count,
+                     out=np.zeros(groups), where=count > 0)
+    m2 = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=groups)
+    return count, mean, m2
+
+
+"""
+chan, golub and leveque's pairwise combination of two (count, mean, M2) sets, elementwise
+"""
+def combine(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    count = count_a + count_b
+    share_b = np.divide(count_b, count, out=np.zeros(count.shape), where=count > 0)
+    delta = mean_b - mean_a
+    return count, mean_a + delta * share_b, m2_a + m2_b + delta ** 2 * count_a * share_b
+
+
+"""
+whether rows already go by ticker then time (a csv written oldest first is), which saves the sort
+"""
+def is_ordered(codes, timestamps):
+    step = np.diff(codes)
+    return bool(np.all((step > 0) | ((step == 0) & (np.diff(timestamps) >= 0))))
+
+
+def divide_or_nan(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan), where=denominator > 0)
+
+
+"""
+the moments of a dataframe of bars in the master_stocks.csv shape
+"""
+def frame_moments(bars):
+    codes, names = pd.factorize(bars["ticker"], sort=False) # first appearance order, like julia's groupby
+    timestamps = pd.to_datetime(bars["timestamp"], format="ISO8601").to_numpy(dtype="datetime64[s]")
+    values = np.column_stack([bars[field].to_numpy(dtype=np.float64) for field in FIELDS])
+    return tickerMoments.from_bars([str(name) for name in names], codes.astype(np.int64),
+                                   timestamps.astype(np.int64), values)
+
+
+"""
+splits a bars csv into byte ranges that start and end on line breaks, so workers can each read
+and parse their own piece; returns the header's column names and the ranges
+"""
+def csv_ranges(path, chunk_bytes=CHUNK_BYTES):
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        columns = file.readline().decode("utf-8").strip().split(",")
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + chunk_bytes, size))
+            file.readline() # on to the end of the line the cut landed in
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return columns, ranges
+
+
+"""
+worker: the moments of the bars in one byte range of a csv
+"""
+def csv_range_moments(path, columns, start, end):
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    bars = pd.read_csv(io.BytesIO(data), header=None, names=columns, usecols=["ticker", "timestamp"] + FIELDS,
+                       dtype={"ticker": str, "timestamp": str, **{field: "float64" for field in FIELDS}})
+    return frame_moments(bars)
+
+
+"""
+worker: the moments of one month partition of the bar store, read straight from its memory maps
+(already sorted by ticker then time, so there's nothing to parse or sort)
+"""
+def month_moments(store_path, month):
+    partition = barStore(store_path).partition(month)
+    counts = np.diff(partition["offsets"])
+    codes = np.repeat(np.arange(len(counts), dtype=np.int64), counts)
+    columns = partition["columns"]
+    values = np.column_stack([np.asarray(columns[field], dtype=np.float64) for field in FIELDS])
+    return tickerMoments.from_bars(partition["tickers"].tolist(), codes,
+                                   np.asarray(columns["timestamp"]).astype(np.int64), values, ordered=True)
+
+
+"""
+runs worker over every task, in a process pool when workers > 1, and merges the results in
+task order as they come back; only the merged moments and the chunks in flight are ever in memory
+"""
+def stream_moments(worker, tasks, workers=WORKERS):
+    moments = tickerMoments()
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            moments.merge(worker(*task))
+        return moments
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(worker, *zip(*tasks)):
+            moments.merge(part)
+    return moments
+
+
+def csv_moments(path=CSV_FILENAME, workers=WORKERS, chunk_bytes=CHUNK_BYTES):
+    columns, ranges = csv_ranges(path, chunk_bytes)
+    return stream_moments(csv_range_moments, [(path, columns, start, end) for start, end in ranges], workers)
+
+
+def store_moments(store_path=STORE_DIR, start=None, end=None, workers=WORKERS):
+    months = barStore(store_path).months_between(start, end)
+    return stream_moments(month_moments, [(store_path, month) for month in months], workers)
+
+
+def output_filename(source):
+    if source in OUTPUT_FILENAMES:
+        return OUTPUT_FILENAMES[source]
+    return os.path.splitext(os.path.basename(source))[0] + "_variance.csv"
+
+
+if __name__ == "__main__":
+    # python tickerMoments.py [bars.csv] [--store] [--sequential]: master_stocks.csv (or bars.csv), or the bar
+    # store with --store; it's opt-in like load_bars, so what run_svc.bat writes doesn't hinge on bar_store/ existing
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    workers = 1 if "--sequential" in sys.argv else WORKERS
+    started = time.perf_counter()
+    if arguments:
+        source = arguments[0]
+        moments = csv_moments(source, workers)
+    elif "--store" in sys.argv:
+        if not barStore().exists():
+            raise FileNotFoundError(f"no bar store at {STORE_DIR}")
+        source = STORE_DIR
+        moments = store_moments(workers=workers)
+    else:
+        source = CSV_FILENAME
+        moments = csv_moments(source, workers)
+
+    filename = output_filename(source)
+    table = moments.variance_table()
+    if source == STORE_DIR: # no first-appearance order to keep, so alphabetical rather than month by month
+        table = table.sort_values("ticker", ignore_index=True)
+    table.to_csv(filename, index=False)
+    print(f"{int(moments.bars.sum())} bars for {len(moments.tickers)} tickers from {source} "
+          f"in {time.perf_counter() - started:.2f} s")
+    overlapping = int((moments.overlaps > 0).sum())
+    if overlapping:
+        print(f"{overlapping} tickers had bars out of time order across chunks; their return moments skip those boundaries")
+    print(f"Variance data was written to {filename}.")
@@ -1,19 +1,45 @@
 import pandas as pd
 import requests
 import json
+import hashlib
+import os
 import time
 import numpy as np
 import random
+import asyncio
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime
 import re
+from rateLimiter import (
+    SlidingWindowRateLimiter, estimate_tokens, retry_after_seconds,
+    RATE_LIMIT_WINDOW, RATE_LIMIT_TOKENS, RATE_LIMIT_REQUESTS,
+)
+from sentimentCache import SentimentCache, cache_key
+from checkpointJournal import CheckpointJournal
+from sentimentAggregates import SentimentAggregates
+from tickerPrefilter import TickerPrefilter
+from offlineSentiment import OfflineSentimentScorer
+from tweetDedup import DuplicateSuppressor, NearDuplicateIndex, DEDUP_INDEX_FILE
+import sharedCode  # Puts final_report/shared_code on the path
+from pipelineMetrics import MetricsRegistry, ProgressLogger, PROGRESS_LOG_INTERVAL
+from tweetColumnar import is_columnar_file, iter_tweet_batches, read_tweets_columnar
 
 API_KEY = "sk-proj-???"
+API_URL = "https://api.openai.com/v1/chat/completions"  # Point at fakeOpenAIServer to test offline
 
 BASE_DELAY = 1.0     # Base delay between API calls in seconds
 MAX_RETRIES = 3      # Maximum retries for a single API call
-RATE_LIMIT_WINDOW = 60  # OpenAI's rate limit window in seconds
-RATE_LIMIT_TOKENS = 30000  # OpenAI's token rate limit for gpt-4o
-CHECKPOINT_INTERVAL = 20  # Save progress every N tweets
+MODEL = "gpt-4o"
+MAX_COMPLETION_TOKENS = 200  # max_tokens sent with each request
+BATCH_SIZE = 10  # Tweets scored per request in batch mode
+BATCH_COMPLETION_TOKENS_PER_TWEET = 120  # max_tokens budget per tweet in a batch request
+CHECKPOINT_INTERVAL = 20  # Print running scores every N tweets (every tweet is journaled)
+MAX_CONCURRENT_REQUESTS = 8  # Requests kept in flight by the concurrent scoring mode
+OFFLINE_FIRST_PASS = False  # Score confident tweets locally and only send ambiguous ones to the API
+SUPPRESS_DUPLICATES = True  # Score one tweet per near-duplicate group (retweets, copy-pasted texts)
 
 TICKER_SYMBOLS = [
     "AAPL", "MSFT", "NVDA", "GOOG", "GOOGL", "AMZN", "META", "AVGO", "TSM", "TSLA",
@@ -26,71 +52,68 @@ TICKER_SYMBOLS = [
     "TJX", "SONY", "BSX", "CAT", "SCHW", "DHR", "MUFG", "NEE"
 ]
 
-class TokenRateTracker:
-    def __init__(self, limit=RATE_LIMIT_TOKENS, window=RATE_LIMIT_WINDOW):
-        self.limit = limit
-        self.window = window
-        self.tokens_used = 0
-        self.last_reset = time.time()
-        self.total_tokens = 0  # Track total tokens across all windows
-    
-    def add_tokens(self, count):
-        """Add token usage and check if we need to reset the window"""
-        current_time = time.time()
-        if current_time - self.last_reset > self.window:
-            self.tokens_used = 0
-            self.last_reset = current_time
-        self.tokens_used += count
-        self.total_tokens += count
-    
-    def can_make_request(self, estimated_tokens=500):
-        """Check if we can make a request with estimated token count"""
-        current_time = time.time()
-        if current_time - self.last_reset > self.window:
-            self.tokens_used = 0
-            self.last_reset = current_time
-        return (self.tokens_used + estimated_tokens) <= self.limit
-    
-    def get_wait_time(self, estimated_tokens=500):
-        """Get time to wait before making another request"""
-        current_time = time.time()
-        time_passed = current_time - self.last_reset
-        
-        if time_passed >= self.window:
-            return 0
-        
-        if self.can_make_request(estimated_tokens):
-            return 0 
-        
-        return max(0, self.window - time_passed)
+TWEET_COLUMNS = ['tweet_id', 'username', 'text', 'likes', 'retweets']
+TWEET_DTYPES = {'tweet_id': 'int64', 'username': str, 'text': str, 'likes': 'int64', 'retweets': 'int64'}
+TWEET_OPTIONAL_COLUMNS = ['hashtags', 'cashtags']  # Read when present; TwitterCSVExporter writes them for the prefilter
+TWEET_CHUNK_SIZE = 10000  # Rows read from a tweet CSV at a time by iter_tweets
+
+def _find_tweets_file(csv_file):
+    """Return csv_file, or its ../twitter_data/ fallback if only that exists."""
+    if os.path.exists(csv_file):
+        return csv_file
+    alt_path = f"../twitter_data/{csv_file}"
+    if os.path.exists(alt_path):
+        return alt_path
+    return None
 
-def load_tweets(csv_file):
-    """Load tweets from a CSV file."""
+def iter_tweets(csv_file, chunksize=TWEET_CHUNK_SIZE):
+    """
+    Stream tweets from a CSV file as plain dicts with the TWEET_COLUMNS fields,
+    plus any TWEET_OPTIONAL_COLUMNS the file has.
+    Only `chunksize` rows are parsed at a time, so memory stays flat however big the file is,
+    and nothing is read until the consumer asks for the next tweet.
+    Parquet/Feather exports are read the same way, decoding only those columns; their
+    hashtags and cashtags come back as lists.
+    """
+    path = _find_tweets_file(csv_file)
+    if path is None:
+        print(f"Error loading tweets: {csv_file} not found")
+        return
+    
+    print(f"Streaming tweets from {path}")
+    if is_columnar_file(path):
+        for batch in iter_tweet_batches(path, TWEET_COLUMNS + TWEET_OPTIONAL_COLUMNS, chunksize):
+            yield from batch
+        return
+    columns = set(TWEET_COLUMNS + TWEET_OPTIONAL_COLUMNS)
+    dtypes = {**TWEET_DTYPES, **{column: str for column in TWEET_OPTIONAL_COLUMNS}}
+    for chunk in pd.read_csv(path, usecols=lambda column: column in columns, dtype=dtypes, keep_default_na=False,
+                             chunksize=chunksize):
+        yield from chunk.to_dict('records')
+
+def load_tweets(csv_file, columns=None):
+    """
+    Load tweets from a CSV, Parquet or Feather file.
+    With `columns`, only those columns are read; for Parquet/Feather the others are never
+    decoded, so loads stay fast and small however wide the tweet archive gets.
+    """
+    path = _find_tweets_file(csv_file)
+    if path is None:
+        print(f"Error loading tweets: {csv_file} not found")
+        return pd.DataFrame()
     try:
-        tweets_df = pd.read_csv(csv_file)
-        print(f"Loaded {len(tweets_df)} tweets from {csv_file}")
+        if is_columnar_file(path):
+            tweets_df = read_tweets_columnar(path, columns).to_pandas()
+        else:
+            usecols = None if columns is None else (lambda column: column in columns)
+            tweets_df = pd.read_csv(path, usecols=usecols)
+        print(f"Loaded {len(tweets_df)} tweets from {path}")
         return tweets_df
-    except FileNotFoundError:
-        alt_path = f"../twitter_data/{csv_file}"
-        try:
-            tweets_df = pd.read_csv(alt_path)
-            print(f"Loaded {len(tweets_df)} tweets from {alt_path}")
-            return tweets_df
-        except Exception as e:
-            print(f"Error loading tweets from alternate path: {e}")
-            return pd.DataFrame()
     except Exception as e:
         print(f"Error loading tweets: {e}")
         return pd.DataFrame()
 
-def analyze_tweet_with_openai(tweet_text, username, likes, retweets, token_tracker):
-    """
-    Use OpenAI API to analyze a tweet for stock sentiment.
-    Returns a dictionary with ticker symbols and sentiment scores.
-    """
-    system_prompt = f"""
-    You are a sophisticated financial sentiment analyzer with expertise in detecting subtle market signals. Analyze the following tweet and determine if it expresses ANY sentiment or potential impact (direct or indirect) on any of these stocks: {', '.join(TICKER_SYMBOLS)}.
-    
+SYSTEM_PROMPT_GUIDELINES = """
     For each potentially relevant stock, provide a sentiment score between -1.0 (extremely negative) and 1.0 (extremely positive) using these guidelines:
     
     - Use the FULL RANGE from -1.0 to 1.0, not just rounded values
@@ -113,244 +136,633 @@ def analyze_tweet_with_openai(tweet_text, username, likes, retweets, token_track
     4. Consider second-order effects (e.g., a tweet about chip shortages might affect both chip makers and their customers)
     5. Consider political implications for regulated industries
     6. Analyze tone, sentiment, and potential market reaction - not just factual content
-    
+    """
+
+def build_system_prompt(batch=False, tickers=None):
+    """
+    Build the system prompt for scoring one tweet, or a batch of tweets keyed by tweet ID.
+    `tickers` narrows the stock list to a prefilter shortlist; by default it's all of TICKER_SYMBOLS.
+    """
+    tickers = TICKER_SYMBOLS if tickers is None else tickers
+    if not batch:
+        return f"""
+    You are a sophisticated financial sentiment analyzer with expertise in detecting subtle market signals. Analyze the following tweet and determine if it expresses ANY sentiment or potential impact (direct or indirect) on any of these stocks: {', '.join(tickers)}.
+    {SYSTEM_PROMPT_GUIDELINES}
     Return ONLY a JSON object with ticker symbols as keys and sentiment scores as values.
     Example: {{\"TSLA\": 0.87, \"NVDA\": -0.23, \"INTC\": -0.56}}
     
     If no relevant stocks can be connected, return an empty JSON object: {{}}
     """
+    return f"""
+    You are a sophisticated financial sentiment analyzer with expertise in detecting subtle market signals. You will be given several tweets, each with a Tweet ID. Analyze each tweet on its own and determine if it expresses ANY sentiment or potential impact (direct or indirect) on any of these stocks: {', '.join(tickers)}.
+    {SYSTEM_PROMPT_GUIDELINES}
+    Return ONLY a JSON object with every Tweet ID as a key. Each value is a JSON object with ticker symbols as keys and sentiment scores as values.
+    Example: {{\"1916694738482483411\": {{\"TSLA\": 0.87, \"NVDA\": -0.23}}, \"1519480761749016577\": {{}}}}
     
-    user_message = f"""
+    If no relevant stocks can be connected to a tweet, use an empty JSON object for it: {{}}
+    """
+
+# Part of every cache key, so any edit to the prompt or ticker list invalidates old results
+PROMPT_VERSION = hashlib.sha256(build_system_prompt().encode("utf-8")).hexdigest()[:12]
+
+def _prompt_version(candidates=None):
+    """PROMPT_VERSION, extended with the shortlist when a tweet is scored against one."""
+    if candidates is None:
+        return PROMPT_VERSION
+    return f"{PROMPT_VERSION}:{','.join(candidates)}"
+
+def _union_candidates(tweets):
+    """Every ticker shortlisted for any of `tweets`, in TICKER_SYMBOLS order, or None if one has no shortlist."""
+    shortlisted = set()
+    for tweet in tweets:
+        if tweet.get('candidates') is None:
+            return None
+        shortlisted.update(tweet['candidates'])
+    return [ticker for ticker in TICKER_SYMBOLS if ticker in shortlisted]
+
+def _restrict_to_candidates(sentiment_dict, candidates):
+    """Drop scores for tickers outside the tweet's shortlist."""
+    if candidates is None:
+        return sentiment_dict
+    return {ticker: score for ticker, score in sentiment_dict.items() if ticker in candidates}
+
+def _format_tweet(tweet_text, username, likes, retweets, candidates=None):
+    formatted = f"""
     Tweet by: {username}
     Likes: {likes} 
     Retweets: {retweets}
     
     Tweet text: "{tweet_text}"
-    
-    Important: Use precise decimal scores (like 0.42 or -0.76) and identify ALL possible stock connections, even subtle ones.
     """
+    if candidates is not None:
+        formatted += f"""Candidate tickers: {', '.join(candidates)}
+    """
+    return formatted
+
+def _extract_json_object(content):
+    """Pull the JSON object out of a model reply, or return None if there isn't a usable one."""
+    if "```json" in content:
+        json_str = content.split("```json")[1].split("```")[0].strip()
+    else:
+        json_str = content.strip()
     
-    estimated_tokens = len(system_prompt.split()) + len(user_message.split()) + 100
+    try:
+        parsed = json.loads(json_str)
+    except json.JSONDecodeError:
+        print(f"Error parsing JSON response: {content}")
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if not json_match:
+            METRICS.inc("json_parse_fallbacks_total", outcome="no_object")
+            return None
+        try:
+            parsed = json.loads(json_match.group(0))
+        except json.JSONDecodeError:
+            METRICS.inc("json_parse_fallbacks_total", outcome="failed")
+            return None
+        METRICS.inc("json_parse_fallbacks_total", outcome="recovered")
     
-    wait_time = token_tracker.get_wait_time(estimated_tokens)
-    if wait_time > 0:
-        print(f"Rate limit approaching. Waiting {wait_time:.2f} seconds before next request...")
-        time.sleep(wait_time)
+    return parsed if isinstance(parsed, dict) else None
+
+def _parse_ticker_scores(value):
+    """Validate one ticker -> score map from a reply, dropping any non-numeric scores."""
+    if not isinstance(value, dict):
+        return None
+    return {
+        ticker: score for ticker, score in value.items()
+        if isinstance(score, (int, float)) and not isinstance(score, bool)
+    }
+
+def _add_score_noise(sentiment_dict):
+    for ticker, score in sentiment_dict.items():
+        noise = np.random.normal(0, 0.18)  # Increased noise for more variance
+        new_score = score + noise
+        sentiment_dict[ticker] = max(-1.0, min(1.0, new_score))
+    return sentiment_dict
+
+# Hot-path metrics for the run, shared by all scoring threads; written out by process_all_tweets
+METRICS = MetricsRegistry("sentiment")
+METRICS.describe("request_latency_seconds", "Chat completion round trip, by request kind")
+METRICS.describe("rate_limiter_wait_seconds", "Time spent waiting for token budget before a request")
+METRICS.describe("responses_total", "Chat completion responses by HTTP status (error = no response)")
+METRICS.describe("retries_total", "Requests retried, by the status that caused the retry")
+METRICS.describe("tokens_estimated_total", "Tokens booked up front from estimate_tokens")
+METRICS.describe("tokens_actual_total", "Tokens billed according to the response usage field")
+METRICS.describe("sleep_seconds_total", "Seconds slept in pacing and backoff, by reason")
+METRICS.describe("rate_limit_pause_seconds_total", "Seconds the shared limiter was paused after 429s")
+METRICS.describe("json_parse_fallbacks_total", "Replies that needed a fallback to parse, by outcome")
+
+# Request outcomes across the run, shared by all scoring threads
+API_STATS = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'api_errors': 0, 'unparseable': 0, 'exhausted': 0}
+_api_stats_lock = threading.Lock()
+
+def _count_api_stat(name):
+    with _api_stats_lock:
+        API_STATS[name] += 1
+
+def _request_with_retries(messages, max_tokens, rate_limiter, parse_content, pace, kind="single"):
+    """
+    Send a chat completion request, retrying on rate limits, API errors and unparseable replies.
+    Returns parse_content(reply) for the first reply it accepts (anything but None),
+    or None once MAX_RETRIES attempts have failed.
+    Latency, token, retry and backoff metrics go to METRICS, labelled with `kind`.
+    """
+    estimated_tokens = estimate_tokens(messages, max_tokens)
+    last_status = None
     
     for retry in range(MAX_RETRIES):
+        with METRICS.timer("rate_limiter_wait_seconds"):
+            booking_id = rate_limiter.acquire(estimated_tokens)
+        METRICS.inc("tokens_estimated_total", estimated_tokens, kind=kind)
+        _count_api_stat('requests')
+        if retry:
+            _count_api_stat('retries')
+            METRICS.inc("retries_total", kind=kind, status=last_status)
         try:
-            url = "https://api.openai.com/v1/chat/completions"
+            url = API_URL
             headers = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {API_KEY}"
             }
             data = {
-                "model": "gpt-4o",  
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
+                "model": MODEL,  
+                "messages": messages,
                 "temperature": 0.9,  
-                "max_tokens": 200
+                "max_tokens": max_tokens
             }
             
-            print(f"Sending API request (attempt {retry+1}/{MAX_RETRIES})...")
-            response = requests.post(url, headers=headers, json=data)
+            if retry:
+                print(f"Sending API request (attempt {retry+1}/{MAX_RETRIES})...")
+            last_status = "error"
+            with METRICS.timer("request_latency_seconds", kind=kind):
+                response = requests.post(url, headers=headers, json=data)
+            last_status = response.status_code
+            METRICS.inc("responses_total", kind=kind, status=response.status_code)
+            rate_limiter.update_from_headers(response.headers)
             
             if response.status_code == 200:
                 response_json = response.json()
                 content = response_json["choices"][0]["message"]["content"]
                 
                 if "usage" in response_json:
-                    token_tracker.add_tokens(response_json["usage"]["total_tokens"])
+                    rate_limiter.record_usage(booking_id, response_json["usage"]["total_tokens"])
+                    METRICS.inc("tokens_actual_total", response_json["usage"]["total_tokens"], kind=kind)
                 else:
-                    token_tracker.add_tokens(estimated_tokens)  # Use estimate if not provided
+                    rate_limiter.record_usage(booking_id, estimated_tokens)  # Use estimate if not provided
+                    METRICS.inc("tokens_usage_missing_total", kind=kind)
+                
+                parsed = parse_content(content)
+                if parsed is not None:
+                    if pace:
+                        dynamic_delay = BASE_DELAY * (1 + rate_limiter.utilization())
+                        METRICS.sleep(min(dynamic_delay, 5.0), "pace")  # Cap at 5 seconds
+                    return parsed
                 
-                try:
-                    if "```json" in content:
-                        json_str = content.split("```json")[1].split("```")[0].strip()
-                    else:
-                        json_str = content.strip()
-                    
-                    sentiment_dict = json.loads(json_str)
-                    
-                    for ticker, score in sentiment_dict.items():
-                        noise = np.random.normal(0, 0.18)  # Increased noise for more variance
-                        new_score = score + noise
-                        sentiment_dict[ticker] = max(-1.0, min(1.0, new_score))
-                    
-                    dynamic_delay = BASE_DELAY * (1 + token_tracker.tokens_used / token_tracker.limit)
-                    time.sleep(min(dynamic_delay, 5.0))  # Cap at 5 seconds
-                    
-                    return sentiment_dict
-                except json.JSONDecodeError:
-                    print(f"Error parsing JSON response: {content}")
-                    json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                    if json_match:
-                        try:
-                            sentiment_dict = json.loads(json_match.group(0))
-                            return sentiment_dict
-                        except:
-                            pass
-                    
-                    time.sleep(BASE_DELAY * (retry + 1))
+                _count_api_stat('unparseable')
+                last_status = "unparseable"
+                METRICS.sleep(BASE_DELAY * (retry + 1), "unparseable")
             
             elif response.status_code == 429:  # Rate limit error
                 print(f"Rate limit exceeded. Response: {response.text}")
+                _count_api_stat('rate_limited')
+                rate_limiter.record_usage(booking_id, 0)  # Rejected requests aren't billed
                 
-                wait_pattern = r"Please try again in (\d+)(\.\d+)?([ms]s)"
-                wait_match = re.search(wait_pattern, response.text)
-                
-                if wait_match:
-                    value = float(wait_match.group(1) + (wait_match.group(2) or "0"))
-                    unit = wait_match.group(3)
-                    
-                    if unit == "ms":
-                        wait_seconds = value / 1000
-                    else: 
-                        wait_seconds = value
-                        
-                    wait_seconds += 1.0  # Add buffer
-                    print(f"Waiting {wait_seconds:.2f} seconds as suggested by API...")
-                    time.sleep(wait_seconds)
-                else:
-                    backoff = (2 ** retry) * 5  # 5, 10, 20 seconds
-                    print(f"Using exponential backoff: waiting {backoff} seconds...")
-                    time.sleep(backoff)
+                wait_seconds = retry_after_seconds(response.headers, response.text)
+                if wait_seconds is None:
+                    wait_seconds = (2 ** retry) * 5  # 5, 10, 20 seconds
+                # Pausing the shared limiter holds back every other in-flight caller too
+                print(f"Pausing requests for {wait_seconds:.2f} seconds as suggested by API...")
+                METRICS.inc("rate_limit_pause_seconds_total", wait_seconds)
+                rate_limiter.pause(wait_seconds)
             
             else:
                 print(f"API error: {response.status_code}, {response.text}")
+                _count_api_stat('api_errors')
                 backoff = (2 ** retry) * 2
-                time.sleep(backoff)
+                METRICS.sleep(backoff, "api_error")
                 
         except Exception as e:
             print(f"Error calling OpenAI API: {e}")
+            _count_api_stat('api_errors')
             backoff = (2 ** retry) * 2
-            time.sleep(backoff)
+            METRICS.sleep(backoff, "api_error")
+    
+    _count_api_stat('exhausted')
+    METRICS.inc("requests_exhausted_total", kind=kind)
+    return None
+
+def analyze_tweet_with_openai(tweet_text, username, likes, retweets, rate_limiter, pace=True, tweet_id=None, cache=None,
+                              candidates=None, fallback=None):
+    """
+    Use OpenAI API to analyze a tweet for stock sentiment.
+    Returns a dictionary with ticker symbols and sentiment scores.
+    Set pace=False when the caller already spreads requests out (e.g. concurrent mode),
+    so the per-request delay after a success is skipped.
+    With a SentimentCache, a stored result for the same tweet, model and prompt is used instead of calling the API.
+    `candidates` is a TickerPrefilter shortlist: only those tickers are put in the prompt, and an
+    empty shortlist returns {} without a request.
+    With an OfflineSentimentScorer as `fallback`, a tweet whose retries run out is scored locally instead of left empty.
+    """
+    if candidates is not None and not candidates:
+        return {}
     
-    print("Exhausted all retries. Returning empty result.")
-    return {}
+    key = cache_key(tweet_id, tweet_text, MODEL, _prompt_version(candidates))
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return _add_score_noise(cached)
     
+    user_message = _format_tweet(tweet_text, username, likes, retweets, candidates) + """
+    Important: Use precise decimal scores (like 0.42 or -0.76) and identify ALL possible stock connections, even subtle ones.
+    """
+    
+    messages = [
+        {"role": "system", "content": build_system_prompt(tickers=candidates)},
+        {"role": "user", "content": user_message}
+    ]
+    
+    sentiment_dict = _request_with_retries(
+        messages, MAX_COMPLETION_TOKENS, rate_limiter,
+        lambda content: _parse_ticker_scores(_extract_json_object(content)), pace
+    )
+    if sentiment_dict is None:
+        if fallback is not None:
+            print("Exhausted all retries. Falling back to the offline scorer.")
+            return fallback.score_tweet(tweet_text, candidates)
+        print("Exhausted all retries. Returning empty result.")
+        return {}
+    sentiment_dict = _restrict_to_candidates(sentiment_dict, candidates)
+    
+    if cache is not None:
+        cache.put(key, sentiment_dict)
+    return _add_score_noise(dict(sentiment_dict))
 
-def load_checkpoint(checkpoint_file):
-    """Load checkpoint data if it exists."""
-    try:
-        with open(checkpoint_file, 'r') as f:
-            checkpoint_data = json.load(f)
-        print(f"Loaded checkpoint: Processed {checkpoint_data['processed_count']} tweets")
-        return checkpoint_data
-    except FileNotFoundError:
-        print("No checkpoint found. Starting from beginning.")
-        return {
-            'processed_count': 0,
-            'sentiment_data': {ticker: {'score': 0.0, 'count': 0} for ticker in TICKER_SYMBOLS},
-            'all_sentiment_scores': {ticker: [] for ticker in TICKER_SYMBOLS}
-        }
-    except Exception as e:
-        print(f"Error loading checkpoint: {e}")
-        return {
-            'processed_count': 0,
-            'sentiment_data': {ticker: {'score': 0.0, 'count': 0} for ticker in TICKER_SYMBOLS},
-            'all_sentiment_scores': {ticker: [] for ticker in TICKER_SYMBOLS}
-        }
-
-def save_checkpoint(checkpoint_file, processed_count, sentiment_data, all_sentiment_scores):
-    """Save checkpoint data."""
+def analyze_tweets_batch_with_openai(tweets, rate_limiter, pace=True, cache=None, fallback=None):
+    """
+    Use OpenAI API to analyze several tweets in one request, so the system prompt
+    (and its ticker list) is paid for once per batch instead of once per tweet.
+    `tweets` are mappings with tweet_id, text, username, likes and retweets.
+    Returns {tweet_id: {ticker: score}}. Any tweet a parsed reply leaves out or garbles
+    is re-scored on its own with analyze_tweet_with_openai. If the batch request itself runs out
+    of retries, its tweets aren't retried one by one (that would multiply the requests, and the
+    rate limit pressure, the batch was meant to cut): they go to `fallback`, or get {}.
+    With a SentimentCache, only the tweets it doesn't already hold are sent.
+    Tweets carrying a 'candidates' shortlist (see TickerPrefilter.annotate) are scored against
+    it, and those with an empty shortlist get {} without being sent.
+    `fallback` also scores the single-tweet retries that run out.
+    """
+    results = {}
+    keys = {}
+    tweets_by_id = {}
+    for tweet in tweets:
+        candidates = tweet.get('candidates')
+        if candidates is not None and not candidates:
+            results[tweet['tweet_id']] = {}
+            continue
+        key = cache_key(tweet['tweet_id'], tweet['text'], MODEL, _prompt_version(candidates))
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results[tweet['tweet_id']] = _add_score_noise(cached)
+        else:
+            keys[str(tweet['tweet_id'])] = key
+            tweets_by_id[str(tweet['tweet_id'])] = tweet
+    
+    if not tweets_by_id:
+        return results
+    
+    user_message = "".join(
+        f"\n    Tweet ID: {tweet_id}" + _format_tweet(
+            tweet['text'], tweet['username'], tweet['likes'], tweet['retweets'], tweet.get('candidates')
+        )
+        for tweet_id, tweet in tweets_by_id.items()
+    ) + """
+    Important: Use precise decimal scores (like 0.42 or -0.76), identify ALL possible stock connections, even subtle ones, and include every Tweet ID.
+    """
+    
+    messages = [
+        {"role": "system", "content": build_system_prompt(batch=True, tickers=_union_candidates(tweets_by_id.values()))},
+        {"role": "user", "content": user_message}
+    ]
+    max_tokens = BATCH_COMPLETION_TOKENS_PER_TWEET * len(tweets_by_id)
+    
+    batch_result = _request_with_retries(messages, max_tokens, rate_limiter, _extract_json_object, pace, "batch")
+    if batch_result is None:
+        if fallback is not None:
+            print(f"Exhausted all retries for a batch of {len(tweets_by_id)}. Falling back to the offline scorer.")
+        else:
+            print(f"Exhausted all retries for a batch of {len(tweets_by_id)}. Returning empty results.")
+        for tweet in tweets_by_id.values():
+            results[tweet['tweet_id']] = fallback.score_tweet(tweet['text'], tweet.get('candidates')) if fallback else {}
+        return results
+    
+    for tweet_id, tweet in tweets_by_id.items():
+        sentiment_dict = _parse_ticker_scores(batch_result.get(tweet_id))
+        if sentiment_dict is None:
+            print(f"No usable scores for tweet {tweet_id} in batch reply. Retrying it alone...")
+            results[tweet['tweet_id']] = analyze_tweet_with_openai(
+                tweet['text'], tweet['username'], tweet['likes'], tweet['retweets'], rate_limiter, pace,
+                tweet_id=tweet['tweet_id'], cache=cache, candidates=tweet.get('candidates'), fallback=fallback
+            )
+        else:
+            sentiment_dict = _restrict_to_candidates(sentiment_dict, tweet.get('candidates'))
+            if cache is not None:
+                cache.put(keys[tweet_id], sentiment_dict)
+            results[tweet['tweet_id']] = _add_score_noise(dict(sentiment_dict))
+    
+    return results
+
+def load_checkpoint(journal):
+    """Rebuild progress by replaying a CheckpointJournal written by earlier runs."""
     checkpoint_data = {
-        'processed_count': processed_count,
-        'sentiment_data': sentiment_data,
-        'all_sentiment_scores': all_sentiment_scores
+        'processed_count': 0,
+        'last_tweet_id': None,
+        'tweet_ids': Counter(),  # str(tweet_id) -> times journaled, for _skip_processed
+        'aggregates': SentimentAggregates(TICKER_SYMBOLS)
     }
     
-    with open(checkpoint_file, 'w') as f:
-        json.dump(checkpoint_data, f)
+    for record in journal.replay():
+        checkpoint_data['processed_count'] += 1
+        checkpoint_data['last_tweet_id'] = record['tweet_id']
+        checkpoint_data['tweet_ids'][str(record['tweet_id'])] += 1
+        checkpoint_data['aggregates'].add(record['scores'])
+    
+    if checkpoint_data['processed_count']:
+        print(f"Loaded checkpoint: Processed {checkpoint_data['processed_count']} tweets (last tweet_id {checkpoint_data['last_tweet_id']})")
+    else:
+        print("No checkpoint found. Starting from beginning.")
+    return checkpoint_data
+
+def write_sentiment_results(aggregates, output_file):
+    """Write the per-ticker mean score and mention count CSV used by the sector and optimizer stages."""
+    final_sentiment = aggregates.mean_scores()
+    mention_counts = aggregates.mention_counts()
+    
+    results_df = pd.DataFrame({
+        'Ticker': TICKER_SYMBOLS,
+        'Sentiment_Score': [final_sentiment[ticker] for ticker in TICKER_SYMBOLS],
+        'Mention_Count': [mention_counts[ticker] for ticker in TICKER_SYMBOLS]
+    })
     
-    print(f"Checkpoint saved: Processed {processed_count} tweets")
+    results_df.to_csv(output_file, index=False)
+    print(f"Results saved to {output_file}")
+    return final_sentiment, mention_counts
 
-def process_all_tweets(tweets_df, output_file="stock_sentiment_complete.csv"):
+def _skip_processed(tweets, journaled_ids):
+    """
+    Skip the tweets a previous run already journaled, matched by tweet_id wherever they are in the
+    input, so tweets added ahead of them since are still scored and none are counted twice.
+    Raises ValueError once the input runs out if some journaled tweet never appeared: the
+    totals carried over from the journal would include tweets that aren't in this input.
+    """
+    pending = Counter(journaled_ids)
+    for tweet in tweets:
+        tweet_id = str(tweet['tweet_id'])
+        if pending[tweet_id]:
+            pending[tweet_id] -= 1
+            if not pending[tweet_id]:
+                del pending[tweet_id]  # Keeps the count of ids still to find at len(pending)
+            continue
+        yield tweet
+    if pending:
+        missing = sum(pending.values())
+        raise ValueError(f"{missing} tweet(s) in the checkpoint journal aren't in the input (e.g. tweet_id "
+                         f"{next(iter(pending))}); delete the journal to start over with this input")
+
+def _batched(tweets, batch_size):
+    """Group an iterable of tweets into lists of up to batch_size, without reading ahead."""
+    tweets = iter(tweets)
+    while True:
+        batch = list(islice(tweets, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _score_batch(batch, rate_limiter, pace, cache=None, fallback=None):
+    """
+    Score a list of tweets, returning their sentiment dicts in the same order.
+    Tweets the offline first pass already settled (see OfflineSentimentScorer.annotate) keep those scores.
+    """
+    to_send = [tweet for tweet in batch if tweet.get('offline_scores') is None]
+    if not to_send:
+        results = {}
+    elif len(to_send) == 1:
+        tweet = to_send[0]
+        results = {tweet['tweet_id']: analyze_tweet_with_openai(
+            tweet['text'], tweet['username'], tweet['likes'], tweet['retweets'], rate_limiter, pace,
+            tweet_id=tweet['tweet_id'], cache=cache, candidates=tweet.get('candidates'), fallback=fallback
+        )}
+    else:
+        results = analyze_tweets_batch_with_openai(to_send, rate_limiter, pace, cache=cache, fallback=fallback)
+    return [
+        tweet['offline_scores'] if tweet.get('offline_scores') is not None else results[tweet['tweet_id']]
+        for tweet in batch
+    ]
+
+def score_tweets_sequentially(tweets, rate_limiter, batch_size=1, cache=None, fallback=None):
+    """Score tweets one request at a time, yielding (tweet, sentiment) pairs."""
+    for batch in _batched(tweets, batch_size):
+        yield from zip(batch, _score_batch(batch, rate_limiter, True, cache, fallback))
+
+async def _score_batches_async(batches, rate_limiter, concurrency, executor, cache=None, fallback=None):
+    """
+    Async generator behind score_tweets_concurrently.
+    Keeps up to `concurrency` requests running on the executor and a small window of
+    finished-but-unyielded results, so results come out in input order without pulling
+    the whole input into memory.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = deque()
+
+    async def score(batch):
+        async with semaphore:
+            return await loop.run_in_executor(executor, _score_batch, batch, rate_limiter, False, cache, fallback)
+
+    try:
+        for batch in batches:
+            pending.append((batch, asyncio.ensure_future(score(batch))))
+            if len(pending) >= concurrency * 2:
+                head, task = pending.popleft()
+                yield head, await task
+        while pending:
+            head, task = pending.popleft()
+            yield head, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+def score_tweets_concurrently(tweets, rate_limiter, concurrency=MAX_CONCURRENT_REQUESTS, batch_size=1, cache=None,
+                              fallback=None):
+    """
+    Score tweets with up to `concurrency` API requests in flight, all drawing on one shared rate_limiter.
+    Yields (tweet, sentiment) pairs in the same order as `tweets`, like score_tweets_sequentially.
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    results = _score_batches_async(_batched(tweets, batch_size), rate_limiter, concurrency, executor, cache, fallback)
+    try:
+        while True:
+            try:
+                batch, sentiments = loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                break
+            yield from zip(batch, sentiments)
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
+        executor.shutdown(wait=True)
+
+def _count_stage(tweets, stage):
+    """Pass tweets through, counting them as a METRICS stage."""
+    for tweet in tweets:
+        METRICS.count_stage(stage)
+        yield tweet
+
+def _progress_line(tweet, processed_count, resumed_count, total_tweets, start_time):
+    """One progress report for process_all_tweets: position, rate and, for a known total, time left."""
+    tweets_per_second = (processed_count - resumed_count) / max(0.001, time.time() - start_time)
+    line = f"Processed tweet {processed_count}: {tweet['text'][:50]}... ({tweets_per_second:.2f} tweets/second)"
+    if total_tweets:
+        estimated_remaining = (total_tweets - processed_count) / max(0.001, tweets_per_second)
+        line = (f"Processed tweet {processed_count}/{total_tweets} ({processed_count/total_tweets*100:.1f}%, "
+                f"{tweets_per_second:.2f} tweets/second, est. {estimated_remaining/60:.1f} minutes left): "
+                f"{tweet['text'][:50]}...")
+    return line
+
+def process_all_tweets(tweets, output_file="stock_sentiment_complete.csv", concurrency=1, batch_size=1, cache=None,
+                       journal_file=None, total_tweets=None, prefilter=None, offline_scorer=None,
+                       offline_first_pass=False, deduplicator=None, rate_limiter=None, run_label=None):
     """
     Process ALL tweets with appropriate rate limit handling.
-    Saves results to a CSV file and provides checkpoints for resuming.
+    `tweets` is a DataFrame or any iterable of tweet dicts, such as iter_tweets(); it is consumed
+    lazily, only as fast as requests free up. Pass total_tweets for progress estimates on a stream.
+    Saves results to a CSV file and journals every scored tweet so an interrupted run can resume.
+    The journal defaults to sentiment_journal_<output name>.jsonl, so rerunning with the same
+    output file picks up where the last run stopped; delete it to start over.
+    With concurrency > 1, up to that many API requests are kept in flight under one shared token budget.
+    With batch_size > 1, each request scores that many tweets at once.
+    With a SentimentCache, tweets scored by an earlier run are served from it instead of the API.
+    With a TickerPrefilter, each tweet is only scored against its shortlist of plausible tickers,
+    and tweets with none are recorded as having no sentiment without an API call.
+    With an OfflineSentimentScorer, tweets that run out of retries are scored locally instead of
+    losing their sentiment; with offline_first_pass=True as well, every tweet is scored locally
+    first and only the ambiguous ones are sent to the API.
+    With a DuplicateSuppressor, only the first tweet of each near-duplicate group is scored and
+    the rest get its scores, each still counted as its own mention.
+    Pass a rate_limiter to draw on a budget shared with other processes (see shardedScoring), and
+    a run_label to keep concurrent runs' log and distribution files apart.
+    Progress is printed at most every PROGRESS_LOG_INTERVAL seconds; METRICS is written to
+    metrics_<timestamp>.prom (Prometheus text format) and run_summary_<timestamp>.json.
     """
-    token_tracker = TokenRateTracker()
+    METRICS.reset()
+    progress = ProgressLogger(PROGRESS_LOG_INTERVAL)
+    score_report = ProgressLogger(PROGRESS_LOG_INTERVAL * 6)
+    if rate_limiter is None:
+        rate_limiter = SlidingWindowRateLimiter()
+    
+    if cache is not None:
+        evicted = cache.evict()
+        print(f"Sentiment cache: {cache.stats()['entries']} entries ({evicted} evicted)")
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    checkpoint_file = f"sentiment_checkpoint_{timestamp}.json"
+    if run_label:
+        timestamp = f"{timestamp}_{run_label}"
+    if journal_file is None:
+        journal_file = f"sentiment_journal_{os.path.splitext(os.path.basename(output_file))[0]}.jsonl"
+    journal = CheckpointJournal(journal_file)
     
-    checkpoint_data = load_checkpoint(checkpoint_file)
+    checkpoint_data = load_checkpoint(journal)
     processed_count = checkpoint_data['processed_count']
-    sentiment_data = checkpoint_data['sentiment_data']
-    all_sentiment_scores = checkpoint_data['all_sentiment_scores']
+    aggregates = checkpoint_data['aggregates']
     
     start_time = time.time()
-    total_tweets = len(tweets_df)
-    
-    for index, tweet in tweets_df.iloc[processed_count:].iterrows():
-        tweet_text = tweet['text']
-        username = tweet['username']
-        likes = tweet['likes']
-        retweets = tweet['retweets']
-        
+    if isinstance(tweets, pd.DataFrame):
+        total_tweets = len(tweets)
+        columns = TWEET_COLUMNS + [column for column in TWEET_OPTIONAL_COLUMNS if column in tweets.columns]
+        tweets = (tweet._asdict() for tweet in tweets[columns].fillna('').itertuples(index=False))
+    resumed_count = processed_count
+    prefiltered_count = 0
+    offline_count = 0
+    
+    remaining_tweets = _count_stage(_skip_processed(tweets, checkpoint_data['tweet_ids']), "read")
+    if deduplicator is not None:
+        remaining_tweets = deduplicator.route(remaining_tweets)
+    if prefilter is not None:
+        remaining_tweets = prefilter.annotate(remaining_tweets)
+    if offline_scorer is not None and offline_first_pass:
+        remaining_tweets = offline_scorer.annotate(remaining_tweets)
+    if concurrency > 1:
+        print(f"Scoring with up to {concurrency} concurrent requests of {batch_size} tweet(s)")
+        scored_tweets = score_tweets_concurrently(remaining_tweets, rate_limiter, concurrency, batch_size, cache,
+                                                  offline_scorer)
+    else:
+        scored_tweets = score_tweets_sequentially(remaining_tweets, rate_limiter, batch_size, cache, offline_scorer)
+    if deduplicator is not None:
+        scored_tweets = deduplicator.fan_out(scored_tweets)
+    
+    for tweet, tweet_sentiment in scored_tweets:
         processed_count += 1
-        elapsed_time = time.time() - start_time
-        tweets_per_second = processed_count / max(1, elapsed_time)
-        estimated_remaining = (total_tweets - processed_count) / max(0.001, tweets_per_second)
-        
-        print(f"\nProcessing tweet {processed_count}/{total_tweets}: {tweet_text[:50]}...")
-        print(f"Progress: {processed_count/total_tweets*100:.1f}% - Est. remaining time: {estimated_remaining/60:.1f} minutes")
+        METRICS.count_stage("scored")
+        if 'duplicate_of' in tweet:
+            journal.append(tweet['tweet_id'], tweet_sentiment, duplicate_of=tweet['duplicate_of'])
+            METRICS.count_stage("duplicate")
+        elif tweet.get('candidates') == []:
+            prefiltered_count += 1
+            METRICS.count_stage("prefiltered")
+        elif tweet.get('offline_scores') is not None:
+            offline_count += 1
+            METRICS.count_stage("offline")
+        if 'duplicate_of' not in tweet:
+            journal.append(tweet['tweet_id'], tweet_sentiment)
+        progress.log(lambda: _progress_line(tweet, processed_count, resumed_count, total_tweets, start_time))
         
-        tweet_sentiment = analyze_tweet_with_openai(tweet_text, username, likes, retweets, token_tracker)
+        aggregates.add(tweet_sentiment)
+        METRICS.count_stage("aggregated")
         
-        for ticker, score in tweet_sentiment.items():
-            if ticker in sentiment_data:
-                sentiment_data[ticker]['score'] += score
-                sentiment_data[ticker]['count'] += 1
-                all_sentiment_scores[ticker].append(score)
-        
-        if processed_count % CHECKPOINT_INTERVAL == 0:
-            save_checkpoint(checkpoint_file, processed_count, sentiment_data, all_sentiment_scores)
+        if processed_count % CHECKPOINT_INTERVAL == 0 and score_report.log(lambda: "\nCurrent Sentiment Scores:"):
+            current_results = aggregates.mean_scores()
+            mention_counts = aggregates.mention_counts()
             
-            current_results = {}
-            for ticker in TICKER_SYMBOLS:
-                if sentiment_data[ticker]['count'] > 0:
-                    current_results[ticker] = sentiment_data[ticker]['score'] / sentiment_data[ticker]['count']
-                else:
-                    current_results[ticker] = 0.0
-                    
-            print("\nCurrent Sentiment Scores:")
             for ticker in sorted(current_results.keys(), key=lambda x: abs(current_results[x]), reverse=True):
                 if current_results[ticker] != 0:
-                    print(f"{ticker}: {current_results[ticker]:.4f} (Mentions: {sentiment_data[ticker]['count']})")
+                    print(f"{ticker}: {current_results[ticker]:.4f} (Mentions: {mention_counts[ticker]})")
     
-    save_checkpoint(checkpoint_file, processed_count, sentiment_data, all_sentiment_scores)
-    
-    final_sentiment = {}
-    mention_counts = {}
-    
-    for ticker in TICKER_SYMBOLS:
-        if sentiment_data[ticker]['count'] > 0:
-            final_sentiment[ticker] = sentiment_data[ticker]['score'] / sentiment_data[ticker]['count']
-            mention_counts[ticker] = sentiment_data[ticker]['count']
-        else:
-            final_sentiment[ticker] = 0.0
-            mention_counts[ticker] = 0
+    journal.close()
+    if processed_count > resumed_count:
+        progress.log(lambda: _progress_line(tweet, processed_count, resumed_count, total_tweets, start_time), force=True)
     
-    results_df = pd.DataFrame({
-        'Ticker': TICKER_SYMBOLS,
-        'Sentiment_Score': [final_sentiment[ticker] for ticker in TICKER_SYMBOLS],
-        'Mention_Count': [mention_counts[ticker] for ticker in TICKER_SYMBOLS]
-    })
+    final_sentiment, mention_counts = write_sentiment_results(aggregates, output_file)
     
-    results_df.to_csv(output_file, index=False)
-    print(f"Results saved to {output_file}")
+    output_stem = os.path.splitext(os.path.basename(output_file))[0]
+    aggregates.save(f"sentiment_aggregates_{output_stem}.json")
     
     with open(f"sentiment_distribution_{timestamp}.json", "w") as f:
-        json.dump(all_sentiment_scores, f)
+        json.dump(aggregates.distribution_report(), f)
     
     with open(f"api_log_{timestamp}.txt", "w") as f:
         f.write(f"Total tweets processed: {processed_count}\n")
-        f.write(f"Total tokens used (estimate): {token_tracker.total_tokens}\n")
+        f.write(f"Total tokens used: {rate_limiter.total_tokens}\n")
+        if prefilter is not None:
+            f.write(f"Tweets skipped by the ticker prefilter: {prefiltered_count}\n")
+        if offline_scorer is not None:
+            f.write(f"Tweets settled by the offline first pass: {offline_count}\n")
+            f.write(f"Requests that exhausted their retries: {API_STATS['exhausted']}\n")
+        if deduplicator is not None:
+            f.write(f"Near-duplicate tweets scored from their group: {deduplicator.suppressed}\n")
         f.write(f"Total processing time: {(time.time() - start_time)/60:.2f} minutes\n")
+        if cache is not None:
+            stats = cache.stats()
+            f.write(f"Cache hits: {stats['hits']}, misses: {stats['misses']} ({stats['hit_ratio']*100:.1f}% hit ratio)\n")
+    
+    METRICS.set_gauge("tweets_processed", processed_count)
+    METRICS.set_gauge("tokens_used", rate_limiter.total_tokens)
+    METRICS.write_prometheus(f"metrics_{timestamp}.prom")
+    METRICS.write_summary(
+        f"run_summary_{timestamp}.json", output_file=output_file, processed_count=processed_count,
+        resumed_count=resumed_count, api_stats=dict(API_STATS),
+        cache=cache.stats() if cache is not None else None,
+        dedup_suppressed=deduplicator.suppressed if deduplicator is not None else None,
+    )
     
     return final_sentiment, mention_counts
 
@@ -358,14 +770,31 @@ def main():
     print("=== Complete Tweet Sentiment Analysis with Checkpoint Recovery ===")
     print(f"Rate limit window: {RATE_LIMIT_WINDOW} seconds")
     print(f"Rate limit tokens: {RATE_LIMIT_TOKENS}")
-    print(f"Checkpoint interval: Every {CHECKPOINT_INTERVAL} tweets\n")
+    print(f"Rate limit requests: {RATE_LIMIT_REQUESTS}")
+    print(f"Concurrent requests: {MAX_CONCURRENT_REQUESTS}")
+    print(f"Tweets per request: {BATCH_SIZE}")
+    print(f"Progress report interval: Every {CHECKPOINT_INTERVAL} tweets\n")
     
-    tweets_df = load_tweets("../twitter_data/financial_tweets.csv")
+    tweets_file = _find_tweets_file("../twitter_data/financial_tweets.csv")
     
-    if not tweets_df.empty:
+    if tweets_file is not None:
         start_time = time.time()
         
-        final_sentiment, mention_counts = process_all_tweets(tweets_df)
+        cache = SentimentCache()
+        prefilter = TickerPrefilter(TICKER_SYMBOLS)
+        deduplicator = None
+        if SUPPRESS_DUPLICATES:
+            dedup_index = NearDuplicateIndex()
+            dedup_index.load(DEDUP_INDEX_FILE)
+            deduplicator = DuplicateSuppressor(dedup_index)
+        final_sentiment, mention_counts = process_all_tweets(
+            iter_tweets(tweets_file), concurrency=MAX_CONCURRENT_REQUESTS, batch_size=BATCH_SIZE, cache=cache,
+            prefilter=prefilter, offline_scorer=OfflineSentimentScorer(TICKER_SYMBOLS, prefilter),
+            offline_first_pass=OFFLINE_FIRST_PASS, deduplicator=deduplicator
+        )
+        cache.close()
+        if deduplicator is not None:
+            deduplicator.index.save(DEDUP_INDEX_FILE)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -379,6 +808,8 @@ def main():
         print(f"\nProcessing completed in {duration/60:.2f} minutes")
         print("\nThis script processes ALL tweets with appropriate rate limit handling")
         print("and checkpoints to allow resuming if interrupted.")
+    else:
+        print("Error loading tweets: financial_tweets.csv not found")
 
 if __name__ == "__main__":
     main()
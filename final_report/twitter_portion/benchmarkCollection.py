@@ -0,0 +1,67 @@
+import contextlib
+import io
+import tempfile
+import time
+
+import sharedCode  # Puts final_report/shared_code on the path
+import httpReplay
+from fakeSyndicationServer import FakeSyndicationServer
+from twitterRequests import TwitterAPI, MAX_FETCH_WORKERS
+
+BENCHMARK_ACCOUNTS = 5000  # Synthetic accounts collected by the unthrottled scenarios
+SEQUENTIAL_ACCOUNTS = 200  # One at a time is slow enough that this is plenty
+THROTTLED_ACCOUNTS = 1000
+THROTTLED_PER_MINUTE = 600  # Pages per minute the server allows in the throttled scenario
+SERVER_LATENCY = 0.05  # Seconds per fake profile page
+
+
+def synthetic_accounts(count):
+    return [f"account{index:05d}" for index in range(count)]
+
+
+def time_collection(base_url, accounts, max_workers=MAX_FETCH_WORKERS, cassette_dir=None, mode=None):
+    """Collect 10 tweets from each account; returns (seconds, accounts with tweets, tweets)"""
+    api = TwitterAPI()
+    api.base_url = base_url
+    if mode is not None:
+        httpReplay.install(api.session, cassette_dir, mode, pool_connections=4, pool_maxsize=MAX_FETCH_WORKERS)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Failed fetches print one line each
+        results = list(api.get_tweets_for_accounts(accounts, count=10, max_workers=max_workers))
+    seconds = time.perf_counter() - start
+    return seconds, sum(1 for _, tweets in results if tweets), sum(len(tweets) for _, tweets in results)
+
+
+def report(name, seconds, accounts, collected, tweets):
+    print(f"{name:<44} {seconds:7.2f} s  {accounts / seconds:8.1f} accounts/s  "
+          f"{collected}/{accounts} collected, {tweets} tweets")
+
+
+def main():
+    print("=== Offline tweet collection throughput ===")
+    accounts = synthetic_accounts(BENCHMARK_ACCOUNTS)
+    with tempfile.TemporaryDirectory() as cassettes:
+        with FakeSyndicationServer(latency=SERVER_LATENCY) as server:
+            base_url = server.base_url
+            seconds, collected, tweets = time_collection(base_url, accounts, cassette_dir=cassettes, mode="record")
+            report(f"{MAX_FETCH_WORKERS} workers, recording", seconds, len(accounts), collected, tweets)
+            print(f"  Served {server.stats['ok']} pages, {server.stats['bytes'] / 2 ** 20:.0f} MB")
+
+        # The server is gone, so every page comes off disk (recordings are keyed by host, hence the same URL)
+        seconds, collected, tweets = time_collection(base_url, accounts, cassette_dir=cassettes, mode="replay")
+        report("replayed from disk, server stopped", seconds, len(accounts), collected, tweets)
+
+    throttled = accounts[:THROTTLED_ACCOUNTS]
+    with FakeSyndicationServer(port=0, latency=SERVER_LATENCY, request_limit=THROTTLED_PER_MINUTE) as server:
+        seconds, collected, tweets = time_collection(server.base_url, throttled)
+        report(f"server limited to {THROTTLED_PER_MINUTE} pages/min", seconds, len(throttled), collected, tweets)
+        print(f"  {server.stats['rate_limited']} requests got a 429")
+
+    sequential = accounts[:SEQUENTIAL_ACCOUNTS]
+    with FakeSyndicationServer(port=0, latency=SERVER_LATENCY) as server:
+        seconds, collected, tweets = time_collection(server.base_url, sequential, max_workers=1)
+        report("one account at a time", seconds, len(sequential), collected, tweets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import glob
+import json
+import os
+import re
+import time
+from typing import Callable, List
+
+from twitterRequests import TwitterAPI, extract_entities, parse_timeline_entries, STREAM_CHUNK_SIZE
+from fakeSyndicationServer import synthetic_profile_page
+
+PROFILE_PAGES_DIR = "profile_pages"  # Saved profile pages (*.html) to benchmark against
+SAVE_ACCOUNTS = ["elonmusk", "WarrenBuffett", "jimcramer"]  # Pages save_profile_pages() downloads
+SYNTHETIC_TWEETS = 100  # Tweets per generated page when no saved pages exist
+REPEATS = 50  # Parses of each page per measurement
+
+
+def save_profile_pages(usernames=SAVE_ACCOUNTS, directory=PROFILE_PAGES_DIR):
+    """Download the raw profile pages of `usernames` into `directory` for later benchmarking"""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    api = TwitterAPI()
+    for username in usernames:
+        response = api._get(f"{api.base_url}/{username}")
+        response.raise_for_status()
+        with open(os.path.join(directory, f"{username}.html"), "wb") as f:
+            f.write(response.content)
+        print(f"Saved @{username} ({len(response.content) / 1024:.0f} KB)")
+
+
+def legacy_parse(page: bytes) -> List[dict]:
+    """The pre-streaming path: decode the whole page, json.loads all of __NEXT_DATA__, three regex passes"""
+    html = page.decode("utf-8")
+    start_str = '<script id="__NEXT_DATA__" type="application/json">'
+    end_str = '</script></body></html>'
+    start_index = html.index(start_str) + len(start_str)
+    end_index = html.index(end_str, start_index)
+    data = json.loads(html[start_index:end_index])
+    tweets = []
+    for entry in data["props"]["pageProps"]["timeline"]["entries"]:
+        if "content" in entry and "tweet" in entry["content"]:
+            text = entry["content"]["tweet"].get("full_text", "")
+            tweets.append({
+                "hashtags": re.findall(r"#(\w+)", text),
+                "urls": re.findall(r'https?://[^\s]+', text),
+                "mentions": re.findall(r'@(\w+)', text),
+                "cashtags": re.findall(r'\$(\w+)', text),
+            })
+    return tweets
+
+
+def streaming_parse(page: bytes) -> List[dict]:
+    """The current path: stream chunks, raw_decode only the timeline, extract_entities per tweet"""
+    chunks = (page[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(page), STREAM_CHUNK_SIZE))
+    return [
+        extract_entities(entry["content"]["tweet"].get("full_text", ""))
+        for entry in parse_timeline_entries(chunks)
+        if "content" in entry and "tweet" in entry["content"]
+    ]
+
+
+def time_parser(parse: Callable[[bytes], List[dict]], page: bytes, repeats: int = REPEATS) -> float:
+    """Best-of-3 seconds per parse"""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            parse(page)
+        best = min(best, (time.perf_counter() - start) / repeats)
+    return best
+
+
+def main():
+    print("=== Profile Page Parsing Microbenchmark ===")
+    paths = sorted(glob.glob(os.path.join(PROFILE_PAGES_DIR, "*.html")))
+    if paths:
+        pages = []
+        for path in paths:
+            with open(path, "rb") as f:
+                pages.append((os.path.basename(path), f.read()))
+    else:
+        print(f"No saved pages in {PROFILE_PAGES_DIR}/ (run save_profile_pages() to add some); using a synthetic page")
+        pages = [("synthetic", synthetic_profile_page(SYNTHETIC_TWEETS))]
+
+    for name, page in pages:
+        legacy = time_parser(legacy_parse, page)
+        streaming = time_parser(streaming_parse, page)
+        tweets = len(streaming_parse(page))
+        print(f"\n{name}: {len(page) / 1024:.0f} KB, {tweets} tweets")
+        print(f"  Legacy:    {legacy * 1000:.2f} ms/page")
+        print(f"  Streaming: {streaming * 1000:.2f} ms/page ({legacy / streaming:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import json
+import time
+from datetime import datetime
+from itertools import cycle, islice
+
+import numpy as np
+
+import analyzeWithAI
+from analyzeWithAI import iter_tweets, score_tweets_concurrently, score_tweets_sequentially, _find_tweets_file
+from fakeOpenAIServer import FakeOpenAIServer
+from rateLimiter import SlidingWindowRateLimiter
+
+BENCHMARK_TWEETS = 400  # Tweets scored per scenario, cycled from the tweets file
+BENCHMARK_TWEETS_FILE = "financial_tweets.csv"
+SERVER_LATENCY = 0.25  # Seconds per fake API response
+SERVER_LATENCY_JITTER = 0.1
+SERVER_TOKEN_LIMIT = 2_000_000  # Generous, so scenarios measure the scorer rather than the limit
+
+# Each scenario runs against a fresh server; "server" overrides FakeOpenAIServer settings
+SCENARIOS = [
+    {"name": "sequential, batches of 10", "concurrency": 1, "batch_size": 10},
+    {"name": "8 concurrent, single tweets", "concurrency": 8, "batch_size": 1},
+    {"name": "8 concurrent, batches of 10", "concurrency": 8, "batch_size": 10},
+    {"name": "32 concurrent, batches of 10", "concurrency": 32, "batch_size": 10},
+    {"name": "8 concurrent, batches of 10, 5% 429s and 5% malformed", "concurrency": 8, "batch_size": 10,
+     "server": {"rate_limit_rate": 0.05, "malformed_rate": 0.05}},
+    {"name": "8 concurrent, batches of 10, 30k TPM limit", "concurrency": 8, "batch_size": 10,
+     "server": {"token_limit": 30000}},
+]
+
+
+def benchmark_tweets(count):
+    """`count` tweets from the benchmark file, cycled and given unique ids"""
+    tweets = list(iter_tweets(_find_tweets_file(BENCHMARK_TWEETS_FILE)))
+    benchmark = []
+    for index, tweet in enumerate(islice(cycle(tweets), count)):
+        benchmark.append({**tweet, "tweet_id": tweet["tweet_id"] + index // len(tweets)})
+    return benchmark
+
+
+@contextlib.contextmanager
+def _timed_score_batch(latencies):
+    """Record how long each request unit (one _score_batch call, retries included) takes"""
+    score_batch = analyzeWithAI._score_batch
+
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return score_batch(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    analyzeWithAI._score_batch = timed
+    try:
+        yield
+    finally:
+        analyzeWithAI._score_batch = score_batch
+
+
+def run_scenario(scenario, tweets):
+    """Score `tweets` against a fresh FakeOpenAIServer and return the scenario's measurements"""
+    server_settings = {"latency": SERVER_LATENCY, "latency_jitter": SERVER_LATENCY_JITTER,
+                       "token_limit": SERVER_TOKEN_LIMIT, "port": 0, **scenario.get("server", {})}
+    latencies = []
+    api_stats_before = dict(analyzeWithAI.API_STATS)
+
+    with FakeOpenAIServer(**server_settings) as server:
+        analyzeWithAI.API_URL = server.url
+        rate_limiter = SlidingWindowRateLimiter(token_limit=server.token_limit)
+        start = time.perf_counter()
+        with _timed_score_batch(latencies), contextlib.redirect_stdout(io.StringIO()):
+            if scenario["concurrency"] > 1:
+                scored = score_tweets_concurrently(tweets, rate_limiter, scenario["concurrency"], scenario["batch_size"])
+            else:
+                scored = score_tweets_sequentially(tweets, rate_limiter, scenario["batch_size"])
+            scored_count = sum(1 for _ in scored)
+        elapsed = time.perf_counter() - start
+        server_stats = dict(server.stats)
+
+    api_stats = {name: analyzeWithAI.API_STATS[name] - api_stats_before[name] for name in api_stats_before}
+    return {
+        "name": scenario["name"],
+        "concurrency": scenario["concurrency"],
+        "batch_size": scenario["batch_size"],
+        "tweets": scored_count,
+        "seconds": elapsed,
+        "tweets_per_second": scored_count / elapsed,
+        "p50_latency": float(np.percentile(latencies, 50)),
+        "p99_latency": float(np.percentile(latencies, 99)),
+        "requests": api_stats["requests"],
+        "retries": api_stats["retries"],
+        "rate_limited": api_stats["rate_limited"],
+        "unparseable": api_stats["unparseable"],
+        "exhausted": api_stats["exhausted"],
+        "tokens": rate_limiter.total_tokens,
+        "server": server_stats,
+    }
+
+
+def main():
+    print("=== Sentiment Scorer Throughput Benchmark (local fake OpenAI server) ===")
+    print(f"{BENCHMARK_TWEETS} tweets per scenario, server latency {SERVER_LATENCY}s +- {SERVER_LATENCY_JITTER}s\n")
+
+    tweets = benchmark_tweets(BENCHMARK_TWEETS)
+    api_url = analyzeWithAI.API_URL
+    results = []
+    try:
+        for scenario in SCENARIOS:
+            result = run_scenario(scenario, tweets)
+            results.append(result)
+            print(f"{result['name']}")
+            print(f"  {result['tweets_per_second']:.1f} tweets/s ({result['tweets']} tweets in {result['seconds']:.1f}s)")
+            print(f"  Request latency p50 {result['p50_latency']*1000:.0f} ms, p99 {result['p99_latency']*1000:.0f} ms")
+            print(f"  {result['requests']} requests, {result['retries']} retries "
+                  f"({result['rate_limited']} rate limited, {result['unparseable']} unparseable), "
+                  f"{result['exhausted']} gave up, {result['tokens']} tokens\n")
+    finally:
+        analyzeWithAI.API_URL = api_url
+
+    output_file = f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
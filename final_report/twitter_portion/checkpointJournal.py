@@ -0,0 +1,61 @@
+import json
+import os
+from typing import Any, Dict, Iterator
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON Lines journal with one record per scored tweet
+
+    Writing a record costs the same no matter how far into the run we are, and every record
+    is flushed as soon as it's written, so a crash loses at most the request that was in flight.
+    A half-written last line (the crash case) is skipped on replay and cut off before appending.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync  # Also survive power loss, at the cost of a disk sync per record
+        self._file = None
+        self._valid_size = 0
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """Yield the records written by earlier runs, oldest first"""
+        self._valid_size = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn write from a crash
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self._valid_size += len(line)
+                yield record
+
+    def append(self, tweet_id, scores: Dict[str, float], **fields):
+        """Write one record for a scored tweet"""
+        if self._file is None:
+            self._open()
+        if hasattr(tweet_id, "item"):
+            tweet_id = tweet_id.item()  # numpy ints from pandas aren't JSON serializable
+        record = {"tweet_id": tweet_id, "scores": scores, **fields}
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) != self._valid_size:
+            # Drop whatever replay() couldn't read so new records start on a clean line
+            for _ in self.replay():
+                pass
+            with open(self.path, "r+b") as f:
+                f.truncate(self._valid_size)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
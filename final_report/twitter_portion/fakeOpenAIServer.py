@@ -0,0 +1,276 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+DEFAULT_PORT = 8765
+DEFAULT_TOKEN_LIMIT = 30000  # Tokens per minute, like gpt-4o on a low tier key
+DEFAULT_REQUEST_LIMIT = 500  # Requests per minute
+
+_TICKER_LIST = re.compile(r"any of these stocks: ([A-Z0-9, ]+)\.")
+_TWEET_ID = re.compile(r"Tweet ID: (\d+)")
+_TWEET_TEXT = re.compile(r'Tweet text: "(.*?)"\s*$', re.DOTALL | re.MULTILINE)
+
+
+def _format_seconds(seconds: float) -> str:
+    """Format a wait the way OpenAI does in reset headers and error messages ("1.234s", "20ms")"""
+    if seconds < 1:
+        return f"{max(1, int(seconds * 1000))}ms"
+    return f"{seconds:.3f}s"
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions endpoint, for load-testing the scorer offline
+
+    Replies are deterministic pseudo-random scores for a few of the tickers listed in the system
+    prompt, shaped like the real thing: a single ticker -> score object, or one object per
+    "Tweet ID:" for batch prompts, with a usage block and x-ratelimit-* headers.
+
+    Behaviour is configurable per instance (and can be changed while it runs):
+        latency / latency_jitter: seconds each response takes, uniformly +- jitter
+        token_limit / request_limit: per-minute limits enforced over a sliding window;
+            requests over either get a 429 whose message says "Please try again in ..."
+        rate_limit_rate: fraction of requests answered with a spurious 429 regardless of load
+        malformed_rate: fraction of 200 replies whose content isn't valid JSON
+        send_rate_limit_headers: set False to make clients fall back to the 429 message text
+        completion_tokens_per_ticker: completion tokens billed per score in the reply
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, latency: float = 0.2,
+                 latency_jitter: float = 0.05, token_limit: Optional[int] = DEFAULT_TOKEN_LIMIT,
+                 request_limit: Optional[int] = DEFAULT_REQUEST_LIMIT, rate_limit_rate: float = 0.0,
+                 malformed_rate: float = 0.0, send_rate_limit_headers: bool = True,
+                 completion_tokens_per_ticker: int = 8, seed: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.token_limit = token_limit
+        self.request_limit = request_limit
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.send_rate_limit_headers = send_rate_limit_headers
+        self.completion_tokens_per_ticker = completion_tokens_per_ticker
+        self.window = 60.0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "malformed": 0, "bad_request": 0, "tokens": 0}
+        self._random = random.Random(seed)
+        self._usage = deque()  # [timestamp, tokens] of requests admitted in the last window
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """The chat completions URL to use as analyzeWithAI.API_URL"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self) -> "FakeOpenAIServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status, headers, body = server.handle_completion(self.rfile.read(length))
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+        return Handler
+
+    def handle_completion(self, raw_body: bytes):
+        """Build the (status, headers, body) for one chat completions request"""
+        try:
+            request = json.loads(raw_body)
+            messages = request["messages"]
+            max_tokens = int(request.get("max_tokens") or 0)
+        except (ValueError, KeyError, TypeError):
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["bad_request"] += 1
+            return 400, {}, {"error": {"message": "Invalid request body", "type": "invalid_request_error"}}
+
+        prompt_tokens = sum(len(message.get("content", "")) for message in messages) // 4 + 4 * len(messages)
+        requested = prompt_tokens + max_tokens
+
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.time()
+            self._expire(now)
+            wait = self._limit_wait(requested, now)
+            if wait is None and self._random.random() < self.rate_limit_rate:
+                wait = 0.5 + self._random.random()
+            if wait is not None:
+                self.stats["rate_limited"] += 1
+                headers = self._rate_limit_headers(now)
+                if self.send_rate_limit_headers:
+                    headers["retry-after-ms"] = str(int(wait * 1000))
+                message = (
+                    f"Rate limit reached for {request.get('model', 'gpt-4o')} on tokens per min (TPM): "
+                    f"Limit {self.token_limit}, Used {self._tokens_in_window}, Requested {requested}. "
+                    f"Please try again in {_format_seconds(wait)}. Visit https://platform.openai.com/account/rate-limits"
+                )
+                return 429, headers, {"error": {"message": message, "type": "tokens", "code": "rate_limit_exceeded"}}
+            # Book the worst case up front like OpenAI does, and settle it once the reply is built
+            booking = [now, requested]
+            self._usage.append(booking)
+            self._tokens_in_window += requested
+            malformed = self._random.random() < self.malformed_rate
+            delay = max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+
+        content, scored = self._reply_content(messages, malformed)
+        completion_tokens = min(max_tokens or 10 ** 9, 4 + self.completion_tokens_per_ticker * scored)
+        time.sleep(delay)
+
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if booking[0] > now - self.window:  # Still in the window
+                self._tokens_in_window += prompt_tokens + completion_tokens - booking[1]
+                booking[1] = prompt_tokens + completion_tokens
+            self.stats["tokens"] += prompt_tokens + completion_tokens
+            self.stats["malformed" if malformed else "ok"] += 1
+            headers = self._rate_limit_headers(now)
+
+        body = {
+            "id": f"chatcmpl-fake{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(now),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+        return 200, headers, body
+
+    def _expire(self, now: float):
+        while self._usage and self._usage[0][0] <= now - self.window:
+            self._tokens_in_window -= self._usage.popleft()[1]
+
+    def _limit_wait(self, requested: int, now: float) -> Optional[float]:
+        """Seconds until `requested` tokens fit under both limits, or None if they fit now"""
+        over_tokens = self.token_limit is not None and self._tokens_in_window + requested > self.token_limit
+        over_requests = self.request_limit is not None and len(self._usage) + 1 > self.request_limit
+        if not (over_tokens or over_requests):
+            return None
+        freed = 0
+        for index, (timestamp, tokens) in enumerate(self._usage):
+            freed += tokens
+            tokens_fit = self.token_limit is None or self._tokens_in_window - freed + requested <= self.token_limit
+            requests_fit = self.request_limit is None or len(self._usage) - index <= self.request_limit
+            if tokens_fit and requests_fit:
+                return max(0.001, timestamp + self.window - now)
+        return self.window
+
+    def _rate_limit_headers(self, now: float) -> Dict[str, str]:
+        if not self.send_rate_limit_headers:
+            return {}
+        headers = {}
+        oldest_expiry = self._usage[0][0] + self.window - now if self._usage else 0.0
+        if self.token_limit is not None:
+            headers["x-ratelimit-limit-tokens"] = str(self.token_limit)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.token_limit - self._tokens_in_window))
+            headers["x-ratelimit-reset-tokens"] = _format_seconds(oldest_expiry)
+        if self.request_limit is not None:
+            headers["x-ratelimit-limit-requests"] = str(self.request_limit)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.request_limit - len(self._usage)))
+            headers["x-ratelimit-reset-requests"] = _format_seconds(oldest_expiry)
+        return headers
+
+    def _reply_content(self, messages: List[Dict[str, str]], malformed: bool):
+        """Model reply text plus the number of scores in it"""
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+        match = _TICKER_LIST.search(system)
+        tickers = [ticker.strip() for ticker in match.group(1).split(",")] if match else []
+
+        tweet_ids = _TWEET_ID.findall(user)
+        if tweet_ids:
+            # Batch prompt: split the user message at each Tweet ID and score each part separately
+            parts = _TWEET_ID.split(user)[1:]
+            reply = {tweet_id: self._scores(text, tickers) for tweet_id, text in zip(parts[::2], parts[1::2])}
+            scored = sum(len(scores) for scores in reply.values())
+        else:
+            reply = self._scores(user, tickers)
+            scored = len(reply)
+
+        content = json.dumps(reply)
+        if malformed:
+            content = "Here are the scores: " + content[: max(1, len(content) // 2)]
+        return content, scored
+
+    @staticmethod
+    def _scores(tweet_message: str, tickers: List[str]) -> Dict[str, float]:
+        """Deterministic scores for 0-3 of `tickers`, seeded by the tweet text"""
+        text_match = _TWEET_TEXT.search(tweet_message)
+        text = text_match.group(1) if text_match else tweet_message
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        picked = rng.sample(tickers, min(len(tickers), rng.randint(0, 3)))
+        return {ticker: round(rng.uniform(-1.0, 1.0), 2) for ticker in picked}
+
+
+def main():
+    server = FakeOpenAIServer()
+    print(f"Fake OpenAI chat completions server listening on {server.url}")
+    print(f"Latency: {server.latency}s +- {server.latency_jitter}s, "
+          f"limits: {server.token_limit} tokens / {server.request_limit} requests per minute")
+    print("Set analyzeWithAI.API_URL to this URL to score tweets against it. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"\nServed: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import json
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Optional
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_PORT = 8766
+DEFAULT_TWEETS_PER_PAGE = 20  # About what the real profile page embeds
+PROFILE_PATH = "/srv/timeline-profile/screen-name"
+_FIRST_TWEET_ID = 1900000000000000000
+
+
+def synthetic_profile_page(tweets: int = 100, seed: int = 0, screen_name: str = "someaccount") -> bytes:
+    """A page shaped like the syndication timeline: page chrome, then __NEXT_DATA__ with the entries"""
+    rng = random.Random(seed)
+    words = ["market", "rates", "Tesla", "AI", "chips", "earnings", "economy", "inflation", "growth", "Fed"]
+    user = {"name": "Some Account", "screen_name": screen_name, "verified": True,
+            "description": "x" * 160, "profile_image_url_https": "https://pbs.twimg.com/profile_images/1/a.jpg",
+            "followers_count": 1234567, "friends_count": 321}
+    first_id = _FIRST_TWEET_ID + (seed % 10 ** 6) * 10 ** 4  # Distinct ids per seed, so accounts don't collide
+    entries = []
+    for index in range(tweets):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(8, 40)))
+        text += f" #{rng.choice(words)} @{rng.choice(words)} ${rng.choice(['TSLA', 'NVDA', 'AAPL'])} https://t.co/{index:08d}"
+        entries.append({
+            "type": "tweet",
+            "entry_id": f"tweet-{first_id + index}",
+            "sort_index": str(first_id + index),
+            "content": {"tweet": {
+                "id_str": str(first_id + index),
+                "full_text": text,
+                "created_at": "Mon Apr 28 03:23:30 +0000 2025",
+                "retweet_count": rng.randint(0, 50000),
+                "favorite_count": rng.randint(0, 500000),
+                "user": user,
+                "entities": {"hashtags": [], "urls": [], "user_mentions": [], "symbols": []},
+                "permalink": f"/{screen_name}/status/{first_id + index}",
+            }},
+        })
+    next_data = {
+        "props": {"pageProps": {
+            "contextProvider": {"features": {f"flag_{i}": i % 2 == 0 for i in range(200)}, "hasResults": True},
+            "headerProps": {"screenName": screen_name, "user": user},
+            "timeline": {"entries": entries},
+            "latest_tweet_id": str(first_id + tweets - 1),
+        }},
+        "page": "/timeline-profile/screen-name/[screenName]",
+        "query": {"screenName": screen_name},
+        "buildId": "abc123",
+    }
+    chrome = "<style>" + ".c{color:red}" * 4000 + "</style>" + "<script src='/_next/static/chunks/main.js'></script>" * 20
+    return (
+        f"<!DOCTYPE html><html><head>{chrome}</head><body><div id='__next'></div>"
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script></body></html>'
+    ).encode("utf-8")
+
+
+class FakeSyndicationServer:
+    """
+    Local stand-in for the syndication profile pages TwitterAPI scrapes, for offline load tests
+
+    Any screen name gets a page of synthetic tweets, the same every time for that name, so
+    runs are repeatable and a TwitterAPI pointed at `base_url` can collect from thousands of
+    accounts without the network.
+
+    Behaviour is configurable per instance (and can be changed while it runs):
+        latency / latency_jitter: seconds each response takes, uniformly +- jitter
+        request_limit: pages per minute over a sliding window; requests over it get a 429
+            with a Retry-After header
+        rate_limit_rate: fraction of requests answered with a spurious 429 regardless of load
+        missing_accounts: screen names that get a 404
+        tweets_per_page: tweets embedded in each page
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, latency: float = 0.05,
+                 latency_jitter: float = 0.02, request_limit: Optional[int] = None, rate_limit_rate: float = 0.0,
+                 missing_accounts: Iterable[str] = (), tweets_per_page: int = DEFAULT_TWEETS_PER_PAGE, seed: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.request_limit = request_limit
+        self.rate_limit_rate = rate_limit_rate
+        self.missing_accounts = {name.lower() for name in missing_accounts}
+        self.tweets_per_page = tweets_per_page
+        self.window = 60.0
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "not_found": 0, "bytes": 0}
+        self._random = random.Random(seed)
+        self._admitted = deque()  # Times of the requests served in the last window
+        self._lock = threading.Lock()
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """The profile URL prefix to use as TwitterAPI.base_url"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{PROFILE_PATH}"
+
+    def start(self) -> "FakeSyndicationServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeSyndicationServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body = server.handle_profile(urlsplit(self.path).path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    pass  # Client hung up on a kept-alive connection
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+        return Handler
+
+    def handle_profile(self, path: str):
+        """Build the (status, headers, body) for one profile page request"""
+        screen_name = unquote(path[len(PROFILE_PATH) + 1:]) if path.startswith(PROFILE_PATH + "/") else ""
+        with self._lock:
+            self.stats["requests"] += 1
+            now = time.time()
+            while self._admitted and self._admitted[0] <= now - self.window:
+                self._admitted.popleft()
+            wait = None
+            if self.request_limit is not None and len(self._admitted) >= self.request_limit:
+                wait = self._admitted[0] + self.window - now
+            elif self._random.random() < self.rate_limit_rate:
+                wait = 1.0
+            if wait is not None:
+                self.stats["rate_limited"] += 1
+                return 429, {"Retry-After": str(max(1, round(wait)))}, b"Rate limit exceeded"
+            if not screen_name or "/" in screen_name or screen_name.lower() in self.missing_accounts:
+                self.stats["not_found"] += 1
+                return 404, {}, b"<!DOCTYPE html><html><body>Not found</body></html>"
+            self._admitted.append(now)
+            delay = max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+
+        page = synthetic_profile_page(self.tweets_per_page, zlib.crc32(screen_name.lower().encode()), screen_name)
+        time.sleep(delay)
+        with self._lock:
+            self.stats["ok"] += 1
+            self.stats["bytes"] += len(page)
+        return 200, {}, page
+
+
+def main():
+    server = FakeSyndicationServer()
+    print(f"Fake syndication server listening on {server.base_url}/<screen_name>")
+    print(f"Latency: {server.latency}s +- {server.latency_jitter}s, {server.tweets_per_page} tweets per page, "
+          f"limit: {server.request_limit or 'none'} pages per minute")
+    print("Set TwitterAPI().base_url to this URL to collect from it. Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"\nServed: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from tickerPrefilter import TickerPrefilter
+
+OFFLINE_CHUNK_SIZE = 5000  # Tweets scored per vectorized pass by annotate()
+NEGATION_WINDOW = 3  # A negator flips lexicon words up to this many tokens after it
+NEGATION_FACTOR = -0.75  # "not good" is milder than "bad"
+NORMALIZATION_ALPHA = 1.0  # score = total / sqrt(total^2 + alpha), squashing into (-1, 1)
+CONFIDENT_SCORE = 0.3  # |score| a tweet needs before the first pass trusts it without the API
+
+# Finance-flavoured lexicon, weights in [-1, 1]
+FINANCE_LEXICON = {
+    # Positive
+    "beat": 0.6, "beats": 0.6, "bullish": 0.9, "bull": 0.6, "rally": 0.7, "rallies": 0.7, "rallied": 0.7,
+    "rallying": 0.7, "surge": 0.8, "surges": 0.8, "surged": 0.8, "surging": 0.8, "soar": 0.8, "soars": 0.8,
+    "soared": 0.8, "soaring": 0.8, "jump": 0.5, "jumps": 0.5, "jumped": 0.5, "gain": 0.5, "gains": 0.5,
+    "gained": 0.5, "growth": 0.5, "growing": 0.4, "grow": 0.4, "grew": 0.4, "record": 0.4, "profit": 0.5,
+    "profits": 0.5, "profitable": 0.6, "upgrade": 0.7, "upgraded": 0.7, "upgrades": 0.7, "outperform": 0.7,
+    "outperformed": 0.7, "outperforming": 0.7, "buy": 0.4, "buying": 0.4, "long": 0.3, "strong": 0.5,
+    "stronger": 0.5, "strength": 0.4, "boom": 0.7, "booming": 0.7, "breakthrough": 0.7, "innovation": 0.4,
+    "innovative": 0.4, "win": 0.5, "wins": 0.5, "winning": 0.5, "success": 0.6, "successful": 0.6,
+    "great": 0.6, "good": 0.4, "best": 0.6, "better": 0.4, "excellent": 0.7, "awesome": 0.6, "amazing": 0.6,
+    "incredible": 0.6, "love": 0.5, "exciting": 0.5, "excited": 0.5, "optimistic": 0.6, "confident": 0.5,
+    "recover": 0.4, "recovery": 0.4, "recovered": 0.4, "rebound": 0.5, "rebounds": 0.5, "rebounded": 0.5,
+    "expand": 0.4, "expands": 0.4, "expansion": 0.4, "approval": 0.5, "approved": 0.5, "dividend": 0.3,
+    "upside": 0.5, "moon": 0.6, "mooning": 0.7, "higher": 0.4, "high": 0.2, "up": 0.2, "raise": 0.3,
+    "raised": 0.3, "tailwind": 0.5, "tailwinds": 0.5, "efficient": 0.3, "efficiency": 0.3, "prosperity": 0.6,
+    # Negative
+    "miss": -0.6, "misses": -0.6, "missed": -0.6, "bearish": -0.9, "bear": -0.6, "crash": -0.9,
+    "crashes": -0.9, "crashed": -0.9, "crashing": -0.9, "plunge": -0.8, "plunges": -0.8, "plunged": -0.8,
+    "plunging": -0.8, "drop": -0.5, "drops": -0.5, "dropped": -0.5, "fall": -0.5, "falls": -0.5,
+    "fell": -0.5, "falling": -0.5, "decline": -0.5, "declines": -0.5, "declined": -0.5, "declining": -0.5,
+    "loss": -0.6, "losses": -0.6, "lose": -0.5, "losing": -0.5, "lost": -0.5, "downgrade": -0.7,
+    "downgraded": -0.7, "downgrades": -0.7, "underperform": -0.7, "underperformed": -0.7, "sell": -0.4,
+    "selling": -0.4, "selloff": -0.7, "short": -0.3, "weak": -0.5, "weaker": -0.5, "weakness": -0.5,
+    "bust": -0.7, "recession": -0.8, "inflation": -0.4, "tariff": -0.4, "tariffs": -0.4, "layoffs": -0.6,
+    "layoff": -0.6, "lawsuit": -0.6, "sued": -0.6, "fraud": -0.9, "scandal": -0.8, "investigation": -0.5,
+    "probe": -0.5, "fine": -0.2, "fined": -0.6, "penalty": -0.5, "recall": -0.6, "recalls": -0.6,
+    "bankrupt": -1.0, "bankruptcy": -1.0, "default": -0.8, "debt": -0.3, "risk": -0.3, "risky": -0.4,
+    "fear": -0.5, "fears": -0.5, "panic": -0.8, "worried": -0.5, "worry": -0.5, "concern": -0.4,
+    "concerns": -0.4, "bad": -0.5, "worse": -0.6, "worst": -0.8, "terrible": -0.8, "awful": -0.8,
+    "disaster": -0.9, "fail": -0.6, "fails": -0.6, "failed": -0.6, "failure": -0.7, "collapse": -0.9,
+    "collapsed": -0.9, "cut": -0.4, "cuts": -0.4, "slump": -0.7, "slumps": -0.7, "tank": -0.7,
+    "tanked": -0.7, "tanking": -0.7, "lower": -0.3, "low": -0.2, "down": -0.2, "headwind": -0.5,
+    "headwinds": -0.5, "shortage": -0.5, "shortages": -0.5, "delay": -0.4, "delayed": -0.4, "delays": -0.4,
+    "overvalued": -0.6, "bubble": -0.6, "dump": -0.6, "dumping": -0.6, "hate": -0.6, "war": -0.6,
+    "crisis": -0.8, "volatile": -0.3, "volatility": -0.3, "downside": -0.5, "warning": -0.5, "warns": -0.5,
+    "disappoint": -0.6, "disappoints": -0.6, "disappointed": -0.6, "disappointing": -0.6,
+}
+
+# Tokens that negate what follows. The tokenizer splits "don't"/"don’t" into "don" + "t", and a
+# "t" right after an apostrophe counts as a negator too (but not the "t" of "AT&T")
+NEGATORS = {
+    "not", "no", "never", "nor", "neither", "without", "hardly", "barely", "cannot", "nothing", "nobody", "none",
+}
+_APOSTROPHE_BYTES = [ord("'"), 0x99]  # ' and the last byte of ’ (U+2019)
+
+_HASH_BASE = 1_000_003  # Odd, so invertible modulo 2**64
+_HASH_BASE_INVERSE = pow(_HASH_BASE, -1, 2 ** 64)
+_NGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_FILTER_BITS = 20
+_FILTER_SHIFT = np.uint64(64 - _FILTER_BITS)
+
+# Byte classes for UTF-8 text: ASCII letters and digits are word bytes, other ASCII is a separator,
+# and non-ASCII bytes are word bytes (accented letters etc.) unless they belong to a punctuation,
+# symbol or emoji sequence, which _separator_mask() finds
+_WORD_BYTE = np.zeros(256, dtype=bool)
+_WORD_BYTE[[ord(c) for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"]] = True
+_WORD_BYTE[128:] = True
+_LOWER = np.arange(256, dtype=np.uint64)
+_LOWER[ord("A"):ord("Z") + 1] += 32
+
+
+def _separator_mask(codes: np.ndarray) -> np.ndarray:
+    """Mark the bytes of U+2000-U+2FFF (punctuation, arrows, dingbats), variation selectors and 4-byte emoji"""
+    mask = np.zeros(len(codes), dtype=bool)
+    if len(codes) < 3:
+        return mask
+    lead = codes[:-2]
+    three_byte = np.flatnonzero((lead == 0xE2) | ((lead == 0xEF) & (codes[1:-1] >= 0xB8) & (codes[1:-1] <= 0xBB)))
+    for offset in range(3):
+        mask[three_byte + offset] = True
+    four_byte = np.flatnonzero(codes >= 0xF0)
+    for offset in range(4):
+        mask[np.minimum(four_byte + offset, len(codes) - 1)] = True
+    return mask
+
+
+class _Tokens:
+    """Word tokens of a chunk of texts, with the text each belongs to and a lower-case hash of each"""
+
+    _powers = np.ones(1, dtype=np.uint64)
+    _inverse_powers = np.ones(1, dtype=np.uint64)
+
+    def __init__(self, texts: Sequence[str]):
+        self.buffer = ("\x00".join(texts) + "\x00").encode("utf-8", "replace")
+        codes = np.frombuffer(self.buffer, dtype=np.uint8)
+        self.count = len(texts)
+        self.codes = codes
+
+        is_word = _WORD_BYTE[codes] & ~_separator_mask(codes)
+        edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+        self.starts = np.flatnonzero(edges == 1)
+        self.ends = np.flatnonzero(edges == -1)
+        self.tweet = np.cumsum(codes == 0, dtype=np.int32)[self.starts]
+
+        # Polynomial hash of every token, made position-independent by the inverse powers
+        powers, inverse_powers = self._power_tables(len(codes))
+        prefix = np.zeros(len(codes) + 1, dtype=np.uint64)
+        np.cumsum(_LOWER[codes] * powers, dtype=np.uint64, out=prefix[1:])
+        self.lower = (prefix[self.ends] - prefix[self.starts]) * inverse_powers[self.starts]
+
+    @classmethod
+    def _power_tables(cls, length: int):
+        """_HASH_BASE**i and its inverse mod 2**64 for i < length, grown and kept across chunks"""
+        if len(cls._powers) < length:
+            size = max(length, 2 * len(cls._powers))
+            powers = np.full(size, _HASH_BASE, dtype=np.uint64)
+            powers[0] = 1
+            inverse_powers = np.full(size, _HASH_BASE_INVERSE, dtype=np.uint64)
+            inverse_powers[0] = 1
+            cls._powers = np.cumprod(powers, dtype=np.uint64)
+            cls._inverse_powers = np.cumprod(inverse_powers, dtype=np.uint64)
+        return cls._powers[:length], cls._inverse_powers[:length]
+
+    def ngrams(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashes of each run of n adjacent tokens in the same text, and the first token's index"""
+        same_text = np.flatnonzero(self.tweet[:len(self.tweet) - n + 1] == self.tweet[n - 1:])
+        hashes = self.lower[same_text]
+        for offset in range(1, n):
+            hashes = hashes * _NGRAM_MULTIPLIER + self.lower[same_text + offset]
+        return hashes, same_text
+
+    def text(self, token: int) -> str:
+        return self.buffer[self.starts[token]:self.ends[token]].decode("utf-8", "replace")
+
+
+def _word_hashes(words: Sequence[str]) -> np.ndarray:
+    """Lower-case hash of each single-token word, matching _Tokens.lower"""
+    return _Tokens(list(words)).lower
+
+
+class _HashTable:
+    """
+    Sorted token hashes with a value each, looked up with np.searchsorted
+
+    A direct-mapped filter on the top _FILTER_BITS bits of the hash rules out almost every token
+    with one array gather, so only the few possible hits are binary-searched.
+    """
+
+    def __init__(self, hashes: np.ndarray, values: np.ndarray):
+        order = np.argsort(hashes)
+        self.hashes = np.asarray(hashes, dtype=np.uint64)[order]
+        self.values = np.asarray(values)[order]
+        self._filter = np.zeros(1 << _FILTER_BITS, dtype=bool)
+        self._filter[self.hashes >> _FILTER_SHIFT] = True
+
+    def lookup(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions in `hashes` that are in the table, and their values"""
+        candidates = np.flatnonzero(self._filter[hashes >> _FILTER_SHIFT])
+        if len(candidates) == 0 or len(self.hashes) == 0:
+            return candidates, self.values[:0]
+        positions = np.minimum(np.searchsorted(self.hashes, hashes[candidates]), len(self.hashes) - 1)
+        hit = self.hashes[positions] == hashes[candidates]
+        return candidates[hit], self.values[positions[hit]]
+
+
+class OfflineSentimentScorer:
+    """
+    Local lexicon + negation sentiment scorer over the TICKER_SYMBOLS universe, with no API calls
+
+    A chunk of tweets is joined into one UTF-8 buffer and tokenized with NumPy byte masks; each
+    token gets a rolling hash, and the lexicon, negators, symbols, $cashtags and company names
+    (single words, and multi-word names on all their words, from the same tables as
+    TickerPrefilter) are looked up in _HashTables. Per-tweet scores are summed with np.bincount,
+    so Python only touches the few tweets that mention a ticker.
+
+    A tweet's score, total / sqrt(total^2 + NORMALIZATION_ALPHA), is given to every ticker it
+    mentions. Tweets that mention no ticker, contain no lexicon words, mix positive and negative
+    words or score below CONFIDENT_SCORE are flagged ambiguous, for the API to look at.
+    """
+
+    def __init__(self, tickers: Iterable[str], prefilter: Optional[TickerPrefilter] = None,
+                 lexicon: Optional[Mapping[str, float]] = None):
+        self.tickers = list(tickers)
+        prefilter = prefilter or TickerPrefilter(self.tickers)
+        lexicon = FINANCE_LEXICON if lexicon is None else lexicon
+
+        self._lexicon = _HashTable(_word_hashes(list(lexicon)), np.array(list(lexicon.values()), dtype=np.float64))
+        self._negators = _HashTable(_word_hashes(sorted(NEGATORS)), np.ones(len(NEGATORS), dtype=bool))
+        self._t_hash = _word_hashes(["t"])[0]
+
+        # Ticker tables map a hash to a group id; _groups[id] holds the ticker indices it names
+        self._groups: List[Tuple[int, ...]] = []
+        group_ids: Dict[Tuple[int, ...], int] = {}
+
+        def group(tickers):
+            key = tuple(sorted(self.tickers.index(ticker) for ticker in tickers))
+            if key not in group_ids:
+                group_ids[key] = len(self._groups)
+                self._groups.append(key)
+            return group_ids[key]
+
+        def table(mapping):
+            hashes = list(mapping)
+            return _HashTable(np.array(hashes, dtype=np.uint64),
+                              np.array([group(mapping[h]) for h in hashes], dtype=np.int64))
+
+        # Names are matched on all their words, as TickerPrefilter does, one table per word count
+        unigrams, ngrams = {}, {}
+        for alias_words, alias_tickers in prefilter.aliases():
+            tokens = _Tokens([" ".join(alias_words)])
+            if len(tokens.lower) == 1:
+                unigrams.setdefault(int(tokens.lower[0]), set()).update(alias_tickers)
+            elif len(tokens.lower) > 1:
+                n = len(tokens.lower)
+                ngrams.setdefault(n, {}).setdefault(int(tokens.ngrams(n)[0][0]), set()).update(alias_tickers)
+        self._unigrams = table(unigrams)
+        self._ngrams = {n: table(mapping) for n, mapping in sorted(ngrams.items())}
+        # Bare symbols must be written in capitals; $cashtags may be any case and include AMBIGUOUS_SYMBOLS
+        self._symbols = table({int(_word_hashes([symbol])[0]): {symbol} for symbol in prefilter.symbols})
+        self._cashtags = table({int(_word_hashes([symbol])[0]): {symbol} for symbol in self.tickers})
+
+    def score_chunk(self, texts: Sequence[str]) -> Tuple[List[Dict[str, float]], np.ndarray]:
+        """
+        Score a chunk of tweet texts at once
+
+        Returns:
+            tuple: (list of {ticker: score} per text, boolean array marking the ambiguous ones)
+        """
+        tokens = _Tokens(texts)
+        count = tokens.count
+        token_count = len(tokens.lower)
+        preceding = tokens.codes[np.maximum(tokens.starts - 1, 0)]
+
+        # Lexicon weights, flipped and damped within NEGATION_WINDOW tokens after a negator
+        weights = np.zeros(token_count)
+        found, found_weights = self._lexicon.lookup(tokens.lower)
+        weights[found] = found_weights
+        negator = np.zeros(token_count, dtype=bool)
+        negator[self._negators.lookup(tokens.lower)[0]] = True
+        negator |= (tokens.lower == self._t_hash) & np.isin(preceding, _APOSTROPHE_BYTES)
+        indices = np.arange(token_count)
+        last_negator = np.maximum.accumulate(np.where(negator, indices, -1)) if token_count else indices
+        negated = ((last_negator >= 0) & (indices - last_negator <= NEGATION_WINDOW) & (indices != last_negator)
+                   & (tokens.tweet[np.maximum(last_negator, 0)] == tokens.tweet))
+        weights[negated] *= NEGATION_FACTOR
+
+        totals = np.bincount(tokens.tweet, weights=weights, minlength=count)
+        positive = np.bincount(tokens.tweet[weights > 0], minlength=count)
+        negative = np.bincount(tokens.tweet[weights < 0], minlength=count)
+        scores = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+
+        # Ticker mentions: company names, bare capitalised symbols and $cashtags
+        unigram_tokens, unigram_groups = self._unigrams.lookup(tokens.lower)
+        cashtag_tokens, cashtag_groups = self._cashtags.lookup(tokens.lower)
+        is_cashtag = (preceding[cashtag_tokens] == ord("$")) & (tokens.starts[cashtag_tokens] > 0)
+        symbol_tokens, symbol_groups = self._symbols.lookup(tokens.lower)
+        is_capitalised = np.array([tokens.text(token).isupper() for token in symbol_tokens.tolist()], dtype=bool)
+        name_tokens, name_groups = [], []
+        for n, ngram_table in self._ngrams.items():
+            ngram_hashes, ngram_index = tokens.ngrams(n)
+            found_ngrams, found_groups = ngram_table.lookup(ngram_hashes)
+            name_tokens.append(ngram_index[found_ngrams])
+            name_groups.append(found_groups)
+        mention_tokens = np.concatenate([unigram_tokens, cashtag_tokens[is_cashtag],
+                                         symbol_tokens[is_capitalised]] + name_tokens)
+        mention_groups = np.concatenate([unigram_groups, cashtag_groups[is_cashtag],
+                                         symbol_groups[is_capitalised]] + name_groups)
+
+        mentions: Dict[int, set] = {}
+        for tweet, group in zip(tokens.tweet[mention_tokens].tolist(), mention_groups.tolist()):
+            mentions.setdefault(tweet, set()).update(self._groups[group])
+
+        results: List[Dict[str, float]] = [{} for _ in range(count)]
+        mentioned = np.zeros(count, dtype=bool)
+        for tweet, ticker_indices in mentions.items():
+            mentioned[tweet] = True
+            if positive[tweet] or negative[tweet]:
+                score = float(scores[tweet])
+                results[tweet] = {self.tickers[index]: score for index in sorted(ticker_indices)}
+
+        ambiguous = (~mentioned | ((positive + negative) == 0) | ((positive > 0) & (negative > 0))
+                     | (np.abs(scores) < CONFIDENT_SCORE))
+        return results, ambiguous
+
+    def score_tweet(self, text: str, candidates: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """Score a single tweet, keeping only `candidates` when a shortlist is given"""
+        scores = self.score_chunk([text])[0][0]
+        if candidates is not None:
+            scores = {ticker: score for ticker, score in scores.items() if ticker in candidates}
+        return scores
+
+    def annotate(self, tweets: Iterable[Mapping], chunk_size: int = OFFLINE_CHUNK_SIZE) -> Iterator[Dict]:
+        """
+        First pass over a stream of tweets: add 'offline_scores' to each one
+
+        Confident tweets get their {ticker: score} dict, which the scorer uses instead of calling
+        the API; ambiguous ones get None and are escalated. Reads up to chunk_size tweets ahead.
+        """
+        chunk = []
+        for tweet in tweets:
+            chunk.append(dict(tweet))
+            if len(chunk) >= chunk_size:
+                yield from self._annotate_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._annotate_chunk(chunk)
+
+    def _annotate_chunk(self, chunk: List[Dict]) -> Iterator[Dict]:
+        results, ambiguous = self.score_chunk([tweet["text"] for tweet in chunk])
+        for tweet, scores, escalate in zip(chunk, results, ambiguous.tolist()):
+            candidates = tweet.get("candidates")
+            if candidates is not None and not candidates:
+                tweet["offline_scores"] = None  # The prefilter already settled it
+            elif escalate:
+                tweet["offline_scores"] = None
+            else:
+                if candidates is not None:
+                    scores = {ticker: score for ticker, score in scores.items() if ticker in candidates}
+                tweet["offline_scores"] = scores
+            yield tweet
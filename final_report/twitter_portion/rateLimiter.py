@@ -0,0 +1,206 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Mapping, Optional
+
+RATE_LIMIT_WINDOW = 60  # OpenAI's rate limit window in seconds
+RATE_LIMIT_TOKENS = 30000  # OpenAI's token rate limit for gpt-4o
+RATE_LIMIT_REQUESTS = 500  # OpenAI's request rate limit for gpt-4o
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_TRY_AGAIN_PATTERN = re.compile(r"Please try again in (\d+(?:\.\d+)?)(ms|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Parse an OpenAI reset header duration such as "6m0s", "1.5s" or "20ms" into seconds
+
+    Returns:
+        Optional[float]: Seconds, or None if the value isn't a duration
+    """
+    parts = _DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(messages, max_tokens: int = 0) -> int:
+    """
+    Estimate the tokens a chat request will be billed for before sending it
+
+    Uses ~4 characters per token plus a small per-message overhead, and counts the
+    completion budget, since the rate limiter charges max_tokens up front.
+    """
+    prompt_chars = sum(len(message["content"]) for message in messages)
+    return prompt_chars // 4 + 4 * len(messages) + max_tokens
+
+
+def retry_after_seconds(headers: Mapping[str, str], body: str = "") -> Optional[float]:
+    """
+    Work out how long a 429 response asks us to wait
+
+    Checks retry-after-ms / retry-after first, then the token and request reset headers,
+    and only falls back to the "Please try again in" text in the body if none are present.
+    """
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    resets = [
+        parse_duration(headers.get(name, ""))
+        for name in ("x-ratelimit-reset-tokens", "x-ratelimit-reset-requests")
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    if resets:
+        return max(resets)
+    match = _TRY_AGAIN_PATTERN.search(body or "")
+    if match:
+        return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    return None
+
+
+class SlidingWindowRateLimiter:
+    """
+    Request and token rate limiter over a sliding window
+
+    Every request books its estimated tokens when it is admitted and replaces the estimate
+    with the real usage once the response arrives. Each booking expires exactly `window`
+    seconds after it was made, so capacity frees up continuously instead of all at once.
+    The x-ratelimit-* response headers are used as a floor on usage, which catches tokens
+    spent by other clients on the same key, and a 429 pauses every caller sharing the limiter.
+
+    The state is guarded by a lock that is never held while sleeping, so one instance can be
+    shared by threads (acquire) and coroutines (acquire_async).
+    """
+
+    def __init__(self, token_limit: int = RATE_LIMIT_TOKENS, request_limit: int = RATE_LIMIT_REQUESTS,
+                 window: float = RATE_LIMIT_WINDOW):
+        self.token_limit = token_limit
+        self.request_limit = request_limit
+        self.window = window
+        self.total_tokens = 0  # Real (or estimated, if usage was missing) tokens across the whole run
+        self._bookings = deque()  # [timestamp, tokens, booking_id], oldest first
+        self._open_bookings: Dict[int, list] = {}
+        self._tokens_in_window = 0
+        self._next_booking_id = 0
+        self._server_tokens_used = (0, 0.0)  # (tokens, expires_at) reported by the last response headers
+        self._server_requests_used = (0, 0.0)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._bookings and self._bookings[0][0] <= now - self.window:
+            _, tokens, booking_id = self._bookings.popleft()
+            self._tokens_in_window -= tokens
+            self._open_bookings.pop(booking_id, None)
+
+    def _usage(self, moment: float, freed_tokens: int = 0, freed_requests: int = 0):
+        tokens, tokens_expire = self._server_tokens_used
+        requests, requests_expire = self._server_requests_used
+        used_tokens = max(self._tokens_in_window - freed_tokens, tokens if moment < tokens_expire else 0)
+        used_requests = max(len(self._bookings) - freed_requests, requests if moment < requests_expire else 0)
+        return used_tokens, used_requests
+
+    def _fits(self, tokens: int, moment: float, freed_tokens: int = 0, freed_requests: int = 0) -> bool:
+        used_tokens, used_requests = self._usage(moment, freed_tokens, freed_requests)
+        return used_tokens + tokens <= self.token_limit and used_requests + 1 <= self.request_limit
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        tokens = min(tokens, self.token_limit)  # An oversized request still gets in once the window is empty
+        if self._fits(tokens, now):
+            return 0.0
+
+        # Step through the moments at which a booking or a server-reported floor expires
+        # and return the first one that leaves room for this request
+        events = [(timestamp + self.window, booked, 1) for timestamp, booked, _ in self._bookings]
+        events += [(self._server_tokens_used[1], 0, 0), (self._server_requests_used[1], 0, 0)]
+        events.sort()
+        freed_tokens = 0
+        freed_requests = 0
+        for moment, booked, count in events:
+            freed_tokens += booked
+            freed_requests += count
+            if moment > now and self._fits(tokens, moment, freed_tokens, freed_requests):
+                return max(0.01, moment - now)
+        return self.window
+
+    def try_acquire(self, tokens: int):
+        """
+        Book `tokens` if the window has room for them
+
+        Returns:
+            tuple: (0.0, booking_id) when admitted, or (seconds to wait, None) when not
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            wait_time = self._wait_time(tokens, now)
+            if wait_time > 0:
+                return wait_time, None
+            booking_id = self._next_booking_id
+            self._next_booking_id += 1
+            booking = [now, tokens, booking_id]
+            self._bookings.append(booking)
+            self._open_bookings[booking_id] = booking
+            self._tokens_in_window += tokens
+            return 0.0, booking_id
+
+    def acquire(self, tokens: int) -> int:
+        """Block the calling thread until `tokens` fit in the window; returns the booking id"""
+        while True:
+            wait_time, booking_id = self.try_acquire(tokens)
+            if booking_id is not None:
+                return booking_id
+            time.sleep(wait_time)
+
+    async def acquire_async(self, tokens: int) -> int:
+        """Coroutine version of acquire() that yields to the event loop while waiting"""
+        while True:
+            wait_time, booking_id = self.try_acquire(tokens)
+            if booking_id is not None:
+                return booking_id
+            await asyncio.sleep(wait_time)
+
+    def record_usage(self, booking_id: int, actual_tokens: int):
+        """Replace a booking's estimate with the tokens the request really used"""
+        with self._lock:
+            self.total_tokens += actual_tokens
+            booking = self._open_bookings.get(booking_id)
+            if booking is None:
+                return  # Already slid out of the window
+            self._tokens_in_window += actual_tokens - booking[1]
+            booking[1] = actual_tokens
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Correct limits and usage from the x-ratelimit-* headers of any response"""
+        with self._lock:
+            now = time.time()
+            for kind, attr in (("tokens", "token_limit"), ("requests", "request_limit")):
+                try:
+                    limit = int(headers[f"x-ratelimit-limit-{kind}"])
+                    remaining = int(headers[f"x-ratelimit-remaining-{kind}"])
+                except (KeyError, ValueError):
+                    continue
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}", "")) or self.window
+                setattr(self, attr, min(getattr(self, attr), limit))
+                setattr(self, f"_server_{kind}_used", (limit - remaining, now + reset))
+
+    def pause(self, seconds: float):
+        """Hold back every caller for `seconds`, e.g. after a 429"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.time() + seconds)
+
+    def utilization(self) -> float:
+        """Fraction of the token limit currently in use"""
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            return self._usage(now)[0] / self.token_limit
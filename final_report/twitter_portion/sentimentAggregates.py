@@ -0,0 +1,157 @@
+import json
+import math
+from typing import Dict, Iterable, List
+
+HISTOGRAM_BINS = 200  # Bins over [-1, 1], i.e. 0.01 wide
+REPORT_QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+class TickerAggregate:
+    """
+    Running sentiment statistics for one ticker in constant memory
+
+    Count, sum, mean and M2 are kept with Welford's method, and the distribution with a
+    fixed-bin histogram over [-1, 1], which is exact to merge and good to one bin width
+    (0.01) for quantiles. Two aggregates built from different shards of tweets merge into
+    the same result as one aggregate built from all of them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.histogram: List[int] = [0] * HISTOGRAM_BINS
+
+    def add(self, score: float):
+        self.count += 1
+        self.total += score
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        self.minimum = min(self.minimum, score)
+        self.maximum = max(self.maximum, score)
+        self.histogram[self._bin(score)] += 1
+
+    def merge(self, other: "TickerAggregate"):
+        """Fold another aggregate into this one (Chan et al.'s parallel variance update)"""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, 0 until there are two scores"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile, interpolated within the histogram bin it falls in"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        width = 2.0 / HISTOGRAM_BINS
+        for index, in_bin in enumerate(self.histogram):
+            if in_bin and seen + in_bin >= target:
+                value = -1.0 + width * (index + (target - seen) / in_bin)
+                return min(max(value, self.minimum), self.maximum)
+            seen += in_bin
+        return self.maximum
+
+    @staticmethod
+    def _bin(score: float) -> int:
+        return min(HISTOGRAM_BINS - 1, max(0, int((score + 1.0) / 2.0 * HISTOGRAM_BINS)))
+
+    def to_dict(self) -> Dict:
+        """Compact form: the histogram is stored sparsely as {bin: count}"""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "histogram": {str(index): n for index, n in enumerate(self.histogram) if n},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TickerAggregate":
+        aggregate = cls()
+        aggregate.count = data["count"]
+        aggregate.total = data["total"]
+        aggregate.mean = data["mean"]
+        aggregate.m2 = data["m2"]
+        if aggregate.count:
+            aggregate.minimum = data["min"]
+            aggregate.maximum = data["max"]
+        for index, n in data["histogram"].items():
+            aggregate.histogram[int(index)] = n
+        return aggregate
+
+
+class SentimentAggregates:
+    """Per-ticker TickerAggregates for a fixed ticker universe"""
+
+    def __init__(self, tickers: Iterable[str]):
+        self.aggregates = {ticker: TickerAggregate() for ticker in tickers}
+
+    def add(self, tweet_sentiment: Dict[str, float]):
+        """Record one tweet's ticker -> score map, ignoring tickers outside the universe"""
+        for ticker, score in tweet_sentiment.items():
+            aggregate = self.aggregates.get(ticker)
+            if aggregate is not None:
+                aggregate.add(score)
+
+    def merge(self, other: "SentimentAggregates"):
+        for ticker, aggregate in other.aggregates.items():
+            self.aggregates.setdefault(ticker, TickerAggregate()).merge(aggregate)
+
+    def mean_scores(self) -> Dict[str, float]:
+        return {ticker: aggregate.mean for ticker, aggregate in self.aggregates.items()}
+
+    def mention_counts(self) -> Dict[str, int]:
+        return {ticker: aggregate.count for ticker, aggregate in self.aggregates.items()}
+
+    def distribution_report(self) -> Dict[str, Dict]:
+        """Summary statistics per ticker for the sentiment_distribution_*.json report"""
+        report = {}
+        for ticker, aggregate in self.aggregates.items():
+            report[ticker] = {
+                "count": aggregate.count,
+                "mean": aggregate.mean,
+                "variance": aggregate.variance,
+                "std": math.sqrt(aggregate.variance),
+                "min": aggregate.minimum if aggregate.count else None,
+                "max": aggregate.maximum if aggregate.count else None,
+                "quantiles": {f"p{round(q * 100):02d}": aggregate.quantile(q) for q in REPORT_QUANTILES},
+                "histogram": aggregate.to_dict()["histogram"],
+            }
+        return report
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {ticker: aggregate.to_dict() for ticker, aggregate in self.aggregates.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict]) -> "SentimentAggregates":
+        aggregates = cls([])
+        aggregates.aggregates = {ticker: TickerAggregate.from_dict(value) for ticker, value in data.items()}
+        return aggregates
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "SentimentAggregates":
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
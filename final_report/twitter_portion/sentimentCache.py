@@ -0,0 +1,130 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_FILE = "sentiment_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 1_000_000
+DEFAULT_MAX_AGE = 30 * 24 * 3600  # 30 days
+BUSY_TIMEOUT = 30.0  # Seconds a write waits for another process's lock (sharded scoring shares the file)
+TOUCH_BATCH = 500  # Cache hits whose last_used is written in one transaction
+
+
+def cache_key(tweet_id, text: str, model: str, prompt_version: str) -> str:
+    """Content address for one scoring request: the tweet plus everything that changes the model's answer"""
+    digest = hashlib.sha256(f"{model}\x1f{prompt_version}\x1f{text}".encode("utf-8")).hexdigest()
+    return f"{tweet_id}:{digest}"
+
+
+class SentimentCache:
+    """
+    On-disk cache of raw ticker -> score results, keyed by tweet_id plus a hash of the tweet text,
+    model and prompt version, so editing the prompt or switching models never serves stale scores.
+
+    Entries older than max_age seconds are treated as misses and removed by evict(), which also
+    trims the table back to max_entries by dropping the least recently used rows.
+    A single connection is shared behind a lock, so the cache can be used from scoring threads.
+    Hits don't write: their last_used times are kept in memory and written TOUCH_BATCH at a time
+    (and on evict/close), so several processes can share one cache file without every lookup
+    taking the write lock.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> last_used not yet written
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sentiment (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sentiment_last_used ON sentiment (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, float]]:
+        """Return the cached result for `key`, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM sentiment WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._flush_touched()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def _flush_touched(self):
+        """Write the pending last_used times in one transaction; callers hold the lock"""
+        if not self._touched:
+            return
+        try:
+            self._conn.executemany("UPDATE sentiment SET last_used = ? WHERE key = ?",
+                                   [(used, key) for key, used in self._touched.items()])
+            self._conn.commit()
+        except sqlite3.OperationalError:
+            self._conn.rollback()  # Still locked after BUSY_TIMEOUT; recency is best effort, try next batch
+            return
+        self._touched.clear()
+
+    def put(self, key: str, result: Dict[str, float]):
+        """Store the raw ticker -> score result for `key`"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sentiment (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(result), now, now),
+            )
+            self._conn.commit()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones beyond max_entries. Returns rows removed"""
+        with self._lock:
+            self._flush_touched()
+            removed = self._conn.execute(
+                "DELETE FROM sentiment WHERE created_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+            excess = self._conn.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM sentiment WHERE key IN "
+                    "(SELECT key FROM sentiment ORDER BY last_used LIMIT ?)", (excess,)
+                ).rowcount
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for this run plus the current number of entries"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
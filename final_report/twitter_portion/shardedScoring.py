@@ -0,0 +1,223 @@
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.managers import BaseManager
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional
+
+import pandas as pd
+
+import analyzeWithAI
+from analyzeWithAI import (
+    TICKER_SYMBOLS, MAX_CONCURRENT_REQUESTS, BATCH_SIZE, OFFLINE_FIRST_PASS, SUPPRESS_DUPLICATES,
+    TWEET_COLUMNS, TWEET_OPTIONAL_COLUMNS, TWEET_DTYPES, TWEET_CHUNK_SIZE,
+    iter_tweets, process_all_tweets, write_sentiment_results, _find_tweets_file,
+)
+from tweetColumnar import is_columnar_file, iter_tweet_batches
+from rateLimiter import SlidingWindowRateLimiter, RATE_LIMIT_TOKENS, RATE_LIMIT_REQUESTS
+from sentimentAggregates import SentimentAggregates
+from sentimentCache import SentimentCache
+from tickerPrefilter import TickerPrefilter
+from offlineSentiment import OfflineSentimentScorer
+from tweetDedup import DuplicateSuppressor
+
+SHARD_COUNT = max(1, min(4, (os.cpu_count() or 1)))  # Worker processes; past the API ceiling more don't help
+SHARD_CONCURRENCY = max(1, MAX_CONCURRENT_REQUESTS // 2)  # Requests in flight per shard
+
+
+class RateBudgetManager(BaseManager):
+    """Runs one SlidingWindowRateLimiter in a coordinator process that every shard books against"""
+
+
+RateBudgetManager.register(
+    "SlidingWindowRateLimiter", SlidingWindowRateLimiter,
+    exposed=["try_acquire", "record_usage", "update_from_headers", "pause", "utilization"],
+)
+
+
+class SharedRateLimiter:
+    """
+    Shard-side stand-in for SlidingWindowRateLimiter that books against the coordinator's
+
+    Each try_acquire is one round trip to the coordinator, which hands out budget from the
+    single shared limit; any waiting happens here, in the shard, so the coordinator is never
+    blocked. total_tokens only counts this shard's usage, for its own API log.
+    """
+
+    def __init__(self, proxy):
+        self._proxy = proxy
+        self.total_tokens = 0
+
+    def try_acquire(self, tokens: int):
+        return self._proxy.try_acquire(tokens)
+
+    def acquire(self, tokens: int) -> int:
+        while True:
+            wait_time, booking_id = self._proxy.try_acquire(tokens)
+            if booking_id is not None:
+                return booking_id
+            time.sleep(wait_time)
+
+    def record_usage(self, booking_id: int, actual_tokens: int):
+        self.total_tokens += actual_tokens
+        self._proxy.record_usage(booking_id, actual_tokens)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        # A plain dict loses CaseInsensitiveDict's lookup, and the limiter reads lowercase x-ratelimit-* keys
+        self._proxy.update_from_headers({key.lower(): value for key, value in headers.items()})
+
+    def pause(self, seconds: float):
+        self._proxy.pause(seconds)
+
+    def utilization(self) -> float:
+        return self._proxy.utilization()
+
+
+def shard_of(tweet_id, shards: int) -> int:
+    """Stable shard for a tweet_id, the same in every process and run (unlike hash())"""
+    return zlib.crc32(str(tweet_id).encode()) % shards
+
+
+def shard_output_file(output_file: str, shard: int, shards: int) -> str:
+    stem, extension = os.path.splitext(output_file)
+    return f"{stem}.shard{shard}of{shards}{extension}"
+
+
+def shard_input_file(output_file: str, shard: int, shards: int) -> str:
+    stem, _ = os.path.splitext(output_file)
+    return f"{stem}.shard{shard}of{shards}.input.csv"
+
+
+def _iter_tweet_frames(path: str, chunksize: int = TWEET_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """The tweets file as DataFrames of up to `chunksize` rows, read the way iter_tweets reads it"""
+    if is_columnar_file(path):
+        for batch in iter_tweet_batches(path, TWEET_COLUMNS + TWEET_OPTIONAL_COLUMNS, chunksize):
+            frame = pd.DataFrame(batch)
+            for column in TWEET_OPTIONAL_COLUMNS:
+                if column in frame:  # List columns, comma-joined the way CSV exports store them
+                    frame[column] = [",".join(tags) if isinstance(tags, list) else (tags or "") for tags in frame[column]]
+            yield frame
+        return
+    columns = set(TWEET_COLUMNS + TWEET_OPTIONAL_COLUMNS)
+    dtypes = {**TWEET_DTYPES, **{column: str for column in TWEET_OPTIONAL_COLUMNS}}
+    yield from pd.read_csv(path, usecols=lambda column: column in columns, dtype=dtypes, keep_default_na=False,
+                           chunksize=chunksize)
+
+
+def split_tweets_file(tweets_file: str, output_file: str, shards: int) -> List[str]:
+    """
+    Partition the tweets file once into one CSV per shard, by shard_of(tweet_id)
+
+    Each worker then parses only its own part instead of reading the whole file and dropping
+    the other shards' tweets. Returns the shard files' paths, in shard order.
+    """
+    paths = [shard_input_file(output_file, shard, shards) for shard in range(shards)]
+    files = [open(path, "w", newline="", encoding="utf-8") for path in paths]
+    try:
+        header_written = False
+        for frame in _iter_tweet_frames(tweets_file):
+            if not header_written:  # Every shard file gets the header, even one no tweet lands in
+                for file in files:
+                    frame.head(0).to_csv(file, index=False)
+                header_written = True
+            assignment = [shard_of(tweet_id, shards) for tweet_id in frame["tweet_id"].tolist()]
+            for shard, part in frame.groupby(assignment, sort=False):
+                part.to_csv(files[shard], header=False, index=False)
+        if not header_written:
+            for file in files:
+                file.write(",".join(TWEET_COLUMNS) + "\n")
+        return paths
+    finally:
+        for file in files:
+            file.close()
+
+
+def _score_shard(shard_tweets_file: str, output_file: str, shard: int, shards: int, limiter_proxy,
+                 options: Dict) -> str:
+    """Worker process: score one shard's tweets file and return the path of its saved aggregates"""
+    if options.get("api_url"):
+        analyzeWithAI.API_URL = options["api_url"]
+    shard_file = shard_output_file(output_file, shard, shards)
+    cache = SentimentCache() if options.get("use_cache", True) else None
+    prefilter = TickerPrefilter(TICKER_SYMBOLS) if options.get("use_prefilter", True) else None
+    offline_scorer = OfflineSentimentScorer(TICKER_SYMBOLS, prefilter) if options.get("offline", True) else None
+    deduplicator = DuplicateSuppressor() if options.get("suppress_duplicates", SUPPRESS_DUPLICATES) else None
+    try:
+        process_all_tweets(
+            iter_tweets(shard_tweets_file), output_file=shard_file,
+            concurrency=options.get("concurrency", SHARD_CONCURRENCY), batch_size=options.get("batch_size", BATCH_SIZE),
+            cache=cache, prefilter=prefilter, offline_scorer=offline_scorer,
+            offline_first_pass=options.get("offline_first_pass", OFFLINE_FIRST_PASS),
+            deduplicator=deduplicator, rate_limiter=SharedRateLimiter(limiter_proxy),
+            run_label=f"shard{shard}of{shards}",
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    return f"sentiment_aggregates_{os.path.splitext(os.path.basename(shard_file))[0]}.json"
+
+
+def score_sharded(tweets_file: str, output_file: str = "stock_sentiment_complete.csv", shards: int = SHARD_COUNT,
+                  token_limit: int = RATE_LIMIT_TOKENS, request_limit: int = RATE_LIMIT_REQUESTS,
+                  **options):
+    """
+    Score a tweets file across `shards` worker processes that share one rate budget
+
+    The tweets file is read once and partitioned by a CRC32 of each tweet_id into one CSV per
+    shard (removed again afterwards), and each shard runs the normal
+    process_all_tweets pipeline (reading, prefiltering, scoring and aggregating in its own
+    process) with its own journal, so an interrupted shard resumes on its own. Every shard
+    books tokens from a single SlidingWindowRateLimiter in a coordinator process, so together
+    they never exceed the one API limit. The shards' aggregates are merged into `output_file`
+    and its sentiment_aggregates_*.json, the same outputs as a single-process run.
+
+    Options are passed to each shard: concurrency, batch_size, use_cache, use_prefilter,
+    offline, offline_first_pass, suppress_duplicates and api_url. Near-duplicates are only
+    grouped within a shard.
+
+    Returns:
+        tuple: (final sentiment by ticker, mention counts by ticker)
+    """
+    options.setdefault("api_url", analyzeWithAI.API_URL)
+    shard_files = split_tweets_file(tweets_file, output_file, shards)
+    context = get_context("spawn")
+    try:
+        with RateBudgetManager(ctx=context) as manager:
+            limiter = manager.SlidingWindowRateLimiter(token_limit, request_limit)
+            with ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+                futures = [
+                    executor.submit(_score_shard, shard_files[shard], output_file, shard, shards, limiter, options)
+                    for shard in range(shards)
+                ]
+                aggregate_files: List[str] = [future.result() for future in futures]
+    finally:
+        for path in shard_files:
+            os.remove(path)
+
+    aggregates = SentimentAggregates(TICKER_SYMBOLS)
+    for path in aggregate_files:
+        aggregates.merge(SentimentAggregates.load(path))
+    final_sentiment, mention_counts = write_sentiment_results(aggregates, output_file)
+    aggregates.save(f"sentiment_aggregates_{os.path.splitext(os.path.basename(output_file))[0]}.json")
+    return final_sentiment, mention_counts
+
+
+def main():
+    print(f"=== Sharded Tweet Sentiment Analysis ({SHARD_COUNT} processes, one shared rate budget) ===")
+    tweets_file = _find_tweets_file("../twitter_data/financial_tweets.csv")
+    if tweets_file is None:
+        print("Error loading tweets: financial_tweets.csv not found")
+        return
+
+    start_time = time.time()
+    final_sentiment, mention_counts = score_sharded(tweets_file)
+    print("\nFinal Sentiment Scores:")
+    for ticker in sorted(final_sentiment.keys(), key=lambda x: abs(final_sentiment[x]), reverse=True):
+        if final_sentiment[ticker] != 0:
+            print(f"{ticker}: {final_sentiment[ticker]:.4f} (Mentions: {mention_counts[ticker]})")
+    print(f"\nProcessing completed in {(time.time() - start_time)/60:.2f} minutes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import csv
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Union
+
+STOCK_DATA_FILE = "../stock_portion/stock_data/stock_data.csv"
+
+# Everything from the first of these on is share-class boilerplate, not part of the company name
+_NAME_CUTOFFS = re.compile(
+    r"\s+(?:Common Stock|Class [A-Z]|Capital Stock|Ordinary Shares|American Depositary|ADS\b|"
+    r"New York Registry|Unsponsored|\d+\.\d+% Global Notes)"
+)
+_NAME_SUFFIXES = re.compile(
+    r"(?:,|\s+(?:Inc\.?|Incorporated|Corporation|Company|Co\.|& Co\.|\(The\)|\(DE\)|\(new\)|plc|PLC|N\.V\.|"
+    r"S\.A\.B\. de C\.V\.|Ltd\.|Limited|Group|Holding|Holdings|AG|A/S|SE|Platforms|Technologies|Systems|and|&))$"
+)
+
+# Brand and product names tweets actually use, which the listing names don't cover
+EXTRA_ALIASES = {
+    "GOOG": ["Google", "YouTube"],
+    "GOOGL": ["Google", "YouTube"],
+    "META": ["Facebook", "Instagram", "WhatsApp"],
+    "AMZN": ["Amazon", "AWS"],
+    "TSLA": ["Cybertruck", "Model Y", "Model 3"],
+    "NVDA": ["Nvidia"],
+    "TSM": ["TSMC"],
+    "JPM": ["JPMorgan", "JP Morgan", "Chase"],
+    "BAC": ["BofA"],
+    "KO": ["Coke", "Coca-Cola", "Coca Cola"],
+    "DIS": ["Disney"],
+    "XOM": ["Exxon"],
+    "LLY": ["Lilly"],
+    "NVO": ["Ozempic", "Wegovy"],
+    "PM": ["Marlboro"],
+    "MCD": ["McDonalds"],
+    "GE": ["General Electric"],
+    "IBM": ["IBM"],
+    "CCZ": ["Comcast"],
+    "T": ["AT&T"],
+}
+
+# Symbols that are ordinary words or abbreviations; these only count as $cashtags
+AMBIGUOUS_SYMBOLS = {
+    "T", "V", "MA", "GE", "PG", "HD", "PM", "GS", "TM", "UL", "RY",
+    "NOW", "CAT", "COST", "DIS", "SAP", "LIN", "TBB",
+}
+
+
+def clean_company_name(name: str) -> str:
+    """Reduce a listing name like "Apple Inc. Common Stock" to the name tweets use ("Apple")"""
+    name = _NAME_CUTOFFS.split(name.strip(), maxsplit=1)[0].strip()
+    while True:
+        shorter = _NAME_SUFFIXES.sub("", name).strip()
+        if shorter == name or not shorter:
+            return name
+        name = shorter
+
+
+# Words, keeping joiners inside names like "AT&T", "T-Mobile", "McDonald's" and "Amazon.com"
+_TOKEN = re.compile(r"\w+(?:[&'’.\-]\w+)*")
+_CASHTAG = re.compile(r"\$([A-Za-z]{1,6})\b")
+# bytes.translate table that blanks everything but ASCII letters and digits, so .split() cuts text into
+# alphanumeric pieces entirely in C; a word the tokenizer finds always shows up as whole pieces
+_PIECE_BYTES = bytes(byte if chr(byte).isascii() and chr(byte).isalnum() else 32 for byte in range(256))
+_MIN_TRIGGER_PIECE = 4  # Shorter pieces of joined names ("at" of "at&t") are too common to trigger on
+
+
+def _pieces(text: str) -> List[bytes]:
+    return text.encode("utf-8", "replace").translate(_PIECE_BYTES).split()
+
+
+def _tag_list(tags: Union[str, Sequence[str], None]) -> List[str]:
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    elif not hasattr(tags, "__iter__"):
+        return []  # None, or a NaN from a CSV cell
+    return [tag.strip() for tag in tags if isinstance(tag, str) and tag.strip()]
+
+
+class TickerPrefilter:
+    """
+    Fast local check of which tickers a tweet could plausibly be about
+
+    Looks for $cashtags, bare ticker symbols and company/brand names (from stock_data.csv
+    plus EXTRA_ALIASES), and for hashtags and cashtags already extracted by TwitterCSVExporter.
+    The text is split into words once by a compiled regex and checked against the symbol set and
+    the set of alias first words (in the casings tweets use) with set.isdisjoint, so a tweet
+    that mentions nothing never leaves C code; only tweets that hit a first word are lowercased
+    and walked against the multi-word aliases.
+
+    Before any of that, most tweets are settled by a cheaper check: the UTF-8 text is cut into
+    alphanumeric pieces with bytes.translate and split, and compared against one piece of every
+    symbol and alias first word (names joined by a short piece, like AT&T, are looked for as
+    substrings instead). It can only pass through tweets the full match then rejects, never miss
+    one, and it's about five times faster than the regex tokenizer.
+
+    The result is a per-tweet shortlist: tweets with an empty shortlist can skip the API
+    entirely, and the rest can be scored against their shortlist instead of the whole universe.
+    """
+
+    def __init__(self, tickers: Iterable[str], stock_data_file: Optional[str] = STOCK_DATA_FILE):
+        self.tickers = list(tickers)
+        self._universe = set(self.tickers)
+        self._symbols = self._universe - AMBIGUOUS_SYMBOLS
+        self._aliases: Dict[str, Dict[tuple, Set[str]]] = {}  # first word -> {remaining words: tickers}
+        self._first_words: Set[str] = set()  # Alias first words as tweets write them: lower, Title, UPPER, as listed
+
+        if stock_data_file and os.path.exists(stock_data_file):
+            with open(stock_data_file, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    if row["Symbol"] in self._universe:
+                        self._add_alias(clean_company_name(row["Name"]), row["Symbol"])
+        for ticker, aliases in EXTRA_ALIASES.items():
+            if ticker in self._universe:
+                for alias in aliases:
+                    self._add_alias(alias, ticker)
+
+        self._trigger_pieces: Set[bytes] = set()  # Any tweet that matches has one of these as a piece
+        self._joined_words: List[str] = []  # Words with only short pieces; checked as substrings
+        for word in self._symbols | self._first_words:
+            pieces = _pieces(word)
+            longest = max(pieces, key=len, default=b"")
+            if len(pieces) == 1 or len(longest) >= _MIN_TRIGGER_PIECE:
+                self._trigger_pieces.add(longest)
+            else:
+                self._joined_words.append(word)
+
+    def _add_alias(self, alias: str, ticker: str):
+        words = _TOKEN.findall(alias.lower())
+        if words and len(alias) >= 3:
+            self._aliases.setdefault(words[0], {}).setdefault(tuple(words[1:]), set()).add(ticker)
+            first = _TOKEN.findall(alias)[0]
+            self._first_words.update((first, first.lower(), first.title(), first.upper()))
+
+    @property
+    def symbols(self) -> Set[str]:
+        """Symbols that count as a mention even without a $ (everything but AMBIGUOUS_SYMBOLS)"""
+        return set(self._symbols)
+
+    def aliases(self) -> Iterator[tuple]:
+        """(lowercase alias words, tickers) for every company and brand name"""
+        for first, continuations in self._aliases.items():
+            for rest, tickers in continuations.items():
+                yield (first,) + rest, set(tickers)
+
+    def _match_names(self, words: List[str], found: Set[str]):
+        for index, word in enumerate(words):
+            continuations = self._aliases.get(word)
+            if continuations is None:
+                continue
+            for rest, tickers in continuations.items():
+                if tuple(words[index + 1:index + 1 + len(rest)]) == rest:
+                    found |= tickers
+
+    def _mentions_nothing(self, text: str) -> bool:
+        """True when `text` can't contain a cashtag, symbol or alias first word"""
+        if ("$" in text and _CASHTAG.search(text)) or not self._trigger_pieces.isdisjoint(_pieces(text)):
+            return False
+        return not any(word in text for word in self._joined_words)
+
+    def candidates(self, text: str, hashtags: Union[str, Sequence[str], None] = "",
+                   cashtags: Union[str, Sequence[str], None] = "") -> List[str]:
+        """
+        Tickers `text` plausibly refers to, in universe order
+
+        Hashtags and cashtags may be comma-joined strings (CSV exports) or sequences of tags
+        (the list columns of a columnar export).
+        """
+        if not hashtags and not cashtags and self._mentions_nothing(text):
+            return []
+        found: Set[str] = set()
+        if "$" in text:
+            found.update(symbol.upper() for symbol in _CASHTAG.findall(text))
+        words = _TOKEN.findall(text)
+        if not self._symbols.isdisjoint(words):
+            found.update(self._symbols.intersection(words))
+        if not self._first_words.isdisjoint(words):
+            self._match_names([word.lower() for word in words], found)
+
+        # A cashtag names its ticker outright, even an ambiguous one; a hashtag (#CAT, #GE) is a word
+        # like any other, so it only counts as an unambiguous symbol or a company name
+        tags = _tag_list(cashtags)
+        found.update(tag.upper() for tag in tags)
+        for tag in _tag_list(hashtags):
+            if tag.upper() in self._symbols:
+                found.add(tag.upper())
+            tags.append(tag)
+        if tags:
+            self._match_names([tag.lower() for tag in tags], found)
+
+        return [ticker for ticker in self.tickers if ticker in found] if found else []
+
+    def annotate(self, tweets: Iterable[Mapping], keep_unmatched: bool = False) -> Iterator[Dict]:
+        """
+        Add a 'candidates' shortlist to each tweet in a stream
+
+        Tweets with no plausible ticker get an empty shortlist, which the scorer records as no
+        sentiment without calling the API. With keep_unmatched=True they get None instead and
+        are still scored against the full ticker list.
+        """
+        for tweet in tweets:
+            tweet = dict(tweet)
+            shortlist = self.candidates(tweet["text"], tweet.get("hashtags"), tweet.get("cashtags"))
+            tweet["candidates"] = shortlist if shortlist or not keep_unmatched else None
+            yield tweet
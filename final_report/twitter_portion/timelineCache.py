@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+TIMELINE_CACHE_TTL = 300  # Seconds a fetched timeline is reused before the profile page is downloaded again
+TIMELINE_CACHE_SIZE = 512  # Timelines kept in memory, least recently used dropped first
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_\-]")
+
+
+class TimelineCache:
+    """
+    TTL + LRU cache of parsed timelines, keyed by username (case-insensitively)
+
+    Entries live in memory for `ttl` seconds, with at most `max_entries` kept. With a
+    `disk_dir`, every timeline is also written there as JSON, so a new process (or one that
+    evicted the entry) can reuse it within the same TTL without touching the network.
+    Safe to share between the threads of TwitterAPI.get_tweets_for_accounts.
+    """
+
+    def __init__(self, ttl: float = TIMELINE_CACHE_TTL, max_entries: int = TIMELINE_CACHE_SIZE,
+                 disk_dir: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (fetched_at, tweets)
+        self._lock = threading.Lock()
+        if disk_dir and not os.path.exists(disk_dir):
+            os.makedirs(disk_dir)
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return username.lower()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{_UNSAFE_FILENAME.sub('_', key)}.json")
+
+    def get(self, username: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the cached timeline for `username`, or None if there's no fresh one"""
+        key = self._key(username)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._store(key, entry)
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, username: str, tweets: List[Dict[str, Any]]):
+        """Store a freshly fetched timeline"""
+        key = self._key(username)
+        entry = (time.time(), tweets)
+        with self._lock:
+            self._store(key, entry)
+        if self.disk_dir:
+            temp_path = self._disk_path(key) + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": entry[0], "tweets": tweets}, f)
+            os.replace(temp_path, self._disk_path(key))
+
+    def _store(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                data = json.load(f)
+            return data["fetched_at"], data["tweets"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def clear(self):
+        """Forget every in-memory entry (disk files are left to expire)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters since creation; disk hits count as hits in hit_ratio"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
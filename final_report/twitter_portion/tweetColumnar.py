@@ -0,0 +1,167 @@
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # Only the Parquet/Feather export mode needs pyarrow; CSV works without it
+    pa = feather = pq = None
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "feather": ".feather"}  # Export mode -> file extension
+ROW_GROUP_SIZE = 50000  # Rows buffered before a row group (Parquet) or record batch (Feather) is written
+PARQUET_COMPRESSION = "zstd"
+
+LIST_COLUMNS = ['hashtags', 'mentions', 'cashtags', 'urls']
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet/Feather tweet files (pip install pyarrow)")
+
+
+def tweet_schema() -> "pa.Schema":
+    """Arrow schema of a columnar tweet export: the CSV columns with real types and list-typed entities"""
+    _require_pyarrow()
+    tags = pa.list_(pa.string())
+    return pa.schema([
+        ('tweet_id', pa.int64()),
+        ('username', pa.string()),
+        ('name', pa.string()),
+        ('verified', pa.bool_()),
+        ('date', pa.timestamp('us', tz='UTC')),
+        ('text', pa.string()),
+        ('likes', pa.int64()),
+        ('retweets', pa.int64()),
+        ('hashtags', tags),
+        ('mentions', tags),
+        ('cashtags', tags),
+        ('urls', tags),
+        ('is_retweet', pa.bool_()),
+    ])
+
+
+def is_columnar_file(path: str) -> bool:
+    """True for paths with a Parquet or Feather extension"""
+    return os.path.splitext(path)[1].lower() in COLUMNAR_FORMATS.values()
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """ISO date from TwitterAPI as a UTC datetime, or None if it can't be parsed"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class ColumnarTweetWriter:
+    """
+    Writes typed tweet records to a Parquet or Feather (Arrow IPC) file in row groups
+
+    Records are dicts with the tweet_schema() fields. They're buffered column by column and
+    written ROW_GROUP_SIZE rows at a time, so memory stays bounded by one row group however
+    many tweets are written, and readers can skip whole groups they don't need.
+    """
+
+    def __init__(self, filepath: str, file_format: str = "parquet", row_group_size: int = ROW_GROUP_SIZE):
+        _require_pyarrow()
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown columnar format {file_format!r}; expected one of {sorted(COLUMNAR_FORMATS)}")
+        self.filepath = filepath
+        self.file_format = file_format
+        self.row_group_size = row_group_size
+        self.schema = tweet_schema()
+        self.rows_written = 0
+        self._columns: Dict[str, List] = {name: [] for name in self.schema.names}
+        self._buffered = 0
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(filepath, self.schema, compression=PARQUET_COMPRESSION)
+        else:
+            self._sink = pa.OSFile(filepath, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, record: Dict[str, Any]):
+        for name, values in self._columns.items():
+            values.append(record.get(name))
+        self._buffered += 1
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write whatever is buffered as one row group"""
+        if not self._buffered:
+            return
+        batch = pa.RecordBatch.from_pydict(self._columns, schema=self.schema)
+        if self.file_format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]), row_group_size=self.row_group_size)
+        else:
+            self._writer.write_batch(batch)
+        self.rows_written += self._buffered
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if self.file_format == "feather":
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _file_schema(path: str) -> "pa.Schema":
+    if path.lower().endswith(COLUMNAR_FORMATS["parquet"]):
+        return pq.read_schema(path)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def available_columns(path: str, columns: Optional[Sequence[str]]) -> Optional[List[str]]:
+    """`columns` restricted to those the file has (None means all of them)"""
+    _require_pyarrow()
+    if columns is None:
+        return None
+    names = set(_file_schema(path).names)
+    return [column for column in columns if column in names]
+
+
+def read_tweets_columnar(path: str, columns: Optional[Sequence[str]] = None) -> "pa.Table":
+    """
+    Read a Parquet/Feather tweet file, decoding only `columns` (all of them if None)
+
+    Columns the file doesn't have are skipped rather than raising.
+    """
+    columns = available_columns(path, columns)
+    if path.lower().endswith(COLUMNAR_FORMATS["parquet"]):
+        return pq.read_table(path, columns=columns)
+    return feather.read_table(path, columns=columns, memory_map=True)
+
+
+def iter_tweet_batches(path: str, columns: Optional[Sequence[str]] = None,
+                       batch_size: int = ROW_GROUP_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream a Parquet/Feather tweet file as lists of row dicts, at most `batch_size` rows each
+
+    Only `columns` are decoded; list columns come back as lists and ints as ints.
+    """
+    columns = available_columns(path, columns)
+    if path.lower().endswith(COLUMNAR_FORMATS["parquet"]):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pylist()
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            batch = reader.get_batch(index)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size).to_pylist()
@@ -0,0 +1,235 @@
+import json
+import os
+import re
+import zlib
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+DEDUP_PERMUTATIONS = 64  # MinHash signature length
+DEDUP_BANDS = 16  # LSH bands; DEDUP_PERMUTATIONS / DEDUP_BANDS rows each
+DEDUP_THRESHOLD = 0.7  # Estimated Jaccard similarity at which two tweets count as near-duplicates
+SHINGLE_SIZE = 3  # Words per shingle
+EXACT_CACHE_SIZE = 100_000  # Normalized texts remembered for the exact-duplicate shortcut
+DEDUP_INDEX_FILE = "dedup_index.npz"
+
+_RETWEET_PREFIX = re.compile(r"^rt\s+@\w+:?\s*")
+_URL = re.compile(r"https?://\S+")
+_MENTION = re.compile(r"@\w+")
+_WORD = re.compile(r"[$#]?\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Tweet text reduced to what matters for duplicate detection
+
+    Lower-cased, with the "RT @user:" prefix, links and @mentions removed and punctuation
+    dropped. $cashtags and #hashtags are kept, since they change what a tweet is about.
+    """
+    text = _RETWEET_PREFIX.sub("", text.lower().strip())
+    text = _MENTION.sub(" ", _URL.sub(" ", text))
+    return " ".join(_WORD.findall(text))
+
+
+def _shingle_hashes(normalized: str) -> np.ndarray:
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        shingles = [normalized] if normalized else []
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class NearDuplicateIndex:
+    """
+    Incremental MinHash/LSH index mapping each tweet to the first tweet of its near-duplicate group
+
+    Every tweet's shingle set gets a MinHash signature (multiply-shift hashes, all permutations
+    in one numpy pass), split into `bands` bands. Two tweets whose signatures agree on any whole
+    band are candidates, and a candidate only counts if the estimated Jaccard similarity
+    (the fraction of agreeing signature slots) reaches `threshold`. Only the first tweet of
+    each group (its representative) is indexed, so the index grows with the number of
+    distinct tweets, not the archive. Exact duplicates after normalization skip the MinHash
+    while their text is among the `exact_cache_size` most recently seen; older ones go
+    through the MinHash like anything else and land on the same representative. save()/load()
+    carry the index, and each group's score, over to later runs.
+    """
+
+    def __init__(self, num_perm: int = DEDUP_PERMUTATIONS, bands: int = DEDUP_BANDS,
+                 threshold: float = DEDUP_THRESHOLD, seed: int = 1, exact_cache_size: int = EXACT_CACHE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._buckets: Dict[Tuple[int, bytes], List[Any]] = {}
+        self._signatures: Dict[Any, np.ndarray] = {}  # representative -> signature
+        self.exact_cache_size = exact_cache_size
+        self._exact: "OrderedDict[str, Any]" = OrderedDict()  # normalized text -> representative, least recent first
+        self.results: Dict[Any, Dict[str, float]] = {}  # representative -> scores, once known
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, normalized: str) -> Optional[np.ndarray]:
+        """MinHash signature of normalized text, or None if it has no words"""
+        hashes = _shingle_hashes(normalized)
+        if not len(hashes):
+            return None
+        with np.errstate(over="ignore"):
+            mixed = self._multipliers[:, None] * hashes[None, :] + self._offsets[:, None]
+        return (mixed >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterator[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: Any, text: str) -> Any:
+        """
+        Index a tweet and return the representative of its group
+
+        That's `key` itself for a tweet unlike anything seen so far, or the key of the
+        earlier tweet it near-duplicates. Texts with no words (bare links) are never grouped.
+        """
+        normalized = normalize_text(text)
+        if not normalized:
+            return key
+        representative = self._exact.get(normalized)
+        if representative is not None:
+            self._exact.move_to_end(normalized)
+            return representative
+
+        signature = self.signature(normalized)
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for band_key in self._band_keys(signature):
+            for candidate in self._buckets.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        if best is not None:
+            self._remember_exact(normalized, best)
+            return best
+
+        self._insert(key, normalized, signature)
+        return key
+
+    def record(self, key: Any, scores: Dict[str, float]):
+        """Remember a representative's scores so later members of its group can reuse them"""
+        if key in self._signatures:
+            self.results[key] = scores
+
+    def _insert(self, key: Any, normalized: str, signature: np.ndarray):
+        self._signatures[key] = signature
+        self._remember_exact(normalized, key)
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def _remember_exact(self, normalized: str, representative: Any):
+        self._exact[normalized] = representative
+        if len(self._exact) > self.exact_cache_size:
+            self._exact.popitem(last=False)
+
+    def save(self, path: str = DEDUP_INDEX_FILE):
+        """Write the representatives, their signatures and known scores (normalized texts aren't kept)"""
+        keys = list(self._signatures)
+        signatures = np.array([self._signatures[key] for key in keys], dtype=np.uint32).reshape(-1, self.num_perm)
+        temp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            temp_path, signatures=signatures,
+            keys=np.array(json.dumps([_jsonable(key) for key in keys])),
+            results=np.array(json.dumps([[_jsonable(key), scores] for key, scores in self.results.items()])),
+            params=np.array([self.num_perm, self.bands, self.seed], dtype=np.int64),
+        )
+        os.replace(temp_path, path)
+
+    def load(self, path: str = DEDUP_INDEX_FILE) -> bool:
+        """Add the groups saved by an earlier run; False if there's no saved index"""
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            if tuple(data["params"]) != (self.num_perm, self.bands, self.seed):
+                print(f"Ignoring {path}: built with different MinHash parameters")
+                return False
+            keys = json.loads(str(data["keys"]))
+            for key, signature in zip(keys, data["signatures"]):
+                self._signatures[key] = signature
+                for band_key in self._band_keys(signature):
+                    self._buckets.setdefault(band_key, []).append(key)
+            self.results.update({key: scores for key, scores in json.loads(str(data["results"]))})
+        return True
+
+
+def _jsonable(key):
+    return key.item() if hasattr(key, "item") else key  # numpy ints from pandas
+
+
+class DuplicateSuppressor:
+    """
+    Pipeline stage that sends one tweet per near-duplicate group to the scorer and fans its
+    score out to the rest
+
+    Wrap the tweet stream with route() before scoring and the scored (tweet, sentiment)
+    stream with fan_out() after it. Members of a group come back with the representative's
+    scores but their own tweet dict, so their likes/retweets (engagement weight) and
+    tweet_id are kept, with 'duplicate_of' set to the representative's tweet_id. Output
+    stays in input order, which the checkpoint journal's resume-by-count relies on.
+    Both generators must be consumed from the same thread, as process_all_tweets does.
+    """
+
+    def __init__(self, index: Optional[NearDuplicateIndex] = None):
+        self.index = index if index is not None else NearDuplicateIndex()
+        self.suppressed = 0
+        self._order: deque = deque()  # (tweet, representative) in input order, not yet emitted
+        self._scored: Dict[Any, Dict[str, float]] = {}  # tweet_id -> scores for tweets awaiting emission
+        self._in_flight = set()  # representatives sent to the scorer and not back yet
+        self._stand_ins: Dict[Any, Any] = {}  # tweet_id -> representative it's scored for, if not itself
+
+    def route(self, tweets: Iterable[Mapping]) -> Iterator[Dict]:
+        """Yield only the tweets that need scoring; hold back the near-duplicates"""
+        for tweet in tweets:
+            tweet = dict(tweet)
+            tweet_id = _jsonable(tweet['tweet_id'])
+            representative = self.index.add(tweet_id, tweet['text'])
+            if representative == tweet_id or (representative not in self._in_flight
+                                              and representative not in self.index.results):
+                if representative != tweet_id:
+                    self._stand_ins[tweet_id] = representative  # Its group's score wasn't saved
+                self._order.append((tweet, tweet_id))
+                self._in_flight.add(tweet_id)
+                yield tweet
+            else:
+                tweet['duplicate_of'] = representative
+                self._order.append((tweet, representative))
+                self.suppressed += 1
+
+    def fan_out(self, scored: Iterable[Tuple[Dict, Dict[str, float]]]) -> Iterator[Tuple[Dict, Dict[str, float]]]:
+        """Yield every routed tweet, scored or fanned out, in the order it entered route()"""
+        for tweet, sentiment in scored:
+            tweet_id = _jsonable(tweet['tweet_id'])
+            self._in_flight.discard(tweet_id)
+            self._scored[tweet_id] = sentiment
+            self.index.record(self._stand_ins.pop(tweet_id, tweet_id), sentiment)
+            yield from self._ready()
+        yield from self._ready()
+
+    def _ready(self) -> Iterator[Tuple[Dict, Dict[str, float]]]:
+        while self._order:
+            tweet, representative = self._order[0]
+            if 'duplicate_of' in tweet:
+                sentiment = self.index.results.get(representative)
+            else:
+                sentiment = self._scored.pop(representative, None)
+            if sentiment is None:
+                return
+            self._order.popleft()
+            yield tweet, dict(sentiment)
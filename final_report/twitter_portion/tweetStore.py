@@ -0,0 +1,142 @@
+import csv
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_STORE_FILE = "tweet_store.sqlite"
+ITER_BATCH_SIZE = 1000  # Rows iter_rows reads per query
+
+STORE_COLUMNS = [
+    'tweet_id', 'username', 'name', 'verified', 'date', 'text', 'likes', 'retweets',
+    'hashtags', 'mentions', 'cashtags', 'urls', 'is_retweet',
+]
+
+
+class TweetStore:
+    """
+    Deduplicated archive of collected tweets, indexed by tweet_id, plus per-account watermarks
+
+    Rows are the same dicts TwitterCSVExporter writes to CSV. Adding a row whose tweet_id is
+    already stored is a no-op, and each account's watermark is the newest tweet_id seen for it,
+    so an incremental collection only has to look at tweets above the watermark.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS tweets (
+                tweet_id INTEGER PRIMARY KEY,
+                {', '.join(f'{column} TEXT' for column in STORE_COLUMNS[1:])},
+                collected_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                username TEXT PRIMARY KEY,
+                last_tweet_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def watermark(self, username: str) -> Optional[int]:
+        """Newest tweet_id stored for `username`, or None if the account has never been collected"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_tweet_id FROM watermarks WHERE username = ?", (username.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def watermarks(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT username, last_tweet_id FROM watermarks"))
+
+    def add(self, username: str, rows: Iterable[Dict]) -> List[Dict]:
+        """
+        Store the rows collected for one account and advance its watermark
+
+        Returns:
+            List[Dict]: The rows that weren't already stored, in the order given
+        """
+        now = time.time()
+        added = []
+        newest = None
+        placeholders = ", ".join("?" for _ in STORE_COLUMNS)
+        with self._lock:
+            for row in rows:
+                tweet_id = int(row['tweet_id'])
+                newest = tweet_id if newest is None else max(newest, tweet_id)
+                values = [tweet_id] + [str(row[column]) for column in STORE_COLUMNS[1:]] + [now]
+                cursor = self._conn.execute(
+                    f"INSERT OR IGNORE INTO tweets ({', '.join(STORE_COLUMNS)}, collected_at) "
+                    f"VALUES ({placeholders}, ?)", values
+                )
+                if cursor.rowcount:
+                    added.append(row)
+            if newest is not None:
+                self._conn.execute(
+                    "INSERT INTO watermarks (username, last_tweet_id, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(username) DO UPDATE SET "
+                    "last_tweet_id = MAX(last_tweet_id, excluded.last_tweet_id), updated_at = excluded.updated_at",
+                    (username.lower(), newest, now)
+                )
+            self._conn.commit()
+        return added
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tweets").fetchone()[0]
+
+    def __contains__(self, tweet_id) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM tweets WHERE tweet_id = ?", (int(tweet_id),)
+            ).fetchone() is not None
+
+    def iter_rows(self, collected_since: Optional[float] = None) -> Iterator[Dict]:
+        """
+        Stored rows in tweet_id order, optionally only those collected at or after a timestamp
+
+        Rows are read ITER_BATCH_SIZE at a time, each batch picking up after the last tweet_id of
+        the one before, so the whole table is never in memory and the lock is only held while a
+        batch is read (other threads can keep adding while the rows are consumed).
+        """
+        query = f"SELECT {', '.join(STORE_COLUMNS)} FROM tweets WHERE tweet_id > ?"
+        params = ()
+        if collected_since is not None:
+            query += " AND collected_at >= ?"
+            params = (collected_since,)
+        query += " ORDER BY tweet_id LIMIT ?"
+        after = -(2 ** 63)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(query, (after, *params, ITER_BATCH_SIZE)).fetchall()
+            for row in rows:
+                yield dict(zip(STORE_COLUMNS, row))
+            if len(rows) < ITER_BATCH_SIZE:
+                return
+            after = rows[-1][0]
+
+    def export_csv(self, filepath: str, collected_since: Optional[float] = None) -> int:
+        """Write the store (or the rows collected since a timestamp) as a tweets CSV. Returns rows written"""
+        written = 0
+        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=STORE_COLUMNS)
+            writer.writeheader()
+            for row in self.iter_rows(collected_since):
+                writer.writerow(row)
+                written += 1
+        return written
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
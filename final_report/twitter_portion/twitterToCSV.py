@@ -4,16 +4,50 @@ Twitter to CSV Exporter
 This script collects tweets and exports them to CSV format for financial sentiment analysis.
 """
 
-from twitterRequests import TwitterAPI
+from twitterRequests import TwitterAPI, MAX_FETCH_WORKERS
+from tweetStore import TweetStore, DEFAULT_STORE_FILE
+from tweetColumnar import ColumnarTweetWriter, COLUMNAR_FORMATS, parse_timestamp
 import csv
 import os
 from datetime import datetime
 import re
 
+_WHITESPACE_RE = re.compile(r'\s+')
+_MENTION_RE = re.compile(r'@(\w+)')
+_CASHTAG_RE = re.compile(r'\$(\w+)')
+
+CSV_HEADERS = [
+    'tweet_id',
+    'username',
+    'name',
+    'verified',
+    'date',
+    'text',
+    'likes',
+    'retweets',
+    'hashtags',
+    'mentions',
+    'cashtags',
+    'urls',
+    'is_retweet',
+]
+
+OUTPUT_FORMATS = ['csv'] + list(COLUMNAR_FORMATS)
+
 class TwitterCSVExporter:
-    def __init__(self, output_dir="twitter_data"):
-        self.twitter = TwitterAPI()
+    def __init__(self, output_dir="twitter_data", cache_dir=None, output_format="csv"):
+        """
+        Args:
+            output_dir (str): Directory exported files are written to
+            cache_dir (str): Optional directory for the on-disk timeline cache
+            output_format (str): 'csv', or 'parquet'/'feather' for a typed columnar file with
+                list-typed hashtags/mentions/cashtags/urls (needs pyarrow)
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}; expected one of {OUTPUT_FORMATS}")
+        self.twitter = TwitterAPI(cache_dir=cache_dir)
         self.output_dir = output_dir
+        self.output_format = output_format
         
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -21,83 +55,192 @@ class TwitterCSVExporter:
     def clean_text(self, text):
         """Clean tweet text by removing newlines and extra spaces"""
         text = text.replace('\n', ' ')
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', text)
         return text.strip()
     
     def extract_mentions(self, text):
         """Extract @mentions from tweet text"""
-        return ','.join(re.findall(r'@(\w+)', text))
+        return ','.join(_MENTION_RE.findall(text))
     
     def extract_cashtags(self, text):
         """Extract $cashtags from tweet text"""
-        return ','.join(re.findall(r'\$(\w+)', text))
+        return ','.join(_CASHTAG_RE.findall(text))
     
-    def collect_and_export(self, accounts, count_per_account=20, filename=None):
+    def tweet_row(self, tweet, username):
         """
-        Collect tweets from specified accounts and export to CSV
+        Convert a tweet from TwitterAPI into a CSV row
+        
+        Mentions and cashtags come from the entity scan TwitterAPI already did; they're only
+        re-extracted for tweets that predate it (e.g. from an old on-disk timeline cache).
+        """
+        clean_text = self.clean_text(tweet['text'])
+        mentions = ','.join(tweet['mentions']) if 'mentions' in tweet else self.extract_mentions(clean_text)
+        cashtags = ','.join(tweet['cashtags']) if 'cashtags' in tweet else self.extract_cashtags(clean_text)
+        
+        return {
+            'tweet_id': tweet['id'],
+            'username': username,
+            'name': tweet['user']['name'],
+            'verified': 'Yes' if tweet['user']['verified'] else 'No',
+            'date': tweet['created_at'],
+            'text': clean_text,
+            'likes': tweet['favorite_count'],
+            'retweets': tweet['retweet_count'],
+            'hashtags': ','.join(tweet['hashtags']),
+            'mentions': mentions,
+            'cashtags': cashtags,
+            'urls': ','.join(tweet['urls']),
+            'is_retweet': 'Yes' if tweet['is_retweet'] else 'No',
+        }
+    
+    def tweet_record(self, tweet, username):
+        """Convert a tweet from TwitterAPI into a typed record for a columnar export"""
+        clean_text = self.clean_text(tweet['text'])
+        return {
+            'tweet_id': int(tweet['id']),
+            'username': username,
+            'name': tweet['user']['name'],
+            'verified': bool(tweet['user']['verified']),
+            'date': parse_timestamp(tweet['created_at']),
+            'text': clean_text,
+            'likes': int(tweet['favorite_count']),
+            'retweets': int(tweet['retweet_count']),
+            'hashtags': list(tweet['hashtags']),
+            'mentions': list(tweet['mentions']) if 'mentions' in tweet else _MENTION_RE.findall(clean_text),
+            'cashtags': list(tweet['cashtags']) if 'cashtags' in tweet else _CASHTAG_RE.findall(clean_text),
+            'urls': list(tweet['urls']),
+            'is_retweet': bool(tweet['is_retweet']),
+        }
+    
+    def default_filename(self, prefix):
+        """Timestamped filename with the extension of the output format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extension = COLUMNAR_FORMATS.get(self.output_format, ".csv")
+        return f"{prefix}_{timestamp}{extension}"
+    
+    def collect_and_export(self, accounts, count_per_account=20, filename=None, max_workers=MAX_FETCH_WORKERS):
+        """
+        Collect tweets from specified accounts and export them in the output format
+        
+        Accounts are fetched concurrently over one pooled session, but rows are written
+        account by account in the order given, so the CSV is the same as a sequential run.
         
         Args:
             accounts (list): List of Twitter usernames to collect from
             count_per_account (int): Number of tweets to collect per account
             filename (str): Optional filename, defaults to a timestamped file
+            max_workers (int): Accounts fetched at once (1 to fetch one at a time)
             
         Returns:
-            str: Path to the created CSV file
+            str: Path to the created file
         """
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"tweets_{timestamp}.csv"
+            filename = self.default_filename("tweets")
         
+        accounts = list(accounts)
+        
+        print(f"Collecting tweets from {len(accounts)} accounts ({max_workers} at a time)...")
+        filepath = self.write_tweets(
+            self.twitter.get_tweets_for_accounts(accounts, count_per_account, max_workers), filename
+        )
+        
+        stats = self.twitter.cache_stats()
+        print(f"Timeline cache: {stats['hits'] + stats['disk_hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_ratio']*100:.1f}% hit ratio)")
+        self.twitter.write_metrics(os.path.join(self.output_dir, f"collect_metrics_{os.path.splitext(filename)[0]}"))
+        return filepath
+    
+    def collect_incremental(self, accounts, count_per_account=100, filename=None, store=None,
+                            max_workers=MAX_FETCH_WORKERS):
+        """
+        Collect only tweets not seen by earlier runs and export them to CSV
+        
+        Each account's watermark in the TweetStore (the newest tweet_id collected for it) is used
+        to skip everything already seen, along with any tweet_id the store already holds. Only
+        the new tweets are written to the CSV, so scoring it costs as much as the new tweets,
+        not the whole timeline. The store (and so the watermarks) is only updated once the
+        file is complete: a run that dies part way writes those tweets again next time rather
+        than marking them seen without exporting them. Tweets without a numeric id are skipped.
+        
+        Args:
+            accounts (list): List of Twitter usernames to collect from
+            count_per_account (int): Number of recent tweets to check per account
+            filename (str): Optional filename, defaults to a timestamped file
+            store (TweetStore): Store to use, defaults to tweet_store.sqlite in output_dir
+            max_workers (int): Accounts fetched at once (1 to fetch one at a time)
+            
+        Returns:
+            tuple: (path to the CSV of new tweets, number of new tweets)
+        """
+        if filename is None:
+            filename = self.default_filename("new_tweets")
+        
+        owns_store = store is None
+        if owns_store:
+            store = TweetStore(os.path.join(self.output_dir, DEFAULT_STORE_FILE))
+        accounts = list(accounts)
+        new_count = 0
+        skipped = 0
+        written_ids = set()  # Tweets written this run, which the store won't hold until the end
+        pending = []  # (username, rows) to add to the store once the file is written
+        
+        def new_tweets_by_account():
+            nonlocal new_count, skipped
+            for username, tweets in self.twitter.get_tweets_for_accounts(accounts, count_per_account, max_workers):
+                numbered = [tweet for tweet in tweets if str(tweet['id']).isdecimal()]
+                skipped += len(tweets) - len(numbered)
+                watermark = store.watermark(username)
+                unseen = [tweet for tweet in numbered if watermark is None or int(tweet['id']) > watermark]
+                new_tweets = [tweet for tweet in unseen if int(tweet['id']) not in written_ids and tweet['id'] not in store]
+                written_ids.update(int(tweet['id']) for tweet in new_tweets)
+                pending.append((username, [self.tweet_row(tweet, username) for tweet in unseen]))
+                new_count += len(new_tweets)
+                yield username, new_tweets
+        
+        print(f"Collecting new tweets from {len(accounts)} accounts ({max_workers} at a time)...")
+        try:
+            filepath = self.write_tweets(new_tweets_by_account(), filename)
+            for username, rows in pending:
+                store.add(username, rows)
+            if skipped:
+                print(f"Skipped {skipped} tweets without a numeric id")
+            print(f"{new_count} new tweets; the store now holds {len(store)}")
+        finally:
+            if owns_store:
+                store.close()
+        return filepath, new_count
+    
+    def write_tweets(self, tweets_by_account, filename):
+        """
+        Write (username, tweets) pairs to a file in output_dir, in the order given
+        
+        CSV rows are written one at a time; Parquet/Feather records are buffered and written
+        in row groups of ROW_GROUP_SIZE.
+        
+        Returns:
+            str: Path to the created file
+        """
         filepath = os.path.join(self.output_dir, filename)
         
-        # Define CSV headers
-        headers = [
-            'tweet_id',
-            'username',
-            'name',
-            'verified',
-            'date',
-            'text',
-            'likes',
-            'retweets',
-            'hashtags',
-            'mentions',
-            'cashtags',
-            'urls',
-            'is_retweet',
-        ]
+        if self.output_format in COLUMNAR_FORMATS:
+            with ColumnarTweetWriter(filepath, self.output_format) as writer:
+                for username, tweets in tweets_by_account:
+                    for tweet in tweets:
+                        writer.write(self.tweet_record(tweet, username))
+                    
+                    print(f"Collected {len(tweets)} tweets from @{username}")
+            
+            print(f"Exported {writer.rows_written} tweets to {filepath}")
+            return filepath
         
         # Open CSV file for writing
         with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
             writer.writeheader()
             
-            # Collect and write tweets
-            for username in accounts:
-                print(f"Collecting tweets from @{username}...")
-                tweets = self.twitter.get_tweets(username, count=count_per_account)
-                
+            for username, tweets in tweets_by_account:
                 for tweet in tweets:
-                    clean_text = self.clean_text(tweet['text'])
-                    
-                    # Convert tweet data to CSV format
-                    row = {
-                        'tweet_id': tweet['id'],
-                        'username': username,
-                        'name': tweet['user']['name'],
-                        'verified': 'Yes' if tweet['user']['verified'] else 'No',
-                        'date': tweet['created_at'],
-                        'text': clean_text,
-                        'likes': tweet['favorite_count'],
-                        'retweets': tweet['retweet_count'],
-                        'hashtags': ','.join(tweet['hashtags']),
-                        'mentions': self.extract_mentions(clean_text),
-                        'cashtags': self.extract_cashtags(clean_text),
-                        'urls': ','.join(tweet['urls']),
-                        'is_retweet': 'Yes' if tweet['is_retweet'] else 'No',
-                    }
-                    
-                    writer.writerow(row)
+                    writer.writerow(self.tweet_row(tweet, username))
                 
                 print(f"Collected {len(tweets)} tweets from @{username}")
         
@@ -118,11 +261,10 @@ class TwitterCSVExporter:
             str: Path to the created CSV file
         """
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"search_{username}_{keyword}_{timestamp}.csv"
+            filename = self.default_filename(f"search_{username}_{keyword}")
 
         matching_tweets = self.twitter.search_tweets_by_keyword(username, keyword, count)
-        return self.collect_and_export([username], count, filename)
+        return self.write_tweets([(username, matching_tweets)], filename)
 
 
 # Example usage
@@ -162,6 +304,13 @@ if __name__ == "__main__":
     
     print(f"CSV file created at: {csv_path}")
     
+    # Example of a typed columnar export (needs pyarrow), which analyzeWithAI.load_tweets reads directly
+    # parquet_exporter = TwitterCSVExporter(output_format="parquet")
+    # parquet_path = parquet_exporter.collect_and_export(accounts=financial_accounts, count_per_account=20)
+    
+    # Example of collecting only tweets newer than the last run into the tweet store
+    # new_csv, new_count = exporter.collect_incremental(accounts=financial_accounts, count_per_account=100)
+    
     # Example of searching for specific keywords and exporting results
     # keyword_csv = exporter.export_search_results(
     #     username="elonmusk",